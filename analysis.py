@@ -2,50 +2,140 @@
 Produces high-level metrics and a concise HTML summary for decision makers.
 """
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from data_processing import prepare_products, prepare_population
+from data_processing import prepare_products, prepare_population, COORD_COLS, FACILITY_COL
+from population import county_pwa
+from instrumentation import timed
+import results_store
 
 ROOT = Path(__file__).parent
 OUT = ROOT / 'outputs'
-OUT.mkdir(exist_ok=True)
 
 
-def compute_and_report(products_df: pd.DataFrame, pop_df: pd.DataFrame):
-    # Ensure County column exists
-    if 'County' in products_df.columns:
+def count_columns(products_df: pd.DataFrame) -> list:
+    """Numeric count columns that are summed into Total_Products."""
+    return [c for c in products_df.columns if c != 'County' and c not in COORD_COLS
+            and pd.api.types.is_numeric_dtype(products_df[c]) and not pd.api.types.is_bool_dtype(products_df[c])]
+
+
+def per_pwa(total, pwa) -> np.ndarray:
+    """total / pwa as floats, NaN where there are no PWAs."""
+    total = np.asarray(total, dtype=float)
+    pwa = np.asarray(pwa, dtype=float)
+    return np.divide(total, pwa, out=np.full(total.shape, np.nan), where=pwa > 0)
+
+
+@timed()
+def county_summary(products_df: pd.DataFrame, pop_df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate products to county and merge with population PWA counts."""
+    # Ensure County column exists (categorical County from clean_products is already normalized)
+    if 'County' in products_df.columns and not isinstance(products_df['County'].dtype, pd.CategoricalDtype):
         products_df['County'] = products_df['County'].str.upper().str.strip()
     # Aggregate products to county
-    numeric_cols = [c for c in products_df.columns if c != 'County' and products_df[c].dtype in ['int64', 'int32', 'float64']]
-    county_products = products_df.groupby('County')[numeric_cols].sum().reset_index()
+    numeric_cols = count_columns(products_df)
+    county_products = products_df.groupby('County', observed=True)[numeric_cols].sum().reset_index()
 
-    # Merge with population PWA counts
-    pop_sub = pop_df[['County', 'No_PWA_2019']].drop_duplicates('County')
+    # Merge with county-level PWA counts
+    pop_sub = county_pwa(pop_df)
     merged = county_products.merge(pop_sub, on='County', how='left')
     merged['No_PWA_2019'] = merged['No_PWA_2019'].fillna(0).astype(int)
 
     # Total products per county
     merged['Total_Products'] = merged[numeric_cols].sum(axis=1)
     # Products per PWA (avoid division by zero)
-    merged['Products_per_PWA'] = merged.apply(lambda r: r['Total_Products'] / r['No_PWA_2019'] if r['No_PWA_2019']>0 else None, axis=1)
+    merged['Products_per_PWA'] = per_pwa(merged['Total_Products'], merged['No_PWA_2019'])
+    return merged
+
+
+class CountyMetrics:
+    """County summary kept in memory so that new rows for one county or facility only update that county's
+    aggregates and the national totals, instead of re-aggregating every county.
+
+    `frame()` returns the same table as county_summary(products_df, pop_df) for the current rows.
+    """
+
+    def __init__(self, products_df: pd.DataFrame, pop_df: pd.DataFrame):
+        self.value_cols = count_columns(products_df)
+        self.facility_col = next((c for c in (FACILITY_COL, 'Facility') if c in products_df.columns), None)
+        pop = county_pwa(pop_df)
+        self.pwa = dict(zip(pop['County'].astype(str), pop['No_PWA_2019'].astype(int)))
+        self.by_facility = {}
+        rows = products_df[products_df['County'].notna()]
+        for county, sub in rows.groupby(rows['County'].astype(str), sort=True):
+            self.by_facility[county] = self._facility_sums(sub)
+        counties = list(self.by_facility)
+        values = np.array([self.by_facility[c].sum().to_numpy() for c in counties], dtype=np.int64).reshape(len(counties), len(self.value_cols))
+        self.summary = pd.DataFrame(values, index=pd.Index(counties, name='County'), columns=self.value_cols)
+        self.summary['No_PWA_2019'] = [self.pwa.get(c, 0) for c in counties]
+        self.summary['Total_Products'] = values.sum(axis=1)
+        self.summary['Products_per_PWA'] = per_pwa(self.summary['Total_Products'], self.summary['No_PWA_2019'])
+        self.totals = self.summary[self.value_cols + ['No_PWA_2019', 'Total_Products']].sum()
+
+    def _facility_sums(self, rows: pd.DataFrame) -> pd.DataFrame:
+        key = rows[self.facility_col].astype(str) if self.facility_col else pd.Series('', index=rows.index)
+        return rows[self.value_cols].astype('int64').groupby(key.to_numpy()).sum()
 
+    def _set_county(self, county: str):
+        new = self.by_facility[county].sum().reindex(self.value_cols, fill_value=0).astype('int64')
+        cols = self.value_cols + ['No_PWA_2019', 'Total_Products']
+        old = self.summary.loc[county, cols] if county in self.summary.index else pd.Series(0, index=cols)
+        pwa = self.pwa.get(county, 0)
+        total = int(new.sum())
+        self.summary.loc[county, self.value_cols] = new.to_numpy()
+        self.summary.loc[county, ['No_PWA_2019', 'Total_Products']] = [pwa, total]
+        self.summary.loc[county, 'Products_per_PWA'] = total / pwa if pwa > 0 else np.nan
+        self.totals += pd.Series(list(new) + [pwa, total], index=cols) - old.astype('int64')
+
+    def update_county(self, county: str, rows: pd.DataFrame):
+        """Replace every product row of `county` with `rows` (an empty frame removes its stock)."""
+        self.by_facility[county] = self._facility_sums(rows)
+        self._set_county(county)
+
+    def update_facility(self, county: str, facility: str, rows: pd.DataFrame):
+        """Replace the product rows of one facility in `county` with `rows`."""
+        sums = self.by_facility.get(county, pd.DataFrame(columns=self.value_cols, dtype='int64'))
+        sums = sums.drop(index=facility, errors='ignore')
+        if len(rows):
+            sums.loc[facility] = rows[self.value_cols].astype('int64').sum().to_numpy()
+        self.by_facility[county] = sums
+        self._set_county(county)
+
+    def frame(self) -> pd.DataFrame:
+        """Current county summary, in the same layout as county_summary()."""
+        out = self.summary.sort_index().reset_index()
+        int_cols = self.value_cols + ['No_PWA_2019', 'Total_Products']
+        out[int_cols] = out[int_cols].astype('int64')
+        return out
+
+    def top(self, column: str, k: int = 5) -> pd.DataFrame:
+        return self.summary.nlargest(k, column).reset_index()[['County', column]]
+
+
+@timed()
+def write_report(merged: pd.DataFrame, products_df: pd.DataFrame, out_dir: Path = OUT):
+    """Write county_summary.csv, the top-10 chart and summary.html for a county summary."""
+    # matplotlib takes longer to import than pandas; only runs that write the report need it
+    import matplotlib.pyplot as plt
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
     # Key summaries
     total_products = merged['Total_Products'].sum()
     total_pwa_2018 = products_df['Number_Of_Registered_Persons_With_Albinism'].astype(float).sum() if 'Number_Of_Registered_Persons_With_Albinism' in products_df.columns else None
     total_pwa_2019 = merged['No_PWA_2019'].sum()
 
-    top5_by_pwa = merged.sort_values('No_PWA_2019', ascending=False).head(5)[['County','No_PWA_2019']]
-    top5_by_products = merged.sort_values('Total_Products', ascending=False).head(5)[['County','Total_Products']]
+    top10 = merged.nlargest(10, 'Total_Products')
+    top5_by_pwa = merged.nlargest(5, 'No_PWA_2019')[['County','No_PWA_2019']]
+    top5_by_products = top10.head(5)[['County','Total_Products']]
 
     # Save merged table
-    merged.to_csv(OUT / 'county_summary.csv', index=False)
+    merged.to_csv(out_dir / 'county_summary.csv', index=False)
 
     # Simple bar chart: top 10 counties by Total_Products
-    top10 = merged.sort_values('Total_Products', ascending=False).head(10)
     ax = top10.plot.bar(x='County', y='Total_Products', legend=False, figsize=(10,5), rot=45)
     ax.set_ylabel('Total Products')
     plt.tight_layout()
-    plt.savefig(OUT / 'top10_total_products.png', dpi=200)
+    plt.savefig(out_dir / 'top10_total_products.png', dpi=200)
     plt.close()
 
     # Render a compact HTML summary
@@ -63,8 +153,16 @@ def compute_and_report(products_df: pd.DataFrame, pop_df: pd.DataFrame):
     html.append('<h2>Top 10 by products (chart)</h2>')
     html.append('<img src="top10_total_products.png" alt="top10"/>')
 
-    (OUT / 'summary.html').write_text('\n'.join(html), encoding='utf-8')
-    print('Report saved to outputs/summary.html')
+    (out_dir / 'summary.html').write_text('\n'.join(html), encoding='utf-8')
+
+
+def compute_and_report(products_df: pd.DataFrame, pop_df: pd.DataFrame, write: bool = True) -> pd.DataFrame:
+    merged = county_summary(products_df, pop_df)
+    if write:
+        write_report(merged, products_df)
+        results_store.save_run('analysis', {'county_summary': merged})
+        print('Report saved to outputs/summary.html')
+    return merged
 
 
 if __name__ == '__main__':
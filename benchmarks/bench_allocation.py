@@ -0,0 +1,147 @@
+"""bench_allocation.py
+Time the batched largest-remainder allocator (allocate_transfers) against the previous row-wise implementation,
+and check its guarantees: every transfer gets exactly min(units, releasable left) and no facility/product gives
+more than floor(stock * (1 - buffer)). The row-wise version rounds per facility and tops up from whole stocks, so
+its totals can miss the request and dip into the buffer; those transfers are counted.
+
+Usage:
+    python benchmarks/bench_allocation.py --counties 47 --facilities 500 --transfers 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from generate_picklists import PRODUCT_COLS, allocate_transfers, facility_table  # noqa: E402
+from benchmarks.synthetic import make_facilities, make_transfers  # noqa: E402
+
+
+def legacy_allocate_from_facilities(donors_df: pd.DataFrame, donor_county: str, need_units: int, buffer_pct: float):
+    """Row-wise implementation that predates index_facilities; kept as the benchmark baseline."""
+    df = donors_df[donors_df['County'] == donor_county].copy()
+    if df.empty:
+        return []
+    # compute total available per facility (sum product cols)
+    df['total_stock'] = df[PRODUCT_COLS].sum(axis=1)
+    # apply buffer
+    df['releasable'] = (df['total_stock'] * (1.0 - buffer_pct)).astype(int)
+    total_releasable = df['releasable'].sum()
+    to_give = min(total_releasable, need_units)
+    if to_give <= 0:
+        return []
+
+    allocations = []
+    # allocate proportional to each facility's releasable share
+    df = df[df['releasable']>0].copy()
+    df['share'] = df['releasable'] / df['releasable'].sum()
+    df['allocate_total'] = (df['share'] * to_give).round().astype(int)
+
+    # For each facility, allocate across product columns proportionally to their stock
+    for _, row in df.iterrows():
+        facility = row['Facility']
+        alloc_total = int(row['allocate_total'])
+        if alloc_total <= 0:
+            continue
+        prod_stocks = {pc: int(row[pc]) for pc in PRODUCT_COLS}
+        prod_sum = sum(prod_stocks.values())
+        if prod_sum == 0:
+            # nothing to allocate (odd), skip
+            continue
+        # allocate per product proportionally but cap by releasable per-product
+        for pc in PRODUCT_COLS:
+            share = prod_stocks[pc] / prod_sum if prod_sum>0 else 0
+            units = int(round(share * alloc_total))
+            # ensure not exceeding stock and not giving below buffer at product level
+            units = min(units, prod_stocks[pc])
+            if units>0:
+                # include metadata if available for the facility and product
+                meta = {}
+                if isinstance(row.get('_meta_cols', ''), str) and row.get('_meta_cols'):
+                    for c in row['_meta_cols'].split(','):
+                        if c:
+                            meta[c] = row.get(c, '')
+                allocations.append({'facility': facility, 'product': pc, 'units': units, 'meta': meta})
+    # If rounding left unmet units, try to fill from largest remaining stocks
+    allocated = sum(a['units'] for a in allocations)
+    remaining = to_give - allocated
+    if remaining>0:
+        # sort facilities by remaining releasable stock and fill
+        rem_list = []
+        for _, row in df.iterrows():
+            facility = row['Facility']
+            for pc in PRODUCT_COLS:
+                rem_stock = int(row[pc])
+                if rem_stock>0:
+                    rem_list.append((facility, pc, rem_stock))
+        rem_list = sorted(rem_list, key=lambda x: x[2], reverse=True)
+        idx = 0
+        while remaining>0 and idx < len(rem_list):
+            facility, pc, qty = rem_list[idx]
+            give = min(qty, remaining)
+            # try to include metadata if available
+            meta = {}
+            row = df[df['Facility']==facility]
+            if not row.empty and row.iloc[0].get('_meta_cols'):
+                for c in row.iloc[0]['_meta_cols'].split(','):
+                    if c:
+                        meta[c] = row.iloc[0].get(c, '')
+            allocations.append({'facility': facility, 'product': pc, 'units': give, 'meta': meta})
+            remaining -= give
+            idx += 1
+    return allocations
+
+
+
+def run_legacy(df, transfers, buffer_pct):
+    return [legacy_allocate_from_facilities(df, d, int(u), buffer_pct)
+            for d, u in zip(transfers['from_county'], transfers['units'])]
+
+
+def run_batched(df, transfers, buffer_pct):
+    return allocate_transfers(facility_table(df), transfers['from_county'], transfers['units'], buffer_pct)
+
+
+def check(df, transfers, picks, buffer_pct):
+    """Assert the batched allocation's conservation and buffer guarantees."""
+    caps = np.floor(df[PRODUCT_COLS].to_numpy() * (1.0 - buffer_pct)).astype(np.int64)
+    county = df['County'].to_numpy()
+    left = {c: int(caps[county == c].sum()) for c in np.unique(county)}
+    got = picks.groupby('transfer')['units'].sum()
+    for t, (donor, units) in enumerate(zip(transfers['from_county'], transfers['units'])):
+        expected = min(int(units), left.get(donor, 0))
+        assert got.get(t, 0) == expected, f'transfer {t}: {got.get(t, 0)} != {expected}'
+        left[donor] = left.get(donor, 0) - expected
+    drawn = picks.groupby(['facility', 'product'])['units'].sum()
+    stock = df.set_index('Facility')[PRODUCT_COLS]
+    assert all(u <= np.floor(stock.at[f, p] * (1.0 - buffer_pct)) for (f, p), u in drawn.items())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--facilities', type=int, default=200, help='facilities per county')
+    parser.add_argument('--transfers', type=int, default=100)
+    parser.add_argument('--buffer', type=float, default=0.1)
+    args = parser.parse_args()
+
+    df = make_facilities(args.counties, args.facilities)
+    transfers = make_transfers(df, args.transfers)
+    print(f'{len(df)} facilities, {len(transfers)} transfers')
+
+    t0 = time.perf_counter()
+    old = run_legacy(df, transfers, args.buffer)
+    t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new = run_batched(df, transfers, args.buffer)
+    t_new = time.perf_counter() - t0
+    check(df, transfers, new, args.buffer)
+
+    releasable = df.groupby('County')[PRODUCT_COLS].sum().sum(axis=1).mul(1.0 - args.buffer).astype(int)
+    missed = sum(sum(a['units'] for a in allocs) != min(int(u), releasable.get(d, 0))
+                 for allocs, d, u in zip(old, transfers['from_county'], transfers['units']))
+    print(f'row-wise: {t_old:.3f}s ({missed} of {len(transfers)} transfers off their requested total)')
+    print(f'batched:  {t_new:.3f}s ({t_old / t_new:.1f}x faster; exact totals, buffer respected)')
@@ -0,0 +1,59 @@
+"""bench_cleaning.py
+Ingestion time of a synthetic products log read as strings and cleaned column by column (schema=None, the
+previous reader) vs read with the declared schema (numbers parsed by the CSV reader).
+
+Streaming (stream_products) is timed by default so 10M-row files fit in memory; --whole times
+load_csv + clean_products instead. Both readers must produce identical totals.
+
+Usage:
+    python benchmarks/bench_cleaning.py                       # 10M rows
+    python benchmarks/bench_cleaning.py --rows 1000000 --whole
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import data_processing  # noqa: E402
+from benchmarks.synthetic import write_products_csv  # noqa: E402
+
+READERS = {'strings': None, 'schema': data_processing.PRODUCTS_SCHEMA}
+
+
+def run(path, schema, chunksize: int, whole: bool) -> pd.DataFrame:
+    """County totals of the log, computed with the given reader schema."""
+    if whole:
+        cleaned = data_processing.clean_products(data_processing.load_csv(path, schema))
+        return cleaned.groupby('County', observed=True).sum(numeric_only=True).astype('int64').reset_index()
+    county_totals, _ = data_processing.stream_products(path, chunksize, schema)
+    return county_totals.drop(columns='rows')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--path', help='Reuse an existing CSV instead of generating one')
+    parser.add_argument('--chunksize', type=int, default=data_processing.DEFAULT_CHUNKSIZE)
+    parser.add_argument('--whole', action='store_true', help='Time load_csv + clean_products instead of streaming')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = Path(tmp) / 'products_log.csv'
+            t0 = time.perf_counter()
+            write_products_csv(path, args.rows)
+            print(f'generated {args.rows} rows ({path.stat().st_size / 2**20:.0f} MB) in {time.perf_counter() - t0:.1f}s')
+        seconds, totals = {}, {}
+        for name, schema in READERS.items():
+            t0 = time.perf_counter()
+            totals[name] = run(path, schema, args.chunksize, args.whole)
+            seconds[name] = time.perf_counter() - t0
+            print(f'{name:>8}: {seconds[name]:8.2f}s')
+        pd.testing.assert_frame_equal(totals['strings'], totals['schema'], check_dtype=False)
+        print(f"speed-up: {seconds['strings'] / seconds['schema']:.1f}x (identical totals)")
@@ -0,0 +1,75 @@
+"""bench_incremental.py
+Re-planning after one county's stock changes: the full transfer_plan + generate_picklists rebuild (every
+picklist rewritten) against incremental.replan + write_outputs from the previous run's state. Both must
+produce the same picks.
+
+Usage:
+    python benchmarks/bench_incremental.py --counties 47 --facilities 200
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import generate_picklists  # noqa: E402
+import incremental  # noqa: E402
+import transfer_plan  # noqa: E402
+from generate_picklists import PRODUCT_COLS  # noqa: E402
+from benchmarks.synthetic import make_facilities  # noqa: E402
+
+
+def county_summary(facilities: pd.DataFrame, pwa: np.ndarray) -> pd.DataFrame:
+    summary = facilities.groupby('County', as_index=False, observed=True)[PRODUCT_COLS].sum()
+    summary['County'] = summary['County'].astype(str)
+    summary['Total_Products'] = summary[PRODUCT_COLS].sum(axis=1)
+    summary['No_PWA_2019'] = pwa
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--facilities', type=int, default=200, help='facilities per county')
+    parser.add_argument('--buffer', type=float, default=0.1)
+    args = parser.parse_args()
+
+    raw = make_facilities(args.counties, args.facilities)
+    # about half the counties short of the 20-per-PWA target
+    pwa = np.random.default_rng(1).integers(100, 2500 * args.facilities // 20, args.counties)
+    facilities = generate_picklists.facility_frame(raw)
+    summary = county_summary(facilities, pwa)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_dir, inc_dir = Path(tmp) / 'full', Path(tmp) / 'incremental'
+        trans_df, picks, state, report = incremental.replan(summary, facilities, args.buffer)
+        incremental.write_outputs(trans_df, picks, state, report, inc_dir)
+
+        # one donor county uploads new stock numbers
+        donor = trans_df.loc[trans_df['from_county'] != 'UNMET', 'from_county'].iloc[-1]
+        raw.loc[raw['County'] == donor, PRODUCT_COLS[0]] += 50
+        facilities = generate_picklists.facility_frame(raw)
+        summary = county_summary(facilities, pwa)
+
+        t0 = time.perf_counter()
+        full_plan = transfer_plan.build_plan(summary)[0]
+        full = generate_picklists.build_picklists(facilities, full_plan, args.buffer)
+        generate_picklists.write_picklists(full, args.buffer, full_dir)
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        trans_df, picks, state, report = incremental.replan(summary, facilities, args.buffer, state=state)
+        t_replan = time.perf_counter() - t0
+        incremental.write_outputs(trans_df, picks, state, report, inc_dir)
+        t_inc = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(picks, full)
+    print(f'{len(facilities)} facilities, {len(full_plan)} transfers, {full["from_county"].nunique()} donors; '
+          f'{donor} changed')
+    print(f'donors re-allocated: {len(report["reallocated"])}, picklists rewritten: {len(report["rewrite"])}')
+    print(f'full rebuild:  {t_full * 1e3:.1f} ms')
+    print(f'incremental:   {t_inc * 1e3:.1f} ms (re-plan {t_replan * 1e3:.1f} ms, {t_full / t_inc:.1f}x faster)')
@@ -0,0 +1,80 @@
+"""bench_inventory.py
+Cold start of a planning run from the products CSV (generate_picklists.load_products) vs from the memory-mapped
+inventory export (inventory.load), each in a fresh interpreter: time to map/parse the facilities, then to the
+first allocation (generate_picklists.allocate_transfers) and the first full picklist, plus the bytes sent to
+every pool worker.
+
+Usage:
+    python benchmarks/bench_inventory.py                       # 1M-row products log
+    python benchmarks/bench_inventory.py --rows 5000000 --transfers 500
+"""
+import argparse
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import pandas as pd  # noqa: E402
+
+import generate_picklists  # noqa: E402
+import inventory  # noqa: E402
+from benchmarks.synthetic import make_transfers, write_products_csv  # noqa: E402
+
+# Run in a fresh interpreter: time to facilities in memory, then to the first picklist
+COLD_START = '''
+import sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import pandas as pd
+import generate_picklists, inventory
+imported = time.perf_counter()
+facilities = {load}
+loaded = time.perf_counter()
+transfers = pd.read_pickle({transfers!r})
+table = facilities.table() if isinstance(facilities, inventory.Inventory) else generate_picklists.facility_table(facilities)
+generate_picklists.allocate_transfers(table, transfers['from_county'], transfers['units'], 0.1)
+allocated = time.perf_counter()
+picks = generate_picklists.build_picklists(facilities, transfers, 0.1)
+done = time.perf_counter()
+print(imported - t0, loaded - imported, allocated - loaded, done - allocated, int(picks['units'].sum()))
+'''
+
+
+def cold_start(load: str, transfers_path: Path) -> tuple:
+    code = COLD_START.format(root=str(ROOT), load=load, transfers=str(transfers_path))
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), float(out[1]), float(out[2]), float(out[3]), int(out[4])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Products rows (facility entries)')
+    parser.add_argument('--transfers', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv = Path(tmp) / 'products.csv'
+        write_products_csv(csv, args.rows, facilities_per_county=max(1, args.rows // 47))
+        t0 = time.perf_counter()
+        out_dir = inventory.export(csv, Path(tmp) / 'inventory')
+        print(f'{args.rows} facility rows ({csv.stat().st_size / 2**20:.0f} MB CSV); '
+              f'export {time.perf_counter() - t0:.2f}s')
+
+        inv = inventory.Inventory(out_dir)
+        transfers = make_transfers(pd.DataFrame({'County': inv.counties}), args.transfers)
+        transfers_path = Path(tmp) / 'transfers.pkl'
+        transfers.to_pickle(transfers_path)
+
+        csv_times = cold_start(f'generate_picklists.load_products({str(csv)!r})', transfers_path)
+        map_times = cold_start(f'inventory.Inventory({str(out_dir)!r})', transfers_path)
+        assert csv_times[4] == map_times[4], 'picklists differ between the CSV and the mapped inventory'
+        for name, (imp, load, alloc, plan, _) in (('csv', csv_times), ('mapped', map_times)):
+            print(f'{name:>7}: load {load * 1e3:9.1f} ms   first allocation {alloc * 1e3:8.1f} ms   '
+                  f'picklist {plan * 1e3:8.1f} ms   (imports {imp:.2f}s)')
+        frame = generate_picklists.load_products(csv)
+        print(f'to each pool worker: frame {len(pickle.dumps(frame)) / 2**20:.1f} MB pickled, '
+              f'inventory {len(pickle.dumps(inv))} bytes (mapped from the page cache)')
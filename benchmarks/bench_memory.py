@@ -0,0 +1,64 @@
+"""bench_memory.py
+Memory footprint and county groupby time of the cleaned products / facility frames, comparing the compact
+schema (categorical names, smallest integer widths, frame-level meta) with the previous object/int64 layout.
+
+Usage:
+    python benchmarks/bench_memory.py --rows 1000000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import data_processing  # noqa: E402
+import generate_picklists  # noqa: E402
+from benchmarks.synthetic import write_products_csv  # noqa: E402
+
+
+def widen(df: pd.DataFrame) -> pd.DataFrame:
+    """The pre-compaction layout: object strings for names and int64 for every count."""
+    wide = df.copy()
+    for col in wide.columns:
+        if isinstance(wide[col].dtype, pd.CategoricalDtype):
+            wide[col] = wide[col].astype(object)
+        elif pd.api.types.is_integer_dtype(wide[col]):
+            wide[col] = wide[col].astype('int64')
+    return wide
+
+
+def report(label: str, df: pd.DataFrame, repeat: int = 5):
+    mb = df.memory_usage(deep=True).sum() / 2**20
+    cols = [c for c in generate_picklists.PRODUCT_COLS if c in df.columns]
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        df.groupby('County', observed=True)[cols].sum()
+    ms = (time.perf_counter() - t0) / repeat * 1000
+    print(f'{label:<28} {mb:10.1f} MB   groupby(County) {ms:8.1f} ms')
+    return mb
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--facilities', type=int, default=100, help='facilities per county')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_products_csv(Path(tmp) / 'products.csv', args.rows, facilities_per_county=args.facilities)
+        cleaned = data_processing.clean_products(data_processing.load_csv(path))
+        facilities = generate_picklists.facility_frame(cleaned)
+
+    legacy_facilities = widen(facilities)
+    legacy_facilities['_meta_cols'] = ','.join(facilities.attrs['meta_cols'])
+
+    print(f'{args.rows} rows')
+    before = report('clean_products (before)', widen(cleaned))
+    after = report('clean_products (compact)', cleaned)
+    print(f'{"":<28} {before / after:10.1f}x smaller')
+    before = report('facility_frame (before)', legacy_facilities)
+    after = report('facility_frame (compact)', facilities)
+    print(f'{"":<28} {before / after:10.1f}x smaller')
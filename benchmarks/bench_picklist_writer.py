@@ -0,0 +1,62 @@
+"""bench_picklist_writer.py
+Time writing per-donor picklists: the previous serial writer (two groupbys, one file at a time) against
+write_picklists with a thread pool, and the single-archive zip mode.
+
+Usage:
+    python benchmarks/bench_picklist_writer.py --counties 400 --facilities 50 --transfers 2000 --workers 8
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from generate_picklists import build_picklists, facility_frame, write_picklists  # noqa: E402
+from benchmarks.synthetic import make_facilities, make_transfers  # noqa: E402
+
+
+def legacy_write_picklists(pick_df: pd.DataFrame, buffer_pct: float, out_dir: Path):
+    """Serial writer that predates the thread pool; kept as the benchmark baseline."""
+    pick_dir = Path(out_dir) / 'picklists'
+    pick_dir.mkdir(parents=True, exist_ok=True)
+    pick_df.to_csv(pick_dir / 'transfer_picklists_combined.csv', index=False)
+    for donor, sub in pick_df[pick_df['from_county'] != 'UNMET'].groupby('from_county'):
+        html = [f"<h1>Picklist: {donor}</h1>", f"<p>Buffer percent applied: {buffer_pct*100:.1f}%</p>",
+                sub.to_html(index=False)]
+        (pick_dir / f"{donor}_picklist.html").write_text('\n'.join(html), encoding='utf-8')
+    for donor, sub in pick_df[pick_df['from_county'] != 'UNMET'].groupby('from_county'):
+        sub.to_csv(pick_dir / f"{donor}_picklist.csv", index=False)
+
+
+def timed(fn, *args, **kwargs) -> float:
+    t0 = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counties', type=int, default=200)
+    parser.add_argument('--facilities', type=int, default=50, help='facilities per county')
+    parser.add_argument('--transfers', type=int, default=1000)
+    parser.add_argument('--buffer', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    facilities = facility_frame(make_facilities(args.counties, args.facilities))
+    pick_df = build_picklists(facilities, make_transfers(facilities, args.transfers), args.buffer)
+    print(f"{len(pick_df)} pick lines, {pick_df['from_county'].nunique()} donors")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t_old = timed(legacy_write_picklists, pick_df, args.buffer, tmp / 'serial')
+        t_new = timed(write_picklists, pick_df, args.buffer, tmp / 'threaded', workers=args.workers)
+        t_zip = timed(write_picklists, pick_df, args.buffer, tmp / 'zip', fmt='zip', workers=args.workers)
+        for f in (tmp / 'serial' / 'picklists').iterdir():
+            assert f.read_bytes() == (tmp / 'threaded' / 'picklists' / f.name).read_bytes(), f.name
+    print(f'serial:   {t_old:.3f}s')
+    print(f'threaded: {t_new:.3f}s ({t_old / t_new:.1f}x faster)')
+    print(f'zip:      {t_zip:.3f}s ({t_old / t_zip:.1f}x faster)')
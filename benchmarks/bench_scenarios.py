@@ -0,0 +1,56 @@
+"""bench_scenarios.py
+Time a grid of target-per-PWA scenarios (scenarios.run_scenarios) over synthetic counties.
+
+Usage:
+    python benchmarks/bench_scenarios.py                               # 1,000 targets x 47 counties
+    python benchmarks/bench_scenarios.py --scenarios 10000 --processes 4
+    python benchmarks/bench_scenarios.py --modes greedy --by-product
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import planner  # noqa: E402
+import scenarios  # noqa: E402
+from generate_picklists import PRODUCT_COLS  # noqa: E402
+
+
+def make_summary(n_counties: int, seed: int = 0):
+    """County summary with per-product stock and random centroids: (summary_df, centroids)."""
+    rng = np.random.default_rng(seed)
+    counties = [f'COUNTY_{i:04d}' for i in range(n_counties)]
+    df = pd.DataFrame({'County': counties, 'No_PWA_2019': rng.integers(0, 800, n_counties)})
+    for pc in PRODUCT_COLS:
+        df[pc] = rng.integers(0, 4000, n_counties)
+    df['Total_Products'] = df[PRODUCT_COLS].sum(axis=1)
+    centroids = pd.DataFrame({'County': counties, 'lon': rng.uniform(34.0, 41.0, n_counties),
+                              'lat': rng.uniform(-4.5, 4.5, n_counties)})
+    return df, centroids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenarios', type=int, default=1000)
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--modes', nargs='+', default=list(planner.MODES), choices=planner.MODES)
+    parser.add_argument('--by-product', action='store_true', help='Scale per-product targets instead')
+    parser.add_argument('--processes', type=int, default=1)
+    args = parser.parse_args()
+
+    summary, centroids = make_summary(args.counties)
+    if args.by_product:
+        grid = scenarios.product_grid({pc: 5 for pc in PRODUCT_COLS}, np.linspace(0.1, 4, args.scenarios))
+    else:
+        grid = scenarios.per_person_grid(np.linspace(1, 100, args.scenarios))
+    for mode in args.modes:
+        t0 = time.perf_counter()
+        table = scenarios.run_scenarios(summary, grid, mode, centroids, args.processes)
+        seconds = time.perf_counter() - t0
+        print(f'{mode:>8}: {len(table)} scenarios x {args.counties} counties in {seconds:.3f}s '
+              f"({table['transfers'].sum()} transfers)")
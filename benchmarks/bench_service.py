@@ -0,0 +1,142 @@
+"""bench_service.py
+Load test of the planning service (service.py): requests per second and latency percentiles over keep-alive
+connections, first for cold queries (each computed once on the worker pool) then for repeated (cached) ones.
+
+A local instance is started on a free port unless --url points at a running one.
+
+Usage:
+    python benchmarks/bench_service.py                                 # 50 connections, 10s per phase
+    python benchmarks/bench_service.py --connections 200 --seconds 30 --workers 4
+    python benchmarks/bench_service.py --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=2) as r:
+                return r.read()
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def cold_paths(n: int) -> list:
+    """n distinct plan/picklist/scenario queries (none cached yet)."""
+    paths = []
+    for i in range(n):
+        target = 5 + i * 0.25
+        kind = i % 3
+        if kind == 0:
+            paths.append(f'/plan?target={target}')
+        elif kind == 1:
+            paths.append(f'/picklist?donor=NAIROBI&buffer=0.1&target={target}')
+        else:
+            paths.append(f'/scenarios?start={target}&stop={target + 20}&step=0.5')
+    return paths
+
+
+HOT_PATHS = ['/summary', '/summary?county=KISII', '/plan?target=20', '/plan?target=20&by_product=1',
+             '/picklist?donor=NAIROBI&buffer=0.1', '/picklist?donor=MOMBASA&buffer=0.2&strategy=nearest',
+             '/scenarios?start=1&stop=100&step=1']
+
+
+async def client(host: str, port: int, paths: list, deadline: float, latencies: list, errors: list, next_path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = next_path(paths)
+            if path is None:
+                break
+            t0 = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+            await writer.drain()
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int(head.lower().split(b'content-length:')[1].split(b'\r\n')[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+            if not head.startswith(b'HTTP/1.1 200'):
+                errors.append(path)
+    finally:
+        writer.close()
+
+
+async def phase(host: str, port: int, paths: list, connections: int, seconds: float, cycle: bool) -> dict:
+    latencies, errors = [], []
+    state = {'i': 0}
+
+    def next_path(paths):
+        i = state['i']
+        state['i'] += 1
+        if i >= len(paths) and not cycle:
+            return None
+        return paths[i % len(paths)]
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(host, port, paths, t0 + seconds, latencies, errors, next_path)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - t0
+    ms = np.array(latencies) * 1000
+    return {'requests': len(ms), 'errors': len(errors), 'rps': len(ms) / elapsed,
+            'p50': np.percentile(ms, 50) if len(ms) else float('nan'),
+            'p99': np.percentile(ms, 99) if len(ms) else float('nan')}
+
+
+def report(name: str, r: dict):
+    print(f"{name:>6}: {r['requests']:7d} requests ({r['errors']} errors)  {r['rps']:9.1f} req/s  "
+          f"p50 {r['p50']:7.2f} ms  p99 {r['p99']:7.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='Running instance (default: start one)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes of the started instance')
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=10.0, help='Duration of the cached phase')
+    parser.add_argument('--cold', type=int, default=60, help='Distinct uncached queries in the cold phase')
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        cmd = [sys.executable, str(ROOT / 'service.py'), '--port', str(port)]
+        if args.workers:
+            cmd += ['--workers', str(args.workers)]
+        proc = subprocess.Popen(cmd, cwd=ROOT)
+        url = f'http://127.0.0.1:{port}'
+    try:
+        t0 = time.perf_counter()
+        wait_ready(url)
+        print(f'instance ready in {time.perf_counter() - t0:.2f}s at {url}')
+        host, port = urlsplit(url).hostname, urlsplit(url).port
+        report('cold', asyncio.run(phase(host, port, cold_paths(args.cold), min(args.connections, args.cold),
+                                         600.0, cycle=False)))
+        # warm every hot query once, then measure repeated queries only
+        asyncio.run(phase(host, port, HOT_PATHS, 1, 600.0, cycle=False))
+        report('cached', asyncio.run(phase(host, port, HOT_PATHS, args.connections, args.seconds, cycle=True)))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
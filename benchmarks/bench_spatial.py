@@ -0,0 +1,64 @@
+"""bench_spatial.py
+Time k-nearest facility queries from many recipient points: FacilityIndex (k-d tree) against a brute-force
+haversine scan over every facility, and check both return the same neighbours.
+
+Usage:
+    python benchmarks/bench_spatial.py --counties 47 --facilities 2000 --queries 5000 --k 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from planner import haversine_km  # noqa: E402
+from spatial import FacilityIndex  # noqa: E402
+from benchmarks.synthetic import make_facilities  # noqa: E402
+
+PRODUCT = 'Distibuted_Sunscreen_Lotions'
+
+
+def with_coords(df, seed: int = 0):
+    """Scatter facilities over Kenya's bounding box."""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    df['Centroid_x'] = rng.uniform(33.9, 41.9, len(df))
+    df['Centoid_Y'] = rng.uniform(-4.7, 5.0, len(df))
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--facilities', type=int, default=500, help='facilities per county')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    df = with_coords(make_facilities(args.counties, args.facilities))
+    rng = np.random.default_rng(1)
+    qlon, qlat = rng.uniform(33.9, 41.9, args.queries), rng.uniform(-4.7, 5.0, args.queries)
+
+    t0 = time.perf_counter()
+    index = FacilityIndex(df)
+    index.query(qlon[:1], qlat[:1], args.k, PRODUCT)  # builds the product tree
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    dist, rows = index.query(qlon, qlat, args.k, PRODUCT)
+    t_tree = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    has_stock = np.flatnonzero(index.releasable[:, 0] > 0)
+    brute = np.empty((args.queries, args.k))
+    for n in range(args.queries):
+        d = haversine_km(index.lon[has_stock], index.lat[has_stock], qlon[n], qlat[n])
+        brute[n] = np.sort(np.partition(d, args.k - 1)[:args.k])
+    t_brute = time.perf_counter() - t0
+
+    assert np.allclose(dist, brute, atol=1e-6), 'k-d tree neighbours differ from the brute-force scan'
+    print(f'{len(index.lon)} facilities, {args.queries} queries, k={args.k}')
+    print(f'build:       {t_build:.3f}s')
+    print(f'brute force: {t_brute:.3f}s ({t_brute / args.queries * 1e3:.2f} ms/query)')
+    print(f'k-d tree:    {t_tree:.3f}s ({t_tree / args.queries * 1e3:.2f} ms/query, {t_brute / t_tree:.1f}x faster)')
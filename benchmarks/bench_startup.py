@@ -0,0 +1,100 @@
+"""bench_startup.py
+Import time of every CLI entry point, from `python -X importtime`, for this tree and optionally an older
+revision (--ref), plus a check that importing creates no directories.
+
+Each tree is copied into a scratch directory without outputs/ and data/, so any directory that appears
+there after `import <module>` was created as an import side effect.
+
+Usage:
+    python benchmarks/bench_startup.py                  # current tree
+    python benchmarks/bench_startup.py --ref HEAD~1     # before / after
+"""
+import argparse
+import io
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENTRY_POINTS = ['data_processing', 'analysis', 'insights', 'transfer_plan', 'generate_picklists', 'sensitivity',
+                'executive_brief', 'pipeline', 'incremental', 'spatial', 'streamlit_app']
+# Directories the scripts write to; none of them should exist after a bare import
+SIDE_EFFECT_DIRS = ('outputs', 'data')
+SKIP = ('.git', 'outputs', 'data', 'benchmarks', 'tests', '__pycache__', '*.csv', '*.ipynb')
+
+
+def copy_worktree(dest: Path) -> Path:
+    shutil.copytree(ROOT, dest, ignore=shutil.ignore_patterns(*SKIP))
+    return dest
+
+
+def copy_revision(ref: str, dest: Path) -> Path:
+    archive = subprocess.run(['git', 'archive', '--format=tar', ref], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest, members=[m for m in tar.getmembers() if m.name.endswith(('.py', '.json'))
+                                      and m.name.split('/')[0] not in SKIP])
+    return dest
+
+
+def import_ms(tree: Path, module: str):
+    """(cumulative import ms of module, directories created) for one fresh interpreter, or (None, error)."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=tree,
+                          capture_output=True, text=True)
+    created = [d for d in SIDE_EFFECT_DIRS if (tree / d).exists()]
+    for d in created:
+        shutil.rmtree(tree / d)
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1]
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000.0, created
+    return None, 'module not found in -X importtime output'
+
+
+def measure(tree: Path, repeat: int) -> dict:
+    """{module: (best import ms over repeat runs, directories created)}."""
+    results = {}
+    for module in ENTRY_POINTS:
+        runs = [import_ms(tree, module) for _ in range(repeat)]
+        times = [ms for ms, _ in runs if ms is not None]
+        results[module] = (min(times) if times else None, runs[-1][1])
+    return results
+
+
+def fmt(ms) -> str:
+    return f'{ms:9.1f}' if ms is not None else f'{"n/a":>9}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ref', default=None, help='Also measure this git revision (e.g. HEAD~1)')
+    parser.add_argument('--repeat', type=int, default=3, help='Interpreter launches per entry point (best is kept)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        after = measure(copy_worktree(Path(tmp) / 'current'), args.repeat)
+        before = measure(copy_revision(args.ref, Path(tmp) / 'ref'), args.repeat) if args.ref else None
+
+    side_effects = False
+    header = f'{"entry point":20s} {"import ms":>9}' + (f' {args.ref + " ms":>12} {"saved":>9}' if before else '')
+    print(header)
+    for module in ENTRY_POINTS:
+        ms, created = after[module]
+        line = f'{module:20s} {fmt(ms)}'
+        if before:
+            ref_ms = before[module][0]
+            saved = ref_ms - ms if ms is not None and ref_ms is not None else None
+            line += f' {fmt(ref_ms):>12} {fmt(saved)}'
+        if before and before[module][1] and not isinstance(before[module][1], str):
+            line += f'  ({args.ref} created {", ".join(d + "/" for d in before[module][1])} on import)'
+        if isinstance(created, str):
+            line += f'  ({created})'
+        elif created:
+            side_effects = True
+            line += f'  created {", ".join(d + "/" for d in created)} on import'
+        print(line)
+    sys.exit(1 if side_effects else 0)
@@ -0,0 +1,76 @@
+"""bench_streaming.py
+Peak RSS of whole-file ingestion (load_csv + clean_products) vs streaming (stream_products) on a synthetic log.
+
+Each mode runs in a fresh child process so its peak RSS is measured in isolation (Unix only).
+
+Usage:
+    python benchmarks/bench_streaming.py --size-mb 500
+    python benchmarks/bench_streaming.py --size-mb 5120 --modes stream   # 5 GB; whole-file mode may not fit in RAM
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS of this process. VmHWM resets on exec, unlike ru_maxrss which a child inherits."""
+    status = Path('/proc/self/status')
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def measure(mode: str, path: str, chunksize: int) -> dict:
+    import data_processing
+    t0 = time.perf_counter()
+    if mode == 'full':
+        df = data_processing.clean_products(data_processing.load_csv(path))
+        rows = len(df)
+        df.groupby('County').sum(numeric_only=True)
+    else:
+        county_totals, _ = data_processing.stream_products(path, chunksize)
+        rows = int(county_totals['rows'].sum())
+    seconds = time.perf_counter() - t0
+    return {'mode': mode, 'rows': rows, 'seconds': round(seconds, 2), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=float, default=200, help='Size of the synthetic products log')
+    parser.add_argument('--path', help='Reuse an existing CSV instead of generating one')
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--modes', nargs='+', default=['full', 'stream'], choices=['full', 'stream'])
+    parser.add_argument('--measure', choices=['full', 'stream'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.path, args.chunksize)))
+        raise SystemExit(0)
+
+    from benchmarks.synthetic import PRODUCTS_ROW_BYTES, write_products_csv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = str(Path(tmp) / 'products_log.csv')
+            n_rows = int(args.size_mb * 2**20 / PRODUCTS_ROW_BYTES)
+            t0 = time.perf_counter()
+            write_products_csv(path, n_rows)
+            print(f'generated {n_rows} rows ({Path(path).stat().st_size / 2**20:.0f} MB) in {time.perf_counter() - t0:.1f}s')
+        for mode in args.modes:
+            out = subprocess.run([sys.executable, __file__, '--measure', mode, '--path', path,
+                                  '--chunksize', str(args.chunksize)], capture_output=True, text=True, check=True)
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{res['mode']:>6}: {res['rows']} rows in {res['seconds']}s, peak RSS {res['peak_rss_mb']} MB")
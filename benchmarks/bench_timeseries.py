@@ -0,0 +1,46 @@
+"""bench_timeseries.py
+Build rolling stock (timeseries.StockHistory) and a FEFO allocation over a synthetic multi-period delivery log.
+
+Usage:
+    python benchmarks/bench_timeseries.py                                # 300 periods x 4,700 facilities
+    python benchmarks/bench_timeseries.py --rows 5000000 --periods 600 --facilities 200
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import timeseries  # noqa: E402
+from benchmarks.synthetic import make_deliveries, make_transfers  # noqa: E402
+
+
+def step(label: str, fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    print(f'{label:<16} {time.perf_counter() - t0:8.3f}s')
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Deliveries in the log')
+    parser.add_argument('--periods', type=int, default=300)
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--facilities', type=int, default=100, help='Facilities per county')
+    parser.add_argument('--transfers', type=int, default=500)
+    args = parser.parse_args()
+
+    log = make_deliveries(args.rows, args.periods, args.counties, args.facilities)
+    batches = step('batches', timeseries.batches, log)
+    history = step('stock history', timeseries.StockHistory, batches)
+    print(f'  {len(history.periods)} periods x {len(history.facilities)} facilities, {len(batches)} batches')
+    t0 = time.perf_counter()
+    for when in history.periods[::max(1, len(history.periods) // 100)]:
+        history.at(when)
+    print(f'{"as-of lookup":<16} {(time.perf_counter() - t0) / min(100, len(history.periods)) * 1000:8.3f}ms each')
+    step('by county', history.by_county)
+    transfers = make_transfers(history.facilities, args.transfers)
+    picks = step('fefo allocate', timeseries.allocate_fefo, batches, transfers, 0.1)
+    print(f'  {len(picks)} picks, {int(picks["units"].sum())} units')
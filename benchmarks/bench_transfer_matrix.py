@@ -0,0 +1,70 @@
+"""bench_transfer_matrix.py
+Summaries of a large multi-commodity plan (units by donor, recipient and product, top recipients, one donor's
+lanes): groupbys over the plan frame (the previous format_summary code) vs TransferMatrix reductions.
+
+Usage:
+    python benchmarks/bench_transfer_matrix.py                      # ~10^5 transfer lines
+    python benchmarks/bench_transfer_matrix.py --counties 200 --products 5000 --repeat 20
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import planner  # noqa: E402
+from transfer_matrix import TransferMatrix  # noqa: E402
+
+
+def groupby_summaries(plan: pd.DataFrame) -> tuple:
+    by_donor = plan.groupby('from_county')['units'].sum().reset_index().sort_values('units', ascending=False)
+    by_recipient = plan.groupby('to_county')['units'].sum().reset_index().sort_values('units', ascending=False)
+    moved = plan['from_county'] != 'UNMET'
+    by_product = pd.DataFrame({'planned_units': plan[moved].groupby('product')['units'].sum(),
+                               'unmet_units': plan[~moved].groupby('product')['units'].sum()}).fillna(0).astype(int)
+    donor = plan[plan['from_county'] == by_donor['from_county'].iloc[0]]
+    return by_donor, by_recipient, by_product, by_recipient.head(5), donor
+
+
+def matrix_summaries(plan: pd.DataFrame) -> tuple:
+    m = TransferMatrix.from_plan(plan)
+    by_donor = m.by_donor()
+    return by_donor, m.by_recipient(), m.by_product(), m.top(5), m.for_donor(by_donor['from_county'].iloc[0])
+
+
+def best_of(fn, plan, repeat: int) -> tuple:
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(plan)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--products', type=int, default=2500, help='SKUs')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    counties = np.array([f'COUNTY_{i:04d}' for i in range(args.counties)], dtype=object)
+    products = [f'SKU_{j:05d}' for j in range(args.products)]
+    surplus = rng.integers(-5000, 5000, (args.counties, args.products))
+    plan = planner.product_plan(counties, products, surplus)
+    print(f'{len(plan)} transfer lines ({args.counties} counties x {args.products} products)')
+
+    t_old, old = best_of(groupby_summaries, plan, args.repeat)
+    t_new, new = best_of(matrix_summaries, plan, args.repeat)
+    assert old[0].set_index('from_county')['units'].to_dict() == new[0].set_index('from_county')['units'].to_dict()
+    assert old[1].set_index('to_county')['units'].to_dict() == new[1].set_index('to_county')['units'].to_dict()
+    assert (old[2].to_numpy() == new[2][['planned_units', 'unmet_units']].to_numpy()).all()
+    m = TransferMatrix.from_plan(plan)
+    codes = m.donor.nbytes + m.recipient.nbytes + m.product.nbytes + m.units.nbytes
+    print(f'groupby: {t_old * 1e3:8.1f} ms   plan frame {plan.memory_usage(deep=True).sum() / 2**20:6.1f} MB')
+    print(f' matrix: {t_new * 1e3:8.1f} ms   coded entries {codes / 2**20:6.1f} MB '
+          f'({t_old / t_new:.1f}x faster, identical summaries)')
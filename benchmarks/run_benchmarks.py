@@ -0,0 +1,127 @@
+"""run_benchmarks.py
+Time every pipeline stage on synthetic inputs of configurable size and record peak traced memory.
+
+Stages: clean_products, clean_population, county_summary, plan_greedy, plan_mincost, allocate.
+Results are written as JSON (one record per size x stage) to benchmarks/results/<label>.json; the label
+defaults to the current git commit so runs can be compared across commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py                                  # quick matrix
+    python benchmarks/run_benchmarks.py --rows 1000 100000 10000000 --facilities 10 1000 10000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<older>.json --threshold 1.25
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import analysis  # noqa: E402
+import data_processing  # noqa: E402
+import generate_picklists  # noqa: E402
+import planner  # noqa: E402
+from benchmarks.synthetic import write_dataset  # noqa: E402
+
+RESULTS_DIR = ROOT / 'benchmarks' / 'results'
+
+
+def git_label() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'local'
+
+
+def timed(records: list, case: dict, stage: str, rows: int, fn, *args, **kwargs):
+    """Run fn once, appending wall time and peak traced memory (above the live baseline) to records."""
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    records.append(dict(case, stage=stage, rows=int(rows), seconds=round(seconds, 5),
+                        peak_mb=round((peak - base) / 2**20, 3)))
+    print(f"  {stage:<16} {seconds:9.3f}s {(peak - base) / 2**20:9.1f} MB")
+    return result
+
+
+def run_case(n_rows: int, facilities_per_county: int, n_counties: int, buffer_pct: float) -> list:
+    case = {'n_rows': n_rows, 'facilities_per_county': facilities_per_county, 'n_counties': n_counties}
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        products_csv, population_csv = write_dataset(tmp, n_rows, facilities_per_county, n_counties)
+        products = timed(records, case, 'clean_products', n_rows, lambda: data_processing.clean_products(data_processing.load_csv(products_csv)))
+        population = timed(records, case, 'clean_population', n_counties, lambda: data_processing.clean_population(data_processing.load_csv(population_csv)))
+
+    summary = timed(records, case, 'county_summary', len(products), analysis.county_summary, products, population)
+    # a target at the median coverage splits counties roughly evenly into donors and recipients
+    ratio = summary['Total_Products'] / summary['No_PWA_2019'].where(summary['No_PWA_2019'] > 0)
+    target = float(np.nanmedian(ratio)) if ratio.notna().any() else planner.TARGET_PER_PERSON
+    donors, recips = planner.split_donors_recipients(planner.surplus_table(summary, target))
+    centroids = planner.county_centroids(products)
+    plan = timed(records, case, 'plan_greedy', len(donors) + len(recips), planner.greedy_plan, donors, recips)
+    timed(records, case, 'plan_mincost', len(donors) + len(recips), planner.mincost_plan, donors, recips, centroids)
+
+    facilities = generate_picklists.facility_frame(products)
+    timed(records, case, 'allocate', len(facilities), generate_picklists.build_picklists, facilities, plan, buffer_pct)
+    return records
+
+
+def compare(current: pd.DataFrame, baseline_path: Path, threshold: float, min_seconds: float = 0.05) -> bool:
+    """Print per-stage time ratios against a previous results file; True if any stage regressed.
+
+    Stages faster than min_seconds in both runs are reported but never count as regressions (timer noise).
+    """
+    baseline = pd.DataFrame(json.loads(Path(baseline_path).read_text())['results'])
+    keys = ['n_rows', 'facilities_per_county', 'n_counties', 'stage']
+    merged = current.merge(baseline[keys + ['seconds']], on=keys, suffixes=('', '_baseline'))
+    merged['ratio'] = merged['seconds'] / merged['seconds_baseline'].where(merged['seconds_baseline'] > 0)
+    slow = merged[['seconds', 'seconds_baseline']].max(axis=1) >= min_seconds
+    merged['regressed'] = (merged['ratio'] > threshold) & slow
+    print(merged[keys + ['seconds_baseline', 'seconds', 'ratio', 'regressed']].to_string(index=False))
+    return bool(merged['regressed'].any())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000], help='Products rows per case')
+    parser.add_argument('--facilities', type=int, nargs='+', default=[10, 100], help='Facilities per county')
+    parser.add_argument('--counties', type=int, default=47)
+    parser.add_argument('--buffer', type=float, default=0.1)
+    parser.add_argument('--label', default=None, help='Results file name (default: git commit)')
+    parser.add_argument('--compare', default=None, help='Previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Time ratio that counts as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='Ignore regressions in stages faster than this')
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    records = []
+    for n_rows in args.rows:
+        for facilities_per_county in args.facilities:
+            print(f'rows={n_rows} facilities/county={facilities_per_county} counties={args.counties}')
+            records += run_case(n_rows, facilities_per_county, args.counties, args.buffer)
+    tracemalloc.stop()
+
+    label = args.label or git_label()
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f'{label}.json'
+    meta = {'label': label, 'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'machine': platform.machine()}
+    out.write_text(json.dumps({'meta': meta, 'results': records}, indent=1), encoding='utf-8')
+    print('Wrote', out)
+
+    if args.compare and compare(pd.DataFrame(records), Path(args.compare), args.threshold, args.min_seconds):
+        raise SystemExit('performance regression beyond threshold')
@@ -0,0 +1,154 @@
+"""synthetic.py
+Synthetic inputs for benchmarks, with the same layouts as the real files:
+ - facility inventories / transfer plans as DataFrames (make_facilities, make_transfers)
+ - products/distribution CSVs (write_products_csv), 10^3 to 10^7+ rows, any number of facilities per county
+ - census population CSVs with the two-row header and the KENYA / Rural / Urban / county / sub-county
+   rows in one flat list (write_population_csv)
+ - multi-period delivery logs with batch expiry dates (make_deliveries)
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from generate_picklists import PRODUCT_COLS
+
+
+def make_facilities(n_counties: int = 47, facilities_per_county: int = 100, seed: int = 0) -> pd.DataFrame:
+    """Return a facility-level frame (County, Facility, PRODUCT_COLS) with random stock counts."""
+    rng = np.random.default_rng(seed)
+    n = n_counties * facilities_per_county
+    counties = np.repeat([f'COUNTY_{i:04d}' for i in range(n_counties)], facilities_per_county)
+    df = pd.DataFrame({'County': counties, 'Facility': [f'Facility {i}' for i in range(n)]})
+    for pc in PRODUCT_COLS:
+        df[pc] = rng.integers(0, 500, size=n)
+    return df
+
+
+def make_transfers(facilities: pd.DataFrame, n_transfers: int = 200, seed: int = 0) -> pd.DataFrame:
+    """Return a transfer plan (from_county, to_county, units) drawing donors from `facilities`."""
+    rng = np.random.default_rng(seed)
+    counties = facilities['County'].unique()
+    return pd.DataFrame({
+        'from_county': rng.choice(counties, size=n_transfers),
+        'to_county': rng.choice(counties, size=n_transfers),
+        'units': rng.integers(1, 5000, size=n_transfers),
+    })
+
+
+PRODUCTS_HEADER = ['County', 'Distribution_Centres_Hospitals/Health_Centres', 'Number_Of_Registered_Persons_With_Albinism',
+                   *PRODUCT_COLS, 'Financial_Year_Ending', 'Centroid_x', 'Centoid_Y', 'OBJECTID']
+# Rough size of one synthetic products row on disk, used to size files in megabytes
+PRODUCTS_ROW_BYTES = 85
+
+
+def write_products_csv(path, n_rows: int, n_counties: int = 47, facilities_per_county: int = 10,
+                       seed: int = 0, block: int = 500_000) -> Path:
+    """Write a products/distribution log with the real column layout, block by block (bounded memory)."""
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    n_fac = n_counties * facilities_per_county
+    fac_county = np.repeat(np.arange(n_counties), facilities_per_county)
+    lon = rng.uniform(34.0, 41.0, n_counties)
+    lat = rng.uniform(-4.5, 4.5, n_counties)
+    years = np.array(['6/30/2015', '6/30/2016', '6/30/2017', '6/30/2018', '6/30/2019'])
+    with path.open('w', encoding='utf-8', newline='') as f:
+        f.write(','.join(PRODUCTS_HEADER) + '\n')
+        for start in range(0, n_rows, block):
+            n = min(block, n_rows - start)
+            fac = rng.integers(0, n_fac, n)
+            county = fac_county[fac]
+            df = pd.DataFrame({
+                'County': np.char.add('County ', county.astype(str)),  # county_name(i)
+                'Distribution_Centres_Hospitals/Health_Centres': np.char.add('Facility ', fac.astype(str)),
+                'Number_Of_Registered_Persons_With_Albinism': rng.integers(0, 60, n),
+            })
+            for pc in PRODUCT_COLS:
+                df[pc] = rng.integers(0, 2000, n)
+            df['Financial_Year_Ending'] = years[rng.integers(0, len(years), n)]
+            df['Centroid_x'] = lon[county].round(6)
+            df['Centoid_Y'] = lat[county].round(6)
+            df['OBJECTID'] = np.arange(start, start + n)
+            df.to_csv(f, header=False, index=False)
+    return path
+
+
+def make_deliveries(n_rows: int, n_periods: int = 300, n_counties: int = 47, facilities_per_county: int = 100,
+                    seed: int = 0) -> pd.DataFrame:
+    """Products log over n_periods monthly period ends: one delivery per row with a Lot_No and an Expiry_Date
+    6 to 36 months after delivery (blank for 10% of rows)."""
+    rng = np.random.default_rng(seed)
+    n_fac = n_counties * facilities_per_county
+    fac = rng.integers(0, n_fac, n_rows)
+    ends = pd.date_range('2000-01-31', periods=n_periods, freq='ME')
+    period = rng.integers(0, n_periods, n_rows)
+    expiry = ends[period] + pd.to_timedelta(rng.integers(180, 1100, n_rows), unit='D')
+    df = pd.DataFrame({
+        'County': np.char.add('COUNTY_', (fac // facilities_per_county).astype(str)),
+        'Distribution_Centres_Hospitals/Health_Centres': np.char.add('Facility ', fac.astype(str)),
+        'Financial_Year_Ending': ends[period],
+        'Lot_No': np.arange(n_rows),
+        'Expiry_Date': pd.Series(expiry).where(rng.random(n_rows) >= 0.1),
+    })
+    for pc in PRODUCT_COLS:
+        df[pc] = rng.integers(0, 200, n_rows)
+    return df
+
+
+def county_name(i: int) -> str:
+    """Name of synthetic county i as written to the products CSV (the population CSV uses upper case)."""
+    return f'County {i}'
+
+
+def _thousands(values) -> list:
+    return [f'{int(v):,}' for v in values]
+
+
+def write_population_csv(path, n_counties: int = 47, subcounties_per_county: int = 6, seed: int = 0) -> Path:
+    """Write a census-style population CSV: two header rows, national and rural/urban totals, then each county
+    followed by its sub-counties. Large numbers are quoted with thousands separators like the real file."""
+    path = Path(path)
+    rng = np.random.default_rng(seed)
+    names, total, pwa = [], [], []
+    for c in range(n_counties):
+        sub_total = rng.integers(20_000, 400_000, subcounties_per_county)
+        sub_pwa = rng.integers(0, 80, subcounties_per_county)
+        names.append(county_name(c).upper())
+        total.append(sub_total.sum())
+        pwa.append(sub_pwa.sum())
+        for s in range(subcounties_per_county):
+            names.append(f'{county_name(c).upper()} SUB {s}')
+            total.append(sub_total[s])
+            pwa.append(sub_pwa[s])
+    total, pwa = np.array(total), np.array(pwa)
+    is_county = np.array([' SUB ' not in n for n in names])
+    rural = 0.7
+    head = [('KENYA', total[is_county].sum(), pwa[is_county].sum()),
+            ('Rural', int(total[is_county].sum() * rural), int(pwa[is_county].sum() * rural)),
+            ('Urban', total[is_county].sum() - int(total[is_county].sum() * rural),
+             pwa[is_county].sum() - int(pwa[is_county].sum() * rural))]
+    names = [h[0] for h in head] + names
+    total = np.concatenate([[h[1] for h in head], total])
+    pwa = np.concatenate([[h[2] for h in head], pwa])
+    male = (total * 0.49).astype(np.int64)
+    pwa_male = pwa // 2
+    df = pd.DataFrame({
+        'County/Sub County': names,
+        'Total Population': _thousands(total), '': _thousands(male), ' ': _thousands(total - male),
+        'Persons With Albinism': _thousands(pwa), '  ': _thousands(pwa_male), '   ': _thousands(pwa - pwa_male),
+    })
+    with path.open('w', encoding='utf-8', newline='') as f:
+        f.write('County/Sub County,Total Population,,,Persons With Albinism,,\n')
+        f.write(',Total*,Male,Female,Total*,Male,Female\n')
+        df.to_csv(f, header=False, index=False)
+    return path
+
+
+def write_dataset(directory, n_rows: int, facilities_per_county: int = 10, n_counties: int = 47,
+                  seed: int = 0):
+    """Write a matching products/population pair into directory; returns (products_csv, population_csv)."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    products = write_products_csv(directory / 'products.csv', n_rows, n_counties, facilities_per_county, seed)
+    population = write_population_csv(directory / 'population.csv', n_counties, seed=seed)
+    return products, population
@@ -1,25 +1,185 @@
 """data_processing.py
 Utilities to load, clean and save the CSV datasets used in the project.
 Produces cleaned CSVs in a `data/clean` folder.
+
+Cleaned frames are cached in `data/cache` as pickles (typed dtypes, no re-parsing), keyed on the raw file's
+content hash and the source of the cleaning code, so editing either invalidates the entry.
 """
 from pathlib import Path
+import hashlib
+import inspect
+import os
 import pandas as pd
 import numpy as np
+from instrumentation import timed
 
 ROOT = Path(__file__).parent
 DATA_DIR = ROOT / "data"
 CLEAN_DIR = DATA_DIR / "clean"
-CLEAN_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR = DATA_DIR / 'cache'
+# Bump to invalidate every cached frame (e.g. after a pandas upgrade changes pickles)
+CACHE_VERSION = 1
+# Least-recently-used entries are evicted once the cache grows beyond this many bytes
+CACHE_MAX_BYTES = 512 * 2**20
+
+# Rows per chunk in streaming mode; peak memory scales with this, not with the file size
+DEFAULT_CHUNKSIZE = 200_000
+FACILITY_COL = 'Distribution_Centres_Hospitals/Health_Centres'
+
+# End date of the financial year each products row reports (e.g. 6/30/2017)
+PERIOD_COL = 'Financial_Year_Ending'
+
+# Facility coordinates kept for distance-aware planning (longitude, latitude; `Centoid_Y` is the source spelling)
+COORD_COLS = ['Centroid_x', 'Centoid_Y']
+
+
+# Declared layout of the products/distribution log. Numbers are parsed by the CSV reader itself (thousands
+# separators and NA_TOKENS handled up front), so cleaning does no per-row string work on these columns.
+# Counts are read as float64 (missing cells become NaN, then 0): pandas' nullable Int64 parser is ~5x slower.
+PRODUCTS_SCHEMA = {
+    'County': 'category',
+    FACILITY_COL: 'category',
+    'Number_Of_Registered_Persons_With_Albinism': 'float64',
+    'Distibuted_Sunscreen_Lotions': 'float64',
+    'Distributed_Lip_Care_Products': 'float64',
+    'Distributed_After_Sun_Lotions': 'float64',
+    'Distributed_Protective_Clothings_Caps': 'float64',
+    'Distributed_Protective_Clothings_Long_sleeved_T-Shirts': 'float64',
+    PERIOD_COL: 'category',
+    'Centroid_x': 'float64',
+    'Centoid_Y': 'float64',
+    'OBJECTID': 'float64',
+}
+# Cells read as missing (then 0) in numeric columns, besides pandas' defaults such as ''
+NA_TOKENS = ['-']
+# Rows sampled to detect the types of columns the schema does not declare
+SNIFF_ROWS = 10_000
+# Name fragments of count columns (coerced to integers even when some cells are not numbers)
+COUNT_KEYS = ('number', 'no_', 'distributed', 'sunsreen', 'sunscreen', 'objectid')
+
+
+def _is_count(col: str) -> bool:
+    return any(k in col.lower() for k in COUNT_KEYS)
 
 
-def load_csv(path):
+def _detect_dtype(values: pd.Series):
+    """Numeric or text type of a sampled string column (text if any cell is not a number)."""
+    values = values.dropna()
+    values = values[~values.isin(NA_TOKENS)]
+    numbers = pd.to_numeric(values.str.replace(',', '', regex=False), errors='coerce')
+    return 'float64' if len(values) and numbers.notna().all() else str
+
+
+def read_options(path, schema: dict = PRODUCTS_SCHEMA, sample_rows: int = None) -> dict:
+    """pandas.read_csv arguments that parse path's numbers at read time.
+
+    Columns named in schema get their declared dtype; any other column is classified from the first
+    sample_rows rows, so files with unknown columns are still read typed.
+    """
+    sample_rows = SNIFF_ROWS if sample_rows is None else sample_rows
+    sample = pd.read_csv(path, dtype=str, encoding='utf-8', nrows=sample_rows)
+    dtype = {c: schema.get(c.strip()) or _detect_dtype(sample[c]) for c in sample.columns}
+    numeric = [c for c, t in dtype.items() if t == 'float64']
+    return {'dtype': dtype, 'thousands': ',', 'na_values': {c: NA_TOKENS for c in numeric}}
+
+
+def load_csv(path, schema: dict = PRODUCTS_SCHEMA):
+    """Read a CSV with its numbers parsed (see read_options); schema=None reads every column as strings."""
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"File not found: {path}")
+    if schema is not None:
+        try:
+            return pd.read_csv(path, encoding='utf-8', low_memory=False, **read_options(path, schema))
+        except ValueError:
+            # a cell the sampled types cannot parse: fall back to strings, coerced by the cleaning functions
+            pass
     # read with engine and low_memory to be robust to irregular csvs
     return pd.read_csv(path, dtype=str, encoding='utf-8', low_memory=False)
 
 
+def iter_csv(path, chunksize: int = DEFAULT_CHUNKSIZE, schema: dict = PRODUCTS_SCHEMA):
+    """Yield the CSV as DataFrame chunks of at most chunksize rows, typed as in load_csv."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    done = 0
+    if schema is not None:
+        try:
+            with pd.read_csv(path, encoding='utf-8', chunksize=chunksize, **read_options(path, schema)) as reader:
+                for chunk in reader:
+                    yield chunk
+                    done += len(chunk)
+            return
+        except ValueError:
+            pass
+    # string chunks, skipping the rows already yielded typed
+    with pd.read_csv(path, dtype=str, encoding='utf-8', chunksize=chunksize) as reader:
+        for chunk in reader:
+            if done >= len(chunk):
+                done -= len(chunk)
+                continue
+            yield chunk.iloc[done:]
+            done = 0
+
+
+@timed()
+def stream_products(path, chunksize: int = DEFAULT_CHUNKSIZE, schema: dict = PRODUCTS_SCHEMA):
+    """Clean a products/distribution log chunk by chunk and aggregate totals incrementally.
+
+    Returns (county_totals, facility_totals): count columns summed per County and per (County, Facility),
+    plus a `rows` column. Only one chunk and the running totals are held in memory at a time.
+    """
+    county_totals = facility_totals = None
+    value_cols = None
+    for chunk in iter_csv(path, chunksize, schema):
+        cleaned = clean_products(chunk)
+        if FACILITY_COL not in cleaned.columns:
+            cleaned[FACILITY_COL] = ''
+        if value_cols is None:
+            # fix the aggregated columns from the first chunk so every chunk sums the same set
+            value_cols = [c for c in cleaned.columns
+                          if c not in ('County', FACILITY_COL) and c not in COORD_COLS
+                          and pd.api.types.is_integer_dtype(cleaned[c])]
+        for col in value_cols:
+            # summed as int64: compacted columns are narrow, and nullable ones would overflow in the groupby
+            cleaned[col] = pd.to_numeric(cleaned[col], errors='coerce').fillna(0).astype('int64')
+        cleaned['rows'] = 1
+        # plain string keys: chunk categoricals differ and would not align when totals are added
+        cleaned['County'] = cleaned['County'].astype(str)
+        cleaned[FACILITY_COL] = cleaned[FACILITY_COL].astype(str)
+        cols = value_cols + ['rows']
+        by_county = cleaned.groupby('County')[cols].sum()
+        by_facility = cleaned.groupby(['County', FACILITY_COL])[cols].sum()
+        county_totals = by_county if county_totals is None else county_totals.add(by_county, fill_value=0)
+        facility_totals = by_facility if facility_totals is None else facility_totals.add(by_facility, fill_value=0)
+    if county_totals is None:
+        raise ValueError(f'no rows in {path}')
+    return county_totals.astype('int64').reset_index(), facility_totals.astype('int64').reset_index()
+
+
+def compact_dtypes(df: pd.DataFrame, categorical=('County', FACILITY_COL, 'Facility')) -> pd.DataFrame:
+    """Store repeated names as categoricals and integer counts in the smallest signed width that holds them
+    (nullable integer columns stay nullable)."""
+    for col in categorical:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def _upper_names(s: pd.Series) -> pd.Series:
+    """Upper-cased, stripped names; categoricals are normalized once per category rather than once per row."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        categories = s.cat.categories.astype(str).str.upper().str.strip()
+        if categories.is_unique:
+            return s.cat.rename_categories(categories)
+        s = s.astype(str).where(s.notna())
+    return s.str.upper().str.strip()
+
+
 def clean_products(df: pd.DataFrame) -> pd.DataFrame:
     # Rename columns to canonical names
     cols = {c: c.strip() for c in df.columns}
@@ -27,30 +187,139 @@ def clean_products(df: pd.DataFrame) -> pd.DataFrame:
 
     # Standardize county name
     if 'County' in df.columns:
-        df['County'] = df['County'].str.upper().str.strip()
-
-    # Numeric columns: coerce to numeric, fill NaN with 0
-    numeric_cols = [c for c in df.columns if any(k in c.lower() for k in ['number', 'no_', 'distributed', 'distributed_', 'sunsreen', 'sunscreen', 'objectid']) or df[c].dtype == object and df[c].str.replace(',', '', regex=False).str.isnumeric().any()]
-    for col in numeric_cols:
-        # remove commas and coerce
-        df[col] = pd.to_numeric(df[col].str.replace(',', '', regex=False), errors='coerce').fillna(0).astype(int)
+        df['County'] = _upper_names(df['County'])
 
     # Drop obvious metadata columns if present
-    for drop_col in ['Financial_Year_Ending', 'Centroid_x', 'Centoid_Y', 'OBJECTID']:
-        if drop_col in df.columns:
-            df = df.drop(columns=[drop_col])
+    df = df.drop(columns=[c for c in ('OBJECTID',) if c in df.columns])
+    # The financial year a row belongs to is kept as a date for multi-period views (timeseries.py)
+    if PERIOD_COL in df.columns:
+        df[PERIOD_COL] = pd.to_datetime(df[PERIOD_COL], errors='coerce')
+
+    for col in df.columns:
+        s = df[col]
+        if col in ('County', PERIOD_COL) or col in COORD_COLS or isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(s) or pd.api.types.is_float_dtype(s) and _is_count(col):
+            # parsed at read time: missing counts are 0
+            df[col] = s.fillna(0).astype('int64')
+        elif pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+            # whole numbers in a column not named as a count: nullable, so missing cells stay missing and a NaN
+            # from a later merge does not turn the column back into floats
+            df[col] = s.astype('Int64')
+        elif pd.api.types.is_string_dtype(s) and (_is_count(col) or s.str.replace(',', '', regex=False).str.isnumeric().any()):
+            # read as strings (unknown layout or a cell the reader could not parse): remove commas and coerce
+            df[col] = pd.to_numeric(s.str.replace(',', '', regex=False), errors='coerce').fillna(0).astype('int64')
+
+    # Coordinates are decimals, not counts
+    for col in COORD_COLS:
+        if col in df.columns and not pd.api.types.is_float_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return compact_dtypes(df)
 
-    return df
+
+# Levels of the census tree; the census lists them in one flat column (KENYA, Rural/Urban, then each
+# county followed by its sub-counties)
+LEVELS = ('national', 'area', 'county', 'sub_county')
+# Cleaned population count columns, keyed by (group, sex) of the census two-row header
+POPULATION_COLS = {('pwa', 'Total'): 'No_PWA_2019', ('pwa', 'Male'): 'PWA_Male', ('pwa', 'Female'): 'PWA_Female',
+                   ('population', 'Total'): 'Population', ('population', 'Male'): 'Population_Male',
+                   ('population', 'Female'): 'Population_Female'}
+
+
+def _to_int(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(s):
+        # parsed at read time
+        return s.fillna(0).astype('int64')
+    # thousands separators and '-' (none) as used in the census tables: one replace, '-' fails to parse -> 0
+    return pd.to_numeric(s.str.replace(',', '', regex=False), errors='coerce').fillna(0).astype('int64')
+
+
+def _census_blocks(total: np.ndarray, start: int):
+    """Split rows start.. into (parent, end) blocks where rows parent+1..end-1 sum to total[parent].
+
+    Returns None when the rows do not form such a tree (e.g. a plain one-row-per-county table).
+    """
+    cs = np.concatenate([[0], np.cumsum(total)])
+    blocks, i, n = [], start, len(total)
+    while i < n:
+        j = int(np.searchsorted(cs, cs[i + 1] + total[i]))
+        if j <= i + 1 or j > n or cs[j] - cs[i + 1] != total[i]:
+            return None
+        blocks.append((i, j))
+        i = j
+    return blocks
+
+
+def census_levels(total: np.ndarray) -> np.ndarray:
+    """Level of every row of a flat census listing, inferred from the totals alone.
+
+    A county is a row whose total equals the sum of the rows that follow it up to the next county; an optional
+    leading national row is followed by area rows (Rural/Urban) that sum to it. Rows that do not form a tree are
+    all treated as counties.
+    """
+    total = np.asarray(total, dtype=np.int64)
+    levels = np.full(len(total), 'county', dtype=object)
+    starts = []
+    if len(total) > 1 and total[0] > 0:
+        # national row followed by area rows summing to it; or directly by the counties
+        cs = np.cumsum(total[1:])
+        k = int(np.searchsorted(cs, total[0]))
+        if k < len(cs) and cs[k] == total[0]:
+            starts.append(k + 2)
+        starts.append(1)
+    for first in starts:
+        blocks = _census_blocks(total, first)
+        if blocks and sum(int(total[i]) for i, _ in blocks) == total[0]:
+            levels[0] = 'national'
+            levels[1:first] = 'area'
+            break
+    else:
+        blocks = _census_blocks(total, 0)
+    for i, j in blocks or []:
+        levels[i + 1:j] = 'sub_county'
+    return levels
 
 
 def clean_population(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per census entry: County, Sub_County, Level and the PWA / population counts by sex.
+
+    The census file has a two-row header (group, then Total*/Male/Female) and lists the national total, the
+    rural/urban split, counties and their sub-counties in one column; the tree is recovered from the totals.
+    Sub-county rows carry their parent in County. Tables without the sex sub-header keep the previous layout:
+    every row is a county and the first PWA column becomes No_PWA_2019.
+    """
     df = df.copy()
-    # Attempt to find county and PWA columns
     # Strip column names
     df.columns = [c.strip() for c in df.columns]
     # Normalize the main county column
     possible_county_cols = [c for c in df.columns if 'county' in c.lower() or 'sub county' in c.lower() or 'county/sub' in c.lower()]
     county_col = possible_county_cols[0] if possible_county_cols else df.columns[0]
+
+    first = df.iloc[0] if len(df) else None
+    if first is not None and pd.isna(first[county_col]) and first.drop(county_col).astype(str).str.contains('Total|Male|Female').any():
+        # two-row header: group names (forward-filled over the blank cells) over Total*/Male/Female
+        groups = pd.Series([None if c.startswith('Unnamed') or not c else c for c in df.columns]).ffill()
+        out = pd.DataFrame({'County': df[county_col].iloc[1:].astype(str).str.upper().str.strip()})
+        for col, group, sex in zip(df.columns, groups, first.astype(str).str.strip('* ')):
+            group = str(group).lower()
+            key = 'pwa' if any(k in group for k in ('albin', 'pwa', 'persons with')) else 'population' if 'population' in group else None
+            name = POPULATION_COLS.get((key, sex))
+            if name and name not in out:
+                out[name] = _to_int(df[col].iloc[1:]).to_numpy()
+        for name in POPULATION_COLS.values():
+            if name not in out:
+                out[name] = 0
+        out = out.reset_index(drop=True)
+        levels = census_levels(out['Population'] if out['Population'].any() else out['No_PWA_2019'])
+        out.insert(1, 'Level', levels)
+        # sub-county rows take the name of the county row above them
+        is_sub = out['Level'] == 'sub_county'
+        out.insert(1, 'Sub_County', out['County'].where(is_sub))
+        out['County'] = out['County'].where(~is_sub).ffill()
+        out['Level'] = pd.Categorical(out['Level'], categories=LEVELS)
+        return compact_dtypes(out, categorical=('County', 'Sub_County'))
+
     df = df.rename(columns={county_col: 'County'})
     df['County'] = df['County'].astype(str).str.upper().str.strip()
 
@@ -58,34 +327,107 @@ def clean_population(df: pd.DataFrame) -> pd.DataFrame:
     pwa_cols = [c for c in df.columns if 'albin' in c.lower() or 'pwa' in c.lower() or 'persons with' in c.lower()]
     if pwa_cols:
         pwa_col = pwa_cols[0]
-        # Clean numbers and convert
-        df[pwa_col] = df[pwa_col].astype(str).str.replace(',', '', regex=False).replace({'-': '0', '': '0'}).fillna('0')
-        df[pwa_col] = pd.to_numeric(df[pwa_col], errors='coerce').fillna(0).astype(int)
+        df[pwa_col] = _to_int(df[pwa_col])
         df = df.rename(columns={pwa_col: 'No_PWA_2019'})
     else:
         # fallback: add a zero column
         df['No_PWA_2019'] = 0
+    df['Level'] = pd.Categorical(['county'] * len(df), categories=LEVELS)
 
-    return df
+    return compact_dtypes(df, categorical=('County',))
 
 
 def save_clean(df: pd.DataFrame, name: str) -> Path:
+    CLEAN_DIR.mkdir(parents=True, exist_ok=True)
     out = CLEAN_DIR / name
     df.to_csv(out, index=False)
     return out
 
 
-def prepare_products(path) -> pd.DataFrame:
-    raw = load_csv(path)
-    cleaned = clean_products(raw)
-    save_clean(cleaned, 'clean_products.csv')
+_HASHES = {}
+
+
+def file_hash(path) -> str:
+    """sha256 of a file's content, memoized per (path, size, mtime) within the process."""
+    st = os.stat(path)
+    memo_key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    if memo_key not in _HASHES:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        _HASHES[memo_key] = h.hexdigest()
+    return _HASHES[memo_key]
+
+
+def _cache_path(path, clean_fn) -> Path:
+    # the whole defining module, so edits to helpers such as compact_dtypes also invalidate
+    code = hashlib.sha256(f'{CACHE_VERSION}:{inspect.getsource(inspect.getmodule(clean_fn))}'.encode('utf-8')).hexdigest()
+    return CACHE_DIR / f'{file_hash(path)[:20]}-{clean_fn.__name__}-{code[:12]}.pkl'
+
+
+def _evict(max_bytes: int = None):
+    """Delete least-recently-used cache entries until the cache fits in max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = sorted(CACHE_DIR.glob('*.pkl'), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    for p in entries:
+        if total <= max_bytes:
+            break
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+
+
+def clear_cache(path=None) -> int:
+    """Remove cached frames for one raw file (all entries if path is None); returns the number removed."""
+    if not CACHE_DIR.exists():
+        return 0
+    pattern = f'{file_hash(path)[:20]}-*.pkl' if path is not None else '*.pkl'
+    removed = 0
+    for p in CACHE_DIR.glob(pattern):
+        p.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def load_clean(path, clean_fn, use_cache: bool = True):
+    """Return (clean_fn(load_csv(path)), cache_hit), reusing the cached frame when path and clean_fn are unchanged."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {path}")
+    if not use_cache:
+        return clean_fn(load_csv(path)), False
+    entry = _cache_path(path, clean_fn)
+    if entry.exists():
+        try:
+            df = pd.read_pickle(entry)
+            os.utime(entry)  # mark as recently used
+            return df, True
+        except Exception:
+            # unreadable entry (partial write, pandas upgrade): rebuild it
+            entry.unlink(missing_ok=True)
+    df = clean_fn(load_csv(path))
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = entry.with_suffix('.tmp')
+    df.to_pickle(tmp)
+    os.replace(tmp, entry)
+    _evict()
+    return df, False
+
+
+@timed()
+def prepare_products(path, use_cache: bool = True) -> pd.DataFrame:
+    cleaned, hit = load_clean(path, clean_products, use_cache)
+    if not hit or not (CLEAN_DIR / 'clean_products.csv').exists():
+        save_clean(cleaned, 'clean_products.csv')
     return cleaned
 
 
-def prepare_population(path) -> pd.DataFrame:
-    raw = load_csv(path)
-    cleaned = clean_population(raw)
-    save_clean(cleaned, 'clean_population.csv')
+@timed()
+def prepare_population(path, use_cache: bool = True) -> pd.DataFrame:
+    cleaned, hit = load_clean(path, clean_population, use_cache)
+    if not hit or not (CLEAN_DIR / 'clean_population.csv').exists():
+        save_clean(cleaned, 'clean_population.csv')
     return cleaned
 
 
@@ -94,12 +436,28 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Prepare and clean CSV datasets')
     parser.add_argument('--products', default='distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv')
     parser.add_argument('--population', default='distribution-of-persons-with-albinism-by-sex1-area-of-residence-county-and-sub-county-2019-censu (1).csv')
+    parser.add_argument('--no-cache', action='store_true', help='Re-clean from the raw CSVs without using data/cache')
+    parser.add_argument('--clear-cache', action='store_true', help='Delete all cached cleaned frames first')
+    parser.add_argument('--stream', action='store_true',
+                        help='Aggregate a large products log chunk by chunk into county/facility totals')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='Rows per chunk with --stream')
     args = parser.parse_args()
 
+    if args.clear_cache:
+        print('Removed cache entries:', clear_cache())
+
+    if args.stream:
+        print('Streaming products...')
+        county_totals, facility_totals = stream_products(Path(args.products), args.chunksize)
+        print('Rows read:', int(county_totals['rows'].sum()))
+        print('Wrote', save_clean(county_totals, 'products_county_totals.csv'))
+        print('Wrote', save_clean(facility_totals, 'products_facility_totals.csv'))
+        raise SystemExit(0)
+
     print('Preparing products...')
-    p = prepare_products(Path(args.products))
+    p = prepare_products(Path(args.products), use_cache=not args.no_cache)
     print('Products cleaned rows:', len(p))
 
     print('Preparing population...')
-    q = prepare_population(Path(args.population))
+    q = prepare_population(Path(args.population), use_cache=not args.no_cache)
     print('Population cleaned rows:', len(q))
@@ -1,5 +1,13 @@
+"""executive_brief.py
+One-page HTML brief combining the insights text and the top recommended transfers.
+Reads the latest insights and transfer plan from the results store (else outputs/insights.txt and transfer_plan.csv).
+Produces: outputs/executive_brief.html
+"""
 from pathlib import Path
 import pandas as pd
+from instrumentation import timed
+import results_store
+from transfer_matrix import TransferMatrix
 
 ROOT = Path(__file__).parent
 OUT = ROOT / 'outputs'
@@ -10,35 +18,51 @@ transfer = OUT / 'transfer_plan.csv'
 
 html_out = OUT / 'executive_brief.html'
 
-ins_text = summary.read_text() if summary.exists() else ''
-trans_df = pd.read_csv(transfer) if transfer.exists() else pd.DataFrame()
-
-# Build a simple HTML one-pager
-html = []
-html.append('<html><head><meta charset="utf-8"><title>Executive Brief — PWA Product Reallocation</title></head><body>')
-html.append('<h1>Executive Brief — Reallocation Pilot</h1>')
-html.append('<h2>Key insights</h2>')
-html.append('<pre style="font-size:14px">')
-html.append(ins_text)
-html.append('</pre>')
-
-html.append('<h2>Top recommended transfers (pilot)</h2>')
-if not trans_df.empty:
-    pilot = trans_df.groupby('to_county').sum().reset_index().sort_values('units', ascending=False).head(5)
-    html.append(pilot.to_html(index=False))
-else:
-    html.append('<p>No transfer plan found. Run transfer_plan.py first.</p>')
-
-html.append('<h2>Operational notes</h2>')
-html.append('<ul>')
-html.append('<li>Validate product mix and expiry before shipment.</li>')
-html.append('<li>Start pilot with KISII -> GARISSA and KISII -> TURKANA (largest surplus to largest deficits).</li>')
-html.append('<li>Keep 10% buffer in donor counties unless otherwise approved by logistics.</li>')
-html.append('</ul>')
-
-html.append('<p>Generated by the PWA distribution analysis pipeline.</p>')
-html.append('</body></html>')
-
-html_out.write_text('\n'.join(html), encoding='utf-8')
-print('Wrote', html_out)
-print('Open it and ' + ('use a browser Print -> Save as PDF' if html_out.exists() else 'generate the transfer plan first'))
+
+@timed()
+def render_brief(ins_text: str, trans_df: pd.DataFrame) -> str:
+    # Build a simple HTML one-pager
+    html = []
+    html.append('<html><head><meta charset="utf-8"><title>Executive Brief — PWA Product Reallocation</title></head><body>')
+    html.append('<h1>Executive Brief — Reallocation Pilot</h1>')
+    html.append('<h2>Key insights</h2>')
+    html.append('<pre style="font-size:14px">')
+    html.append(ins_text)
+    html.append('</pre>')
+
+    html.append('<h2>Top recommended transfers (pilot)</h2>')
+    if not trans_df.empty:
+        # units per recipient only; summing every column would also concatenate the county names
+        pilot = TransferMatrix.from_plan(trans_df).top(5, 'to_county')
+        html.append(pilot.to_html(index=False))
+    else:
+        html.append('<p>No transfer plan found. Run transfer_plan.py first.</p>')
+
+    html.append('<h2>Operational notes</h2>')
+    html.append('<ul>')
+    html.append('<li>Validate product mix and expiry before shipment.</li>')
+    html.append('<li>Start pilot with KISII -> GARISSA and KISII -> TURKANA (largest surplus to largest deficits).</li>')
+    html.append('<li>Keep 10% buffer in donor counties unless otherwise approved by logistics.</li>')
+    html.append('</ul>')
+
+    html.append('<p>Generated by the PWA distribution analysis pipeline.</p>')
+    html.append('</body></html>')
+    return '\n'.join(html)
+
+
+def main():
+    ins_text = results_store.read_text('insights')
+    if ins_text is None:
+        ins_text = summary.read_text() if summary.exists() else ''
+    # the brief only ranks recipients, so only the lane and units columns are read
+    trans_df = results_store.load_table('transfers', transfer, columns=['from_county', 'to_county', 'units'])
+    if trans_df is None:
+        trans_df = pd.DataFrame()
+
+    html_out.write_text(render_brief(ins_text, trans_df), encoding='utf-8')
+    print('Wrote', html_out)
+    print('Open it and ' + ('use a browser Print -> Save as PDF' if html_out.exists() else 'generate the transfer plan first'))
+
+
+if __name__ == '__main__':
+    main()
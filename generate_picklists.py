@@ -1,32 +1,53 @@
 """generate_picklists.py
 Map county-level transfers to donor facilities and produce per-donor picklists.
 Outputs:
- - outputs/picklists/<donor_county>_picklist.csv
+ - outputs/picklists/<donor_county>_picklist.csv (and .html)
+   (--format zip: outputs/picklists/picklists.zip; --format parquet: outputs/picklists/picklists.parquet)
  - outputs/picklist_summary.txt
 
 Default behavior:
- - Uses `outputs/transfer_plan.csv` produced by `transfer_plan.py`.
+ - Uses the transfer plan produced by `transfer_plan.py` (latest run in the results store, else
+   `outputs/transfer_plan.csv`); picks and the summary are recorded in the store as a new run.
  - Uses original products CSV to get facility-level stock counts per product type.
  - Honors a donor buffer percent (default 10%): donors keep buffer% of their stock and only release the rest.
- - Allocates proportionally from donor facilities to satisfy transfer quantities.
+ - Allocates proportionally from donor facilities to satisfy transfer quantities
+   (--strategy nearest: nearest donor facilities to the recipient county first). Units are rounded by largest
+   remainder, so every transfer gets exactly min(units, releasable stock left), and a donor's transfers share
+   its releasable stock in plan order.
 
 Usage:
     python generate_picklists.py --buffer 0.1
+    python generate_picklists.py --buffer 0.1 --format zip --workers 8
 
 """
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import os
+import re
+import shutil
+import zipfile
 import pandas as pd
+import numpy as np
 import argparse
+from data_processing import compact_dtypes, COORD_COLS
+from instrumentation import timed
+import planner
+import results_store
+from transfer_matrix import TransferMatrix
 
 ROOT = Path(__file__).parent
 OUT = ROOT / 'outputs'
-OUT.mkdir(exist_ok=True)
 PICK_DIR = OUT / 'picklists'
-PICK_DIR.mkdir(exist_ok=True)
 
 # Defaults
 PRODUCTS_CSV = ROOT / 'distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv'
 TRANSFER_CSV = OUT / 'transfer_plan.csv'
+# Output layouts of write_picklists
+WRITE_FORMATS = ('files', 'zip', 'parquet')
+# How a transfer is split across the donor county's facilities: in proportion to releasable stock, or
+# nearest facilities (to the recipient county's centroid) first
+STRATEGIES = ('proportional', 'nearest')
 
 # Product columns we expect in the products CSV (guessed from file headers)
 PRODUCT_COLS = [
@@ -37,11 +58,19 @@ PRODUCT_COLS = [
     'Distributed_Protective_Clothings_Long_sleeved_T-Shirts'
 ]
 
-# possible inventory metadata columns (batch/lot/expiry)
+# possible inventory metadata columns (batch/lot/expiry), matched as whole words of the column name
 META_KEYS = ['batch', 'lot', 'expiry', 'manufacture', 'mfg_date', 'exp_date']
 
-def load_products(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path)
+
+def meta_columns(columns) -> list:
+    """Columns whose name contains a META_KEYS word (case-insensitive; `Lot_No` matches, `..._Lotions` does not)."""
+    pattern = re.compile('|'.join(rf'(?<![a-z]){re.escape(k)}(?![a-z])' for k in META_KEYS))
+    return [c for c in columns if pattern.search(str(c).lower())]
+
+
+def facility_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a products frame (raw or from data_processing.clean_products) to facility-level stock."""
+    df = df.copy()
     # normalize columns safe
     df.columns = [c.strip() for c in df.columns]
     # Ensure County and Health centre exist
@@ -56,161 +85,495 @@ def load_products(path: Path) -> pd.DataFrame:
     # Fill numeric product columns if present; else create zeros
     for pc in PRODUCT_COLS:
         if pc in df.columns:
-            df[pc] = pd.to_numeric(df[pc].astype(str).str.replace(',', '', regex=False), errors='coerce').fillna(0).astype(int)
+            if not pd.api.types.is_integer_dtype(df[pc]):
+                df[pc] = pd.to_numeric(df[pc].astype(str).str.replace(',', '', regex=False), errors='coerce').fillna(0).astype(int)
         else:
             df[pc] = 0
 
     df['County'] = df['County'].astype(str).str.upper().str.strip()
     df['Facility'] = df['Facility'].astype(str).str.strip()
     # detect metadata columns (case-insensitive)
-    meta_cols = [c for c in df.columns if any(k in c.lower() for k in META_KEYS)]
-    # keep meta columns if present; else none
-    df['_meta_cols'] = ','.join(meta_cols) if meta_cols else ''
+    meta_cols = meta_columns(df.columns)
+    # keep meta columns if present (frame-level metadata, not a per-row string)
+    df = compact_dtypes(df, categorical=('County', 'Facility'))
+    df.attrs['meta_cols'] = meta_cols
     return df
 
 
-def allocate_from_facilities(donors_df: pd.DataFrame, donor_county: str, need_units: int, buffer_pct: float):
+def load_products(path: Path) -> pd.DataFrame:
+    return facility_frame(pd.read_csv(path))
+
+
+def index_facilities(donors_df: pd.DataFrame) -> dict:
+    """Group donor facilities by county once so repeated allocations avoid rescanning the frame.
+    Returns {county: {'facility': array, 'stock': (n_facilities, n_products) int array, 'meta': list of dicts}};
+    groups also carry 'coords' ((n_facilities, 2) lon/lat, NaN if unknown) when the frame has centroid columns.
+    """
+    stock = donors_df[PRODUCT_COLS].to_numpy(dtype=np.int64)
+    facilities = donors_df['Facility'].to_numpy()
+    coords = (donors_df[COORD_COLS].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+              if all(c in donors_df.columns for c in COORD_COLS) else None)
+    meta_cols = [c for c in donors_df.attrs.get('meta_cols', []) if c in donors_df.columns]
+    meta_values = donors_df[meta_cols].to_numpy(dtype=object) if meta_cols else None
+
+    index = {}
+    for county, pos in donors_df.groupby('County', sort=False, observed=True).indices.items():
+        meta = [dict(zip(meta_cols, meta_values[p])) for p in pos] if meta_values is not None else [{}] * len(pos)
+        index[county] = {'facility': facilities[pos], 'stock': stock[pos], 'meta': meta}
+        if coords is not None:
+            index[county]['coords'] = coords[pos]
+    return index
+
+
+def _segment_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Exact integer sums of consecutive runs of `lengths` items (empty runs sum to 0)."""
+    ends = np.cumsum(lengths)
+    cs = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return cs[ends] - cs[ends - lengths]
+
+
+def largest_remainder(weights, totals, lengths) -> np.ndarray:
+    """Split totals[g] units over group g (the next lengths[g] items) in proportion to weights, by largest remainder.
+
+    Every item gets the floor of its quota and the totals[g] - sum(floors) items with the largest remainders one
+    unit more (ties to the earlier item), all in integer arithmetic. With totals[g] <= the group's weight sum each
+    group sums to exactly totals[g] and no item gets more than its weight.
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    totals = np.asarray(totals, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    quota = weights * totals[group]
+    denom = np.maximum(_segment_sums(weights, lengths), 1)[group]
+    units, remainder = np.divmod(quota, denom)
+    short = totals - _segment_sums(units, lengths)
+    # the remainders sum to short[g] * denom, so only items with a remainder can be among the short[g] largest
+    cand = np.flatnonzero((remainder > 0) & (short[group] > 0))
+    # rank of each candidate's remainder within its group (stable sorts, so ties keep item order); one int64 key
+    # (group, largest remainder first) sorts about twice as fast as lexsort when it fits
+    span = int(denom.max(initial=1))
+    if len(lengths) * span < 2 ** 62:
+        order = cand[np.argsort(group[cand] * span + (span - 1 - remainder[cand]), kind='stable')]
+    else:
+        order = cand[np.lexsort((-remainder[cand], group[cand]))]
+    counts = np.bincount(group[cand], minlength=len(lengths))
+    rank = np.arange(len(order)) - (np.cumsum(counts) - counts)[group[order]]
+    units[order[rank < short[group[order]]]] += 1
+    return units
+
+
+def _fill_nearest(releasable: np.ndarray, totals: np.ndarray, lengths: np.ndarray, distance: np.ndarray) -> np.ndarray:
+    """Per group, drain the nearest items first (ties: largest releasable; unknown distances last) until totals[g]."""
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    order = np.lexsort((-releasable, np.nan_to_num(distance, nan=np.inf), group))
+    rel = releasable[order]
+    # releasable of the nearer items of the same group (groups stay contiguous in order)
+    sums = _segment_sums(releasable, lengths)
+    before = np.cumsum(rel) - rel - np.repeat(np.cumsum(sums) - sums, lengths)
+    units = np.empty_like(releasable)
+    units[order] = np.clip(totals[group[order]] - before, 0, rel)
+    return units
+
+
+def facility_table(donors_df: pd.DataFrame) -> dict:
+    """A facility frame as one facility table, facilities grouped by county (the layout of an inventory export):
+    counties {name: code}, start/count of each county's rows, county code, facility, stock (n_facilities,
+    n_products), meta values (one column per meta_cols name, or None) and coords (lon/lat, or None) per row."""
+    codes, counties = pd.factorize(donors_df['County'].to_numpy(dtype=object))
+    # facilities without a county are left out, as groupby leaves them out of index_facilities
+    order = np.flatnonzero(codes >= 0)
+    order = order[np.argsort(codes[order], kind='stable')]
+    codes = codes[order]
+    count = np.bincount(codes, minlength=len(counties)).astype(np.int64)
+    meta_cols = [c for c in donors_df.attrs.get('meta_cols', []) if c in donors_df.columns]
+    return {
+        'counties': {county: i for i, county in enumerate(counties)},
+        'start': np.cumsum(count) - count,
+        'count': count,
+        'county': codes,
+        'facility': donors_df['Facility'].to_numpy()[order],
+        'stock': donors_df[PRODUCT_COLS].to_numpy(dtype=np.int64)[order],
+        'meta': donors_df[meta_cols].to_numpy(dtype=object)[order] if meta_cols else None,
+        'meta_cols': meta_cols,
+        'coords': (donors_df[COORD_COLS].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)[order]
+                   if all(c in donors_df.columns for c in COORD_COLS) else None),
+    }
+
+
+def _flatten(index: dict) -> dict:
+    """index_facilities groups as one facility table (see facility_table)."""
+    groups = list(index.values())
+    count = np.array([len(g['facility']) for g in groups], dtype=np.int64)
+    n_products = len(PRODUCT_COLS)
+    meta = [m for g in groups for m in g['meta']]
+    meta_cols = list(dict.fromkeys(k for m in meta for k in m))
+    return {
+        'counties': {county: i for i, county in enumerate(index)},
+        'start': np.cumsum(count) - count,
+        'count': count,
+        'county': np.repeat(np.arange(len(groups)), count),
+        'facility': np.concatenate([g['facility'] for g in groups]) if groups else np.array([], dtype=object),
+        'stock': (np.concatenate([g['stock'] for g in groups]) if groups
+                  else np.zeros((0, n_products), dtype=np.int64)),
+        'meta': np.array([[m.get(k) for k in meta_cols] for m in meta], dtype=object) if meta_cols else None,
+        'meta_cols': meta_cols,
+        'coords': (np.concatenate([g['coords'] for g in groups])
+                   if groups and all('coords' in g for g in groups) else None),
+    }
+
+
+def _meta_text(values: np.ndarray, meta_cols: list) -> np.ndarray:
+    """Picklist meta strings ('Lot_No=L1; Expiry_Date=2026-02') of the (n, len(meta_cols)) meta values."""
+    if not meta_cols:
+        return np.full(len(values), '', dtype=object)
+    text = pd.Series(f'{meta_cols[0]}=', index=range(len(values)), dtype=object) + pd.Series(values[:, 0]).map(str)
+    for j, c in enumerate(meta_cols[1:], 1):
+        text = text + f'; {c}=' + pd.Series(values[:, j]).map(str)
+    return text.to_numpy(dtype=object)
+
+
+def _sites(county: np.ndarray, coords: np.ndarray) -> tuple:
+    """Site (distinct county and location) of every facility row, numbered county by county, and the first site of
+    each county plus the end. Facilities often all sit at their county's centroid; rows without coordinates are
+    sites of their own."""
+    order = np.lexsort((coords[:, 1], coords[:, 0], county))
+    c, lon, lat = county[order], coords[order, 0], coords[order, 1]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (c[1:] != c[:-1]) | (lon[1:] != lon[:-1]) | (lat[1:] != lat[:-1])
+    site = np.empty(len(order), dtype=np.int64)
+    site[order] = np.cumsum(new) - 1
+    start = np.searchsorted(c[new], np.arange(county.max(initial=-1) + 2))
+    return site, start
+
+
+def _nearest_distances(sites: dict, t, nearest, destinations, col, to_give, releasable, n_fac, row, donor) -> np.ndarray:
+    """km from each nearest-first transfer's recipient to the donor facilities that cover it, from k-nearest
+    queries on the spatial index of the donors' sites; NaN for the facilities beyond them (they give nothing).
+
+    k grows until every site within the distance at which the transfer is covered is returned (or the donor has
+    none left), so facilities at equal distance are ordered by releasable stock like every other tie.
+    """
+    index, site, start = sites['index'], sites['site'], sites['start']
+    distance = np.full(len(row), np.nan)
+    item_start = np.cumsum(n_fac) - n_fac
+    for i in np.flatnonzero(nearest[t] & (to_give > 0)):
+        items = slice(item_start[i], item_start[i] + n_fac[i])
+        s0, s1 = start[donor[t[i]]], start[donor[t[i]] + 1]
+        item_site = site[row[items]] - s0
+        # releasable left at each of the donor's sites
+        left = np.bincount(item_site, releasable[items], minlength=s1 - s0)
+        lon, lat = destinations[t[i]]
+        product = PRODUCT_COLS[col[t[i]]] if col[t[i]] >= 0 else None
+        k = 8
+        while True:
+            dist, found = index.query(lon, lat, k, product, index.county[s0])
+            ok = found[0] >= 0
+            dist, found = dist[0][ok], found[0][ok] - s0
+            order = np.lexsort((-left[found], dist))
+            covered = np.flatnonzero(np.cumsum(left[found][order]) >= to_give[i])
+            if len(dist) < k or (len(covered) and dist[order[covered[0]]] < dist[-1]):
+                break
+            k *= 4
+        site_distance = np.full(s1 - s0, np.nan)
+        site_distance[found] = dist
+        distance[items] = site_distance[item_site]
+    return distance
+
+
+@timed()
+def allocate_transfers(table: dict, donors, units, buffer_pct: float, products=None,
+                       destinations: np.ndarray = None) -> pd.DataFrame:
+    """Allocate every transfer to donor facilities at once; returns one row per facility/product pick with the
+    transfer's position, facility, its position in the donor group, product, units and meta.
+
+    `table` is a facility table (facility_table, or inventory.Inventory.table() over the mapped export); only the
+    rows of the donors in this plan are read. Each facility and product releases floor(stock * (1 - buffer_pct)),
+    shared by all transfers from that donor in plan order, so a donor never gives away its buffer however many
+    transfers it has. A transfer gets exactly min(units, releasable left) units: split across facilities in
+    proportion to their releasable stock (or nearest facilities first when its row of `destinations`, lon/lat of
+    the recipient, is known) and within each facility across products in proportion to their releasable stock,
+    both by largest remainder.
+    Transfers with a product (`products`, None or '' for all products) draw only that product.
+    """
+    n_products = len(PRODUCT_COLS)
+    code = np.array([table['counties'].get(d, -1) for d in donors], dtype=np.int64)
+    units = np.asarray(units, dtype=np.int64)
+    col = (np.full(len(code), -1, dtype=np.int64) if products is None else
+           np.array([PRODUCT_COLS.index(p) if p else -1 for p in products], dtype=np.int64))
+    nearest = np.zeros(len(code), dtype=bool)
+    if destinations is not None and table['coords'] is not None:
+        destinations = np.asarray(destinations, dtype=float)
+        nearest = ~np.isnan(destinations).any(axis=1)
+
+    # working copy of the releasable stock of the donors in this plan only (rows are indexes into it from here on)
+    used = np.unique(code[code >= 0])
+    n_used = table['count'][used]
+    local_start = np.cumsum(n_used) - n_used
+    rows = np.repeat(table['start'][used] - local_start, n_used) + np.arange(n_used.sum(), dtype=np.int64)
+    caps = np.floor(np.asarray(table['stock'][rows]) * (1.0 - buffer_pct)).astype(np.int64)
+    sites = None
+    if nearest.any():
+        import spatial
+        # one index point per donor site with releasable stock; k-d trees per (product, county) filter
+        names = np.array(list(table['counties']), dtype=object)
+        coords = np.asarray(table['coords'][rows], dtype=float)
+        county = np.repeat(np.arange(len(used)), n_used)
+        site, site_start = _sites(county, coords)
+        first = np.unique(site, return_index=True)[1]
+        site_caps = np.column_stack([np.bincount(site, caps[:, j], minlength=len(first)) for j in range(n_products)])
+        sites = {'site': site, 'start': site_start,
+                 'index': spatial.FacilityIndex.from_arrays(names[used][county[first]], table['facility'][rows][first],
+                                                            coords[first, 0], coords[first, 1],
+                                                            site_caps.astype(np.int64))}
+    slot = np.full(len(table['count']), -1, dtype=np.int64)
+    slot[used] = np.arange(len(used))
+    donor = np.where(code >= 0, slot[np.maximum(code, 0)], -1)
+
+    # a donor's k-th transfer only sees what its earlier transfers left, so transfers are planned in rounds by rank
+    valid = np.flatnonzero((donor >= 0) & (units > 0))
+    by_donor = valid[np.argsort(donor[valid], kind='stable')]
+    first = np.r_[True, donor[by_donor][1:] != donor[by_donor][:-1]]
+    rank = np.arange(len(by_donor)) - np.maximum.accumulate(np.where(first, np.arange(len(by_donor)), 0))
+    picks = []
+    for r in range(int(rank.max()) + 1 if len(rank) else 0):
+        t = np.sort(by_donor[rank == r])
+        # facility stage: every facility of the donor, releasable stock of the transfer's product(s)
+        n_fac = n_used[donor[t]]
+        item_t = np.repeat(np.arange(len(t)), n_fac)
+        row = local_start[donor[t]][item_t] + np.arange(n_fac.sum()) - np.repeat(np.cumsum(n_fac) - n_fac, n_fac)
+        item_col = col[t][item_t]
+        releasable = np.where(item_col >= 0, caps[row, np.maximum(item_col, 0)], caps[row].sum(axis=1))
+        to_give = np.minimum(units[t], _segment_sums(releasable, n_fac))
+        per_facility = largest_remainder(releasable, to_give, n_fac)
+        if nearest[t].any():
+            distance = _nearest_distances(sites, t, nearest, destinations, col, to_give, releasable, n_fac, row,
+                                          donor)
+            per_facility = np.where(nearest[t][item_t], _fill_nearest(releasable, to_give, n_fac, distance),
+                                    per_facility)
+        # product stage: each facility's units across the transfer's product(s), for the facilities giving any
+        giving = per_facility > 0
+        row, item_t, item_col, per_facility = row[giving], item_t[giving], item_col[giving], per_facility[giving]
+        n_cell = np.where(item_col >= 0, 1, n_products)
+        cell_item = np.repeat(np.arange(len(row)), n_cell)
+        local = np.arange(n_cell.sum()) - np.repeat(np.cumsum(n_cell) - n_cell, n_cell)
+        cell_row = row[cell_item]
+        cell_col = np.where(item_col[cell_item] >= 0, item_col[cell_item], local)
+        given = largest_remainder(caps[cell_row, cell_col], per_facility, n_cell)
+        caps[cell_row, cell_col] -= given
+        keep = given > 0
+        picks.append((t[item_t[cell_item[keep]]], cell_row[keep], cell_col[keep], given[keep]))
+
+    if picks:
+        transfer, row, product, given = (np.concatenate(p) for p in zip(*picks))
+    else:
+        transfer = row = product = given = np.zeros(0, dtype=np.int64)
+    order = np.lexsort((product, row, transfer))
+    transfer, row, product = transfer[order], rows[row[order]], product[order]
+    # meta strings only for the picked facilities
+    meta = _meta_text(table['meta'][row] if table['meta_cols'] else np.zeros((len(row), 0)), table['meta_cols'])
+    return pd.DataFrame({'transfer': transfer, 'facility': table['facility'][row],
+                         'position': row - table['start'][table['county'][row]],
+                         'product': np.array(PRODUCT_COLS, dtype=object)[product], 'units': given[order],
+                         'meta': meta})
+
+
+@timed(aggregate=True)
+def allocate_from_facilities(donors_df: pd.DataFrame, donor_county: str, need_units: int, buffer_pct: float, index: dict = None,
+                             destination: tuple = None):
     """Allocate up to need_units from donor facilities in donor_county respecting buffer_pct.
-    Allocation is proportional across product columns aggregated to units.
+    Allocation is proportional across facilities and product columns (see allocate_transfers).
+    Pass a prebuilt `index` (from index_facilities) when allocating many transfers from the same frame.
+    With a `destination` (lon, lat) the facilities nearest to it are drained first instead of every facility
+    giving in proportion to its releasable stock.
     Returns list of allocations: [{'facility':..., 'product':..., 'units':...}, ...]
     """
-    df = donors_df[donors_df['County'] == donor_county].copy()
-    if df.empty:
-        return []
-    # compute total available per facility (sum product cols)
-    df['total_stock'] = df[PRODUCT_COLS].sum(axis=1)
-    # apply buffer
-    df['releasable'] = (df['total_stock'] * (1.0 - buffer_pct)).astype(int)
-    total_releasable = df['releasable'].sum()
-    to_give = min(total_releasable, need_units)
-    if to_give <= 0:
+    if index is None:
+        index = index_facilities(donors_df[donors_df['County'] == donor_county])
+    group = index.get(donor_county)
+    if group is None:
         return []
+    picks = allocate_transfers(_flatten({donor_county: group}), [donor_county], [need_units], buffer_pct,
+                               destinations=None if destination is None else [destination])
+    return [{'facility': f, 'product': p, 'units': int(u), 'meta': dict(group['meta'][pos])}
+            for f, p, u, pos in zip(picks['facility'], picks['product'], picks['units'], picks['position'])]
 
-    allocations = []
-    # allocate proportional to each facility's releasable share
-    df = df[df['releasable']>0].copy()
-    df['share'] = df['releasable'] / df['releasable'].sum()
-    df['allocate_total'] = (df['share'] * to_give).round().astype(int)
-
-    # For each facility, allocate across product columns proportionally to their stock
-    for _, row in df.iterrows():
-        facility = row['Facility']
-        alloc_total = int(row['allocate_total'])
-        if alloc_total <= 0:
-            continue
-        prod_stocks = {pc: int(row[pc]) for pc in PRODUCT_COLS}
-        prod_sum = sum(prod_stocks.values())
-        if prod_sum == 0:
-            # nothing to allocate (odd), skip
-            continue
-        # allocate per product proportionally but cap by releasable per-product
-        for pc in PRODUCT_COLS:
-            share = prod_stocks[pc] / prod_sum if prod_sum>0 else 0
-            units = int(round(share * alloc_total))
-            # ensure not exceeding stock and not giving below buffer at product level
-            units = min(units, prod_stocks[pc])
-            if units>0:
-                # include metadata if available for the facility and product
-                meta = {}
-                if isinstance(row.get('_meta_cols', ''), str) and row.get('_meta_cols'):
-                    for c in row['_meta_cols'].split(','):
-                        if c:
-                            meta[c] = row.get(c, '')
-                allocations.append({'facility': facility, 'product': pc, 'units': units, 'meta': meta})
-    # If rounding left unmet units, try to fill from largest remaining stocks
-    allocated = sum(a['units'] for a in allocations)
-    remaining = to_give - allocated
-    if remaining>0:
-        # sort facilities by remaining releasable stock and fill
-        rem_list = []
-        for _, row in df.iterrows():
-            facility = row['Facility']
-            for pc in PRODUCT_COLS:
-                rem_stock = int(row[pc])
-                if rem_stock>0:
-                    rem_list.append((facility, pc, rem_stock))
-        rem_list = sorted(rem_list, key=lambda x: x[2], reverse=True)
-        idx = 0
-        while remaining>0 and idx < len(rem_list):
-            facility, pc, qty = rem_list[idx]
-            give = min(qty, remaining)
-            # try to include metadata if available
-            meta = {}
-            row = df[df['Facility']==facility]
-            if not row.empty and row.iloc[0].get('_meta_cols'):
-                for c in row.iloc[0]['_meta_cols'].split(','):
-                    if c:
-                        meta[c] = row.iloc[0].get(c, '')
-            allocations.append({'facility': facility, 'product': pc, 'units': give, 'meta': meta})
-            remaining -= give
-            idx += 1
-    return allocations
-
-
-def main(buffer_pct: float):
-    products = load_products(PRODUCTS_CSV)
-    if not TRANSFER_CSV.exists():
-        raise SystemExit('transfer_plan.csv not found; run transfer_plan.py first')
-    transfers = pd.read_csv(TRANSFER_CSV)
-
-    # prepare donors facilities dataframe
-    donors_df = products.copy()
-    # normalize county names
-    donors_df['County'] = donors_df['County'].str.upper().str.strip()
-
-    final_rows = []
-    for _, t in transfers.iterrows():
-        donor = t['from_county']
-        recipient = t['to_county']
-        units = int(t['units'])
-        if donor == 'UNMET':
-            final_rows.append({'from_county': donor, 'to_county': recipient, 'facility': '', 'product': '', 'units': units})
-            continue
-        allocations = allocate_from_facilities(donors_df, donor, units, buffer_pct)
-        if not allocations:
-            final_rows.append({'from_county': donor, 'to_county': recipient, 'facility': '', 'product': '', 'units': 0})
-            continue
-        for a in allocations:
-            meta_fields = a.get('meta', {})
-            # flatten meta into a string for CSV
-            meta_str = '; '.join([f"{k}={v}" for k, v in meta_fields.items()]) if meta_fields else ''
-            final_rows.append({'from_county': donor, 'to_county': recipient, 'facility': a['facility'], 'product': a['product'], 'units': a['units'], 'meta': meta_str})
-
-    pick_df = pd.DataFrame(final_rows)
-    pick_df.to_csv(PICK_DIR / 'transfer_picklists_combined.csv', index=False)
-
-    # produce simple printable HTML picklists per donor with totals and readable product names
-    for donor, sub in pick_df[pick_df['from_county']!='UNMET'].groupby('from_county'):
-        html = []
-        html.append(f"<h1>Picklist: {donor}</h1>")
-        html.append(f"<p>Buffer percent applied: {buffer_pct*100:.1f}%</p>")
-        html.append(sub.to_html(index=False))
-        (PICK_DIR / f"{donor}_picklist.html").write_text('\n'.join(html), encoding='utf-8')
-
-    # also write per-donor picklists
-    for donor, sub in pick_df[pick_df['from_county']!='UNMET'].groupby('from_county'):
-        sub.to_csv(PICK_DIR / f"{donor}_picklist.csv", index=False)
+
+@timed()
+def build_picklists(products: pd.DataFrame, transfers: pd.DataFrame, buffer_pct: float, strategy: str = 'proportional') -> pd.DataFrame:
+    """Map each county-level transfer to donor facilities; returns one row per facility/product pick.
+
+    strategy='nearest' fills each transfer from the donor facilities closest to the recipient county's centroid.
+    Transfers with a product column (multi-commodity plans) draw only that product from the donor facilities.
+    Transfers from the same donor share its releasable stock in plan order (see allocate_transfers).
+    `products` is a facility frame (facility_frame) or a memory-mapped inventory.Inventory.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'unknown allocation strategy {strategy!r}; expected one of {STRATEGIES}')
+    centroids = None
+    if isinstance(products, pd.DataFrame):
+        # prepare donors facilities dataframe
+        donors_df = products.copy()
+        # normalize county names (categorical County from facility_frame is already normalized)
+        if not isinstance(donors_df['County'].dtype, pd.CategoricalDtype):
+            donors_df['County'] = donors_df['County'].str.upper().str.strip()
+        # one county-grouped facility table instead of re-filtering per transfer
+        table = facility_table(donors_df)
+        if strategy == 'nearest' and all(c in donors_df.columns for c in COORD_COLS):
+            centroids = planner.county_centroids(donors_df)
+    else:
+        # a mapped inventory.Inventory: allocation reads its donors' rows straight from the mapped stock matrix
+        table = products.table()
+        if strategy == 'nearest':
+            centroids = products.centroids()
+    from_county = transfers['from_county'].astype(str).to_numpy(dtype=object)
+    to_county = transfers['to_county'].astype(str).to_numpy(dtype=object)
+    products = transfers['product'].to_numpy(dtype=object) if 'product' in transfers.columns else None
+    units = transfers['units'].to_numpy(dtype=np.int64)
+    destinations = None
+    if centroids is not None:
+        destinations = centroids.set_index('County').reindex(to_county)[['lon', 'lat']].to_numpy(dtype=float)
+    unmet = from_county == 'UNMET'
+    picks = allocate_transfers(table, np.where(unmet, '', from_county), units, buffer_pct, products, destinations)
+
+    # UNMET transfers keep their units, transfers nothing could be allocated to get one empty row
+    empty = np.setdiff1d(np.arange(len(transfers)), picks['transfer'].to_numpy())
+    empty_rows = pd.DataFrame({'transfer': empty, 'facility': '',
+                               'product': products[empty] if products is not None else '',
+                               'units': np.where(unmet[empty], units[empty], 0), 'meta': np.nan})
+    pick_df = pd.concat([picks.drop(columns='position'), empty_rows], ignore_index=True)
+    pick_df = pick_df.sort_values('transfer', kind='stable')
+    pick_df.insert(0, 'from_county', from_county[pick_df['transfer'].to_numpy()])
+    pick_df.insert(1, 'to_county', to_county[pick_df['transfer'].to_numpy()])
+    return pick_df.drop(columns='transfer').reset_index(drop=True)
+
+
+def format_summary(pick_df: pd.DataFrame, buffer_pct: float) -> str:
+    """Render the plain-text picklist summary written to picklist_summary.txt."""
+    matrix = TransferMatrix.from_plan(pick_df)
+    lines = []
+    lines.append('Picklist summary\n')
+    lines.append('=================\n')
+    lines.append(f'Buffer percent applied to donors: {buffer_pct*100:.1f}%\n')
+    lines.append('\nTop donors (units allocated)\n')
+    lines.append(matrix.by_donor().to_string(index=False))
+    lines.append('\n\nTop recipients (units allocated)\n')
+    lines.append(matrix.by_recipient().to_string(index=False))
+    return ''.join(lines)
+
+
+def _escape(values: pd.Series) -> pd.Series:
+    text = values.astype(str).where(values.notna(), 'NaN')
+    return text.str.replace('&', '&amp;', regex=False).str.replace('<', '&lt;', regex=False).str.replace('>', '&gt;', regex=False)
+
+
+def html_table(df: pd.DataFrame) -> str:
+    """Same markup as df.to_html(index=False) for text and integer columns.
+
+    DataFrame.to_html temporarily changes the global display.max_colwidth option, so concurrent calls from
+    several threads truncate each other's cells; this renders column-wise without touching options.
+    """
+    head = ''.join(f'      <th>{c}</th>\n' for c in _escape(pd.Series(df.columns, dtype=object)))
+    rows = pd.Series('    <tr>\n', index=df.index, dtype=object)
+    for col in df.columns:
+        rows = rows + '      <td>' + _escape(df[col]) + '</td>\n'
+    body = ''.join(rows + '    </tr>\n')
+    return ('<table border="1" class="dataframe">\n  <thead>\n    <tr style="text-align: right;">\n'
+            f'{head}    </tr>\n  </thead>\n  <tbody>\n{body}  </tbody>\n</table>')
+
+
+def _render_donor(donor: str, sub: pd.DataFrame, buffer_pct: float):
+    """Printable HTML and CSV text of one donor's picklist."""
+    html = []
+    html.append(f"<h1>Picklist: {donor}</h1>")
+    html.append(f"<p>Buffer percent applied: {buffer_pct*100:.1f}%</p>")
+    html.append(html_table(sub))
+    return '\n'.join(html), sub.to_csv(index=False)
+
+
+def _write_donor(pick_dir: Path, donor: str, sub: pd.DataFrame, buffer_pct: float):
+    html, csv = _render_donor(donor, sub, buffer_pct)
+    (pick_dir / f"{donor}_picklist.html").write_text(html, encoding='utf-8')
+    (pick_dir / f"{donor}_picklist.csv").write_bytes(csv.encode('utf-8'))
+
+
+@timed()
+def write_picklists(pick_df: pd.DataFrame, buffer_pct: float, out_dir: Path = OUT, fmt: str = 'files',
+                    workers: int = None, only: set = None) -> Path:
+    """Write the combined and per-donor picklists and the summary under out_dir; returns the summary path.
+
+    fmt='files' writes <donor>_picklist.csv/.html files, 'zip' puts the same files in one picklists.zip and
+    'parquet' writes the donors' lines (no UNMET) as picklists.parquet partitioned by donor (requires pyarrow).
+    Donors are rendered on a thread pool of `workers` threads. With `only` (fmt='files'), just those donors' files
+    are rewritten.
+    """
+    if fmt not in WRITE_FORMATS:
+        raise ValueError(f'unknown picklist format {fmt!r}; expected one of {WRITE_FORMATS}')
+    if only is not None and fmt != 'files':
+        raise ValueError(f'only some donors can be rewritten with the files format, not {fmt!r}')
+    out_dir = Path(out_dir)
+    pick_dir = out_dir / 'picklists'
+    pick_dir.mkdir(parents=True, exist_ok=True)
+    # UNMET lines have no donor to pick them; they stay in the combined CSV and the summary only
+    picks = pick_df[pick_df['from_county'] != 'UNMET']
+    if only is not None:
+        picks = picks[picks['from_county'].isin(list(only))]
+
+    if fmt == 'parquet':
+        if importlib.util.find_spec('pyarrow') is None:
+            raise RuntimeError('parquet picklists need pyarrow (pip install pyarrow)')
+        dataset = pick_dir / 'picklists.parquet'
+        # pyarrow adds new files next to the ones already in a partition, so start from an empty dataset
+        shutil.rmtree(dataset, ignore_errors=True)
+        picks.to_parquet(dataset, partition_cols=['from_county'], index=False)
+    else:
+        # split once by the transfer matrix's donor codes; files and zip render from the same per-donor frames
+        donors = [(donor, picks.iloc[entries.rows]) for donor, entries in TransferMatrix.from_plan(picks).donors()]
+        pick_df.to_csv(pick_dir / 'transfer_picklists_combined.csv', index=False)
+        with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 1) + 4)) as pool:
+            if fmt == 'files':
+                list(pool.map(lambda item: _write_donor(pick_dir, item[0], item[1], buffer_pct), donors))
+            else:
+                rendered = pool.map(lambda item: (item[0], _render_donor(item[0], item[1], buffer_pct)), donors)
+                # one archive instead of thousands of small files; written from this thread as renders arrive
+                with zipfile.ZipFile(pick_dir / 'picklists.zip', 'w', zipfile.ZIP_DEFLATED) as zf:
+                    for donor, (html, csv) in rendered:
+                        zf.writestr(f"{donor}_picklist.html", html)
+                        zf.writestr(f"{donor}_picklist.csv", csv)
 
     # write summary
-    by_donor = pick_df.groupby('from_county')['units'].sum().reset_index().sort_values('units', ascending=False)
-    by_recipient = pick_df.groupby('to_county')['units'].sum().reset_index().sort_values('units', ascending=False)
-    out_txt = OUT / 'picklist_summary.txt'
-    with out_txt.open('w', encoding='utf-8') as f:
-        f.write('Picklist summary\n')
-        f.write('=================\n')
-        f.write(f'Buffer percent applied to donors: {buffer_pct*100:.1f}%\n')
-        f.write('\nTop donors (units allocated)\n')
-        f.write(by_donor.to_string(index=False))
-        f.write('\n\nTop recipients (units allocated)\n')
-        f.write(by_recipient.to_string(index=False))
-
-    print('Wrote combined picklists to', PICK_DIR / 'transfer_picklists_combined.csv')
-    print('Wrote per-donor picklists to', PICK_DIR)
+    out_txt = out_dir / 'picklist_summary.txt'
+    out_txt.write_text(format_summary(pick_df, buffer_pct), encoding='utf-8')
+    return out_txt
+
+
+def main(buffer_pct: float, fmt: str = 'files', workers: int = None, strategy: str = 'proportional'):
+    # the facility inventory is mapped from its binary export (written on first use) instead of parsing the CSV
+    import inventory
+    products = inventory.load(PRODUCTS_CSV)
+    transfers = results_store.load_table('transfers', TRANSFER_CSV)
+    if transfers is None:
+        raise SystemExit('transfer_plan.csv not found; run transfer_plan.py first')
+
+    pick_df = build_picklists(products, transfers, buffer_pct, strategy)
+    out_txt = write_picklists(pick_df, buffer_pct, fmt=fmt, workers=workers)
+    results_store.save_run('picklists', {'picks': pick_df}, {'picklist_summary': out_txt.read_text(encoding='utf-8')},
+                           {'buffer_pct': buffer_pct, 'strategy': strategy})
+
+    if fmt == 'parquet':
+        print('Wrote picklists partitioned by donor to', PICK_DIR / 'picklists.parquet')
+    else:
+        print('Wrote combined picklists to', PICK_DIR / 'transfer_picklists_combined.csv')
+        print('Wrote per-donor picklists to', PICK_DIR / 'picklists.zip' if fmt == 'zip' else PICK_DIR)
     print('Wrote picklist summary to', out_txt)
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--buffer', type=float, default=0.1, help='Donor buffer percent (0-1) to keep in donor stock')
+    parser.add_argument('--format', choices=WRITE_FORMATS, default='files',
+                        help='Per-donor files, one zip archive, or one Parquet dataset partitioned by donor')
+    parser.add_argument('--workers', type=int, default=None, help='Threads rendering donor picklists')
+    parser.add_argument('--strategy', choices=STRATEGIES, default='proportional',
+                        help='Split transfers across donor facilities by releasable share or nearest first')
     args = parser.parse_args()
-    main(args.buffer)
+    main(args.buffer, args.format, args.workers, args.strategy)
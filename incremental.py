@@ -0,0 +1,231 @@
+"""incremental.py
+Re-plan after a stock update without rebuilding everything: the county summary and facility stock are diffed
+against the state saved by the previous run (outputs/replan_state.pkl), and only what they affect is redone.
+
+ - The county-level plan is recomputed only if a county's summary row changed (or, with centroids, a county's
+   facilities moved). The planners are vectorized and take about a millisecond; a one-county change can
+   reorder the greedy ranking, so the plan is recomputed whole rather than patched.
+ - Facility allocations are redone only for donors whose transfers, facility stock or (--strategy nearest)
+   recipient locations changed; every other donor's picks are reused from the state.
+ - Per-donor picklist files are rewritten only when their rows changed, and files of donors that no longer
+   give anything are deleted. The combined CSV and the summaries are always rewritten.
+
+Usage:
+    python incremental.py --buffer 0.1          # after analysis.py has refreshed county_summary.csv
+    python incremental.py --buffer 0.1 --full   # ignore the saved state and rebuild it
+"""
+from pathlib import Path
+import argparse
+import hashlib
+import pickle
+import time
+import numpy as np
+import pandas as pd
+import generate_picklists
+import inventory
+import planner
+import results_store
+import transfer_plan
+from data_processing import COORD_COLS
+from instrumentation import timed
+
+OUT = generate_picklists.OUT
+STATE_NAME = 'replan_state.pkl'
+# Bump when the layout of the saved state changes; older states are then ignored
+STATE_VERSION = 1
+PICK_COLUMNS = ['from_county', 'to_county', 'facility', 'product', 'units', 'meta']
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _group_digests(df: pd.DataFrame, key: str) -> dict:
+    """{key value: digest of its rows (and the frame's columns), in row order}."""
+    header = '\x1f'.join(map(str, df.columns)).encode('utf-8')
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    keys = df[key].astype(str).to_numpy()
+    return {k: _digest(header + rows[pos].tobytes()) for k, pos in pd.Series(keys).groupby(keys, sort=False).indices.items()}
+
+
+def county_hashes(df: pd.DataFrame) -> dict:
+    """{county: digest of that county's rows}, so any edit to a county's rows changes its digest."""
+    return _group_digests(df, 'County')
+
+
+def picklist_hashes(pick_df: pd.DataFrame) -> dict:
+    """{donor: digest of the rows of its picklist file}."""
+    if pick_df.empty:
+        return {}
+    return _group_digests(pick_df[pick_df['from_county'] != 'UNMET'], 'from_county')
+
+
+def _changed(old: dict, new: dict) -> list:
+    return sorted(k for k in old.keys() | new.keys() if old.get(k) != new.get(k))
+
+
+def load_state(path: Path):
+    """The saved state, or None if there is none (or it was written by an incompatible version)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with path.open('rb') as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    return state if isinstance(state, dict) and state.get('version') == STATE_VERSION else None
+
+
+def save_state(state: dict, path: Path):
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with tmp.open('wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+
+
+def _donor_signatures(trans_df: pd.DataFrame, facility_h: dict, destinations: pd.DataFrame = None) -> dict:
+    """{donor: everything its picks depend on}: its transfers in order, its facilities and where they go."""
+    cols = ['from_county'] + [c for c in ('to_county', 'product', 'units') if c in trans_df.columns]
+    transfers = trans_df[cols]
+    if destinations is not None:
+        transfers = transfers.merge(destinations.rename(columns={'County': 'to_county'}), on='to_county', how='left')
+    return {donor: (h, facility_h.get(donor)) for donor, h in _group_digests(transfers, 'from_county').items()}
+
+
+@timed()
+def replan(summary_df: pd.DataFrame, facilities: pd.DataFrame, buffer_pct: float, mode: str = 'greedy',
+           centroids: pd.DataFrame = None, strategy: str = 'proportional', product_targets: dict = None,
+           state: dict = None):
+    """Return (trans_df, pick_df, new_state, report), reusing whatever `state` (from a previous call) still holds.
+
+    facilities is a generate_picklists.facility_frame. The results equal transfer_plan.build_plan and
+    generate_picklists.build_picklists on the same inputs. report lists the changed counties, the donors
+    that were re-allocated and the donor picklists to rewrite / delete.
+    """
+    params = {'mode': mode, 'buffer_pct': float(buffer_pct), 'strategy': strategy, 'product_targets': product_targets,
+              'centroids': centroids is not None}
+    summary_h, facility_h = county_hashes(summary_df), county_hashes(facilities)
+    if state is not None and (state.get('version') != STATE_VERSION or state['params'] != params):
+        state = None
+    changed_summary = _changed(state['summary'], summary_h) if state else sorted(summary_h)
+    changed_facilities = _changed(state['facilities'], facility_h) if state else sorted(facility_h)
+
+    replanned = state is None or bool(changed_summary) or (centroids is not None and bool(changed_facilities))
+    if replanned:
+        trans_df, donors, recips = transfer_plan.build_plan(summary_df, mode, centroids, product_targets=product_targets)
+    else:
+        trans_df, donors, recips = state['plan']
+
+    destinations = None
+    if strategy == 'nearest' and all(c in facilities.columns for c in COORD_COLS):
+        destinations = planner.county_centroids(facilities)
+    signatures = _donor_signatures(trans_df, facility_h, destinations)
+    key_cols = ['from_county', 'to_county'] + (['product'] if 'product' in trans_df.columns else [])
+    if state is None or trans_df[key_cols].duplicated().any():
+        # picks are matched back to their transfer by key, so a plan repeating a key is rebuilt in full
+        stale = list(signatures)
+    else:
+        stale = [d for d, sig in signatures.items() if state['signatures'].get(d) != sig]
+
+    if len(stale) == len(signatures):
+        pick_df = generate_picklists.build_picklists(facilities, trans_df, buffer_pct, strategy)
+    else:
+        todo = trans_df[trans_df['from_county'].isin(stale)]
+        counties = set(stale) | set(todo['to_county'])
+        fresh = (generate_picklists.build_picklists(facilities[facilities['County'].isin(counties)], todo, buffer_pct,
+                                                    strategy) if len(todo) else None)
+        old = state['picks']
+        kept = old[~old['from_county'].isin(stale) & old['from_county'].isin(list(signatures))]
+        pick_df = pd.concat([kept, fresh], ignore_index=True)
+        # back into plan order, as a full build_picklists would emit them
+        position = trans_df[key_cols].assign(_position=np.arange(len(trans_df)))
+        pick_df = (pick_df.merge(position, on=key_cols, how='left').sort_values('_position', kind='stable')
+                   .drop(columns='_position').reset_index(drop=True))
+        pick_df = pick_df[[c for c in PICK_COLUMNS if c in pick_df.columns]]
+
+    old_pick_h = state['picklists'] if state else {}
+    if len(stale) < len(signatures) and list(pick_df.columns) == list(state['picks'].columns):
+        # the picks of every other donor were reused as they were, so only the re-allocated ones need hashing
+        pick_h = {d: h for d, h in old_pick_h.items() if d in signatures and d not in stale}
+        pick_h.update(picklist_hashes(pick_df[pick_df['from_county'].isin(stale)]))
+    else:
+        pick_h = picklist_hashes(pick_df)
+    report = {
+        'changed_summary': changed_summary,
+        'changed_facilities': changed_facilities,
+        'replanned': replanned,
+        'reallocated': sorted(stale),
+        'rewrite': sorted(d for d, h in pick_h.items() if old_pick_h.get(d) != h),
+        'removed': sorted(old_pick_h.keys() - pick_h.keys()),
+    }
+    new_state = {'version': STATE_VERSION, 'params': params, 'summary': summary_h, 'facilities': facility_h,
+                 'plan': (trans_df, donors, recips), 'signatures': signatures, 'picks': pick_df, 'picklists': pick_h}
+    return trans_df, pick_df, new_state, report
+
+
+def write_outputs(trans_df: pd.DataFrame, pick_df: pd.DataFrame, state: dict, report: dict, out_dir: Path = OUT,
+                  centroids: pd.DataFrame = None, workers: int = None):
+    """Write the plan (if re-planned), the changed donor picklists and the new state under out_dir."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    pick_dir = out_dir / 'picklists'
+    if report['replanned'] or not (out_dir / 'transfer_plan.csv').exists():
+        _, donors, recips = state['plan']
+        trans_df.to_csv(out_dir / 'transfer_plan.csv', index=False)
+        text = transfer_plan.format_summary(trans_df, donors, recips, state['params']['mode'], centroids)
+        (out_dir / 'transfer_summary.txt').write_text(text, encoding='utf-8')
+    # files deleted (or never written) since the last run are rewritten too
+    missing = {d for d in state['picklists'] if not (pick_dir / f'{d}_picklist.csv').exists()
+               or not (pick_dir / f'{d}_picklist.html').exists()}
+    generate_picklists.write_picklists(pick_df, state['params']['buffer_pct'], out_dir,
+                                       workers=workers, only=set(report['rewrite']) | missing)
+    for donor in report['removed']:
+        for suffix in ('csv', 'html'):
+            (pick_dir / f'{donor}_picklist.{suffix}').unlink(missing_ok=True)
+    save_state(state, out_dir / STATE_NAME)
+
+
+def main(buffer_pct: float = 0.1, mode: str = 'greedy', strategy: str = 'proportional', by_product: bool = False,
+         full: bool = False, workers: int = None):
+    summary = results_store.load_table('county_summary', transfer_plan.in_csv)
+    if summary is None:
+        raise SystemExit('county_summary.csv not found; run analysis.py first')
+    facilities = inventory.load(generate_picklists.PRODUCTS_CSV).frame()
+    centroids = planner.county_centroids(facilities) if all(c in facilities.columns for c in COORD_COLS) else None
+    product_targets = planner.load_product_targets() if by_product else None
+    state = None if full else load_state(OUT / STATE_NAME)
+
+    t0 = time.perf_counter()
+    trans_df, pick_df, new_state, report = replan(summary, facilities, buffer_pct, mode, centroids, strategy,
+                                                  product_targets, state)
+    elapsed = time.perf_counter() - t0
+    write_outputs(trans_df, pick_df, new_state, report, OUT, centroids, workers)
+    if report['replanned'] or report['reallocated']:
+        results_store.save_run('incremental', {'transfers': trans_df, 'picks': pick_df},
+                               params={'buffer_pct': buffer_pct, 'mode': mode, 'strategy': strategy,
+                                       'reallocated': report['reallocated']})
+
+    print(f'Re-planned in {elapsed * 1e3:.1f} ms' + ('' if state else ' (no saved state: full rebuild)'))
+    print('Changed counties (summary):', ', '.join(report['changed_summary']) or 'none')
+    print('Changed counties (facilities):', ', '.join(report['changed_facilities']) or 'none')
+    print('County plan recomputed:', 'yes' if report['replanned'] else 'no')
+    print('Donors re-allocated:', ', '.join(report['reallocated']) or 'none')
+    print('Picklists rewritten:', ', '.join(report['rewrite']) or 'none')
+    if report['removed']:
+        print('Picklists removed:', ', '.join(report['removed']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-plan transfers and picklists for what changed since the last run')
+    parser.add_argument('--buffer', type=float, default=0.1, help='Donor buffer percent (0-1) to keep in donor stock')
+    parser.add_argument('--mode', choices=planner.MODES, default='greedy', help=planner.MODE_HELP)
+    parser.add_argument('--strategy', choices=generate_picklists.STRATEGIES, default='proportional',
+                        help='Split transfers across donor facilities by releasable share or nearest first')
+    parser.add_argument('--by-product', action='store_true',
+                        help=f'Plan every product against its own target in {planner.PRODUCT_TARGETS_JSON.name}')
+    parser.add_argument('--full', action='store_true', help='Ignore the saved state and rebuild everything')
+    parser.add_argument('--workers', type=int, default=None, help='Threads rendering donor picklists')
+    args = parser.parse_args()
+    main(args.buffer, args.mode, args.strategy, args.by_product, args.full, args.workers)
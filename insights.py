@@ -1,57 +1,86 @@
+"""insights.py
+National products-per-PWA metrics and surplus/deficit counts from the latest county summary (results store,
+else outputs/county_summary.csv).
+Produces: outputs/insights.txt (also stored in the results store)
+"""
 import pandas as pd
 from pathlib import Path
+from instrumentation import timed
+import planner
+import results_store
 
 ROOT = Path(__file__).parent
 csv = ROOT / 'outputs' / 'county_summary.csv'
-if not csv.exists():
-    raise SystemExit('county_summary.csv not found; run analysis.py first')
+out = ROOT / 'outputs' / 'insights.txt'
 
-df = pd.read_csv(csv)
-# Keep counties with >0 PWA
-df = df[df['No_PWA_2019']>0].copy()
-# Products_per_PWA may be missing; compute if not present
-if 'Products_per_PWA' not in df.columns or df['Products_per_PWA'].isnull().any():
-    df['Products_per_PWA'] = df['Total_Products'] / df['No_PWA_2019']
+# Shared with transfer planning (planner.py); compare alternatives with scenarios.py
+TARGET_PER_PERSON = planner.TARGET_PER_PERSON
 
-mean_pp = df['Products_per_PWA'].mean()
-median_pp = df['Products_per_PWA'].median()
 
-# Identify top deficits (lowest products per PWA) and surpluses (highest)
-low = df.sort_values('Products_per_PWA').head(10)[['County','No_PWA_2019','Total_Products','Products_per_PWA']]
-high = df.sort_values('Products_per_PWA', ascending=False).head(10)[['County','No_PWA_2019','Total_Products','Products_per_PWA']]
+@timed()
+def compute_insights(summary_df: pd.DataFrame, target_per_person: float = TARGET_PER_PERSON) -> dict:
+    # Keep counties with >0 PWA
+    df = summary_df[summary_df['No_PWA_2019']>0].copy()
+    # Products_per_PWA may be missing; compute if not present
+    if 'Products_per_PWA' not in df.columns or df['Products_per_PWA'].isnull().any():
+        df['Products_per_PWA'] = df['Total_Products'] / df['No_PWA_2019']
 
-# Choose a conservative target per person (policy choice) — change as needed
-TARGET_PER_PERSON = 20
+    mean_pp = df['Products_per_PWA'].mean()
+    median_pp = df['Products_per_PWA'].median()
 
-# Compute deficits/surplus relative to target
-df['target_total'] = df['No_PWA_2019'] * TARGET_PER_PERSON
-df['surplus_units'] = df['Total_Products'] - df['target_total']
+    # Identify top deficits (lowest products per PWA) and surpluses (highest)
+    low = df.sort_values('Products_per_PWA').head(10)[['County','No_PWA_2019','Total_Products','Products_per_PWA']]
+    high = df.sort_values('Products_per_PWA', ascending=False).head(10)[['County','No_PWA_2019','Total_Products','Products_per_PWA']]
 
-# Surplus positive means excess supply; negative means deficit
-surplus_total = df[df['surplus_units']>0]['surplus_units'].sum()
-deficit_total = -df[df['surplus_units']<0]['surplus_units'].sum()
+    # Compute deficits/surplus relative to target
+    df['target_total'] = df['No_PWA_2019'] * target_per_person
+    df['surplus_units'] = df['Total_Products'] - df['target_total']
 
-reallocatable = df[df['surplus_units']>0].sort_values('surplus_units', ascending=False)[['County','surplus_units']]
-needs = df[df['surplus_units']<0].sort_values('surplus_units')[['County','surplus_units']]
+    # Surplus positive means excess supply; negative means deficit
+    surplus_total = df[df['surplus_units']>0]['surplus_units'].sum()
+    deficit_total = -df[df['surplus_units']<0]['surplus_units'].sum()
 
-out = ROOT / 'outputs' / 'insights.txt'
-with out.open('w', encoding='utf-8') as f:
-    f.write('National products-per-PWA mean: {:.2f}\n'.format(mean_pp))
-    f.write('National products-per-PWA median: {:.2f}\n'.format(median_pp))
-    f.write('\nTop 10 deficit counties (lowest products per PWA):\n')
-    f.write(low.to_string(index=False))
-    f.write('\n\nTop 10 surplus counties (highest products per PWA):\n')
-    f.write(high.to_string(index=False))
-    f.write('\n\nAssumed target per PWA: {} units\n'.format(TARGET_PER_PERSON))
-    f.write('Total surplus units available: {}\n'.format(int(surplus_total)))
-    f.write('Total deficit units needed: {}\n'.format(int(deficit_total)))
-    f.write('\nCounts that can donate (surplus):\n')
-    f.write(reallocatable.to_string(index=False))
-    f.write('\n\nCounts with deficits (need units):\n')
-    f.write(needs.to_string(index=False))
-
-print('Insights written to', out)
-print('Mean products-per-PWA:', mean_pp)
-print('Median products-per-PWA:', median_pp)
-print('Total surplus units:', int(surplus_total))
-print('Total deficit units:', int(deficit_total))
+    reallocatable = df[df['surplus_units']>0].sort_values('surplus_units', ascending=False)[['County','surplus_units']]
+    needs = df[df['surplus_units']<0].sort_values('surplus_units')[['County','surplus_units']]
+    return {'mean_pp': mean_pp, 'median_pp': median_pp, 'low': low, 'high': high,
+            'target_per_person': target_per_person, 'surplus_total': surplus_total,
+            'deficit_total': deficit_total, 'reallocatable': reallocatable, 'needs': needs}
+
+
+def format_insights(ins: dict) -> str:
+    """Render insights as the plain-text report written to insights.txt."""
+    lines = []
+    lines.append('National products-per-PWA mean: {:.2f}\n'.format(ins['mean_pp']))
+    lines.append('National products-per-PWA median: {:.2f}\n'.format(ins['median_pp']))
+    lines.append('\nTop 10 deficit counties (lowest products per PWA):\n')
+    lines.append(ins['low'].to_string(index=False))
+    lines.append('\n\nTop 10 surplus counties (highest products per PWA):\n')
+    lines.append(ins['high'].to_string(index=False))
+    lines.append('\n\nAssumed target per PWA: {} units\n'.format(ins['target_per_person']))
+    lines.append('Total surplus units available: {}\n'.format(int(ins['surplus_total'])))
+    lines.append('Total deficit units needed: {}\n'.format(int(ins['deficit_total'])))
+    lines.append('\nCounts that can donate (surplus):\n')
+    lines.append(ins['reallocatable'].to_string(index=False))
+    lines.append('\n\nCounts with deficits (need units):\n')
+    lines.append(ins['needs'].to_string(index=False))
+    return ''.join(lines)
+
+
+def main():
+    summary_df = results_store.load_table('county_summary', csv)
+    if summary_df is None:
+        raise SystemExit('county_summary.csv not found; run analysis.py first')
+    ins = compute_insights(summary_df)
+    text = format_insights(ins)
+    out.write_text(text, encoding='utf-8')
+    results_store.save_run('insights', texts={'insights': text}, params={'target_per_person': ins['target_per_person']})
+
+    print('Insights written to', out)
+    print('Mean products-per-PWA:', ins['mean_pp'])
+    print('Median products-per-PWA:', ins['median_pp'])
+    print('Total surplus units:', int(ins['surplus_total']))
+    print('Total deficit units:', int(ins['deficit_total']))
+
+
+if __name__ == '__main__':
+    main()
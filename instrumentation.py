@@ -0,0 +1,209 @@
+"""instrumentation.py
+Stage timing for the pipeline scripts: wall time, CPU time, rows processed and peak traced memory, appended as
+JSON lines to a metrics file, plus opt-in per-stage profiles.
+
+Recording is off unless a metrics file or profiler is configured, either with configure() (pipeline.py
+--metrics/--profile) or through the environment, which every script honours:
+
+    PIPELINE_METRICS=outputs/metrics.jsonl python transfer_plan.py
+    PIPELINE_METRICS=outputs/metrics.jsonl PIPELINE_PROFILE=cprofile python generate_picklists.py
+
+Peak memory is traced with tracemalloc while a top-level stage runs, which slows the traced code down.
+Stages nest; each record names its parent. Hot functions decorated with timed(aggregate=True) (such as
+generate_picklists.allocate_from_facilities) are summed per enclosing stage instead of logged per call.
+Profiles (cProfile .prof, or pyinstrument .html when installed) cover top-level stages only and are written
+to PIPELINE_PROFILE_DIR (default outputs/profiles).
+"""
+from pathlib import Path
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+ROOT = Path(__file__).parent
+METRICS_ENV = 'PIPELINE_METRICS'
+PROFILE_ENV = 'PIPELINE_PROFILE'
+PROFILE_DIR_ENV = 'PIPELINE_PROFILE_DIR'
+PROFILERS = ('cprofile', 'pyinstrument')
+RUN_ID = time.strftime('%Y%m%dT%H%M%S') + f'-{os.getpid()}'
+
+_config = {'metrics': os.environ.get(METRICS_ENV) or None, 'profile': os.environ.get(PROFILE_ENV) or None,
+           'profile_dir': Path(os.environ.get(PROFILE_DIR_ENV, ROOT / 'outputs' / 'profiles'))}
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def configure(metrics=None, profile: str = None, profile_dir=None):
+    """Set the metrics file and/or profiler ('cprofile' or 'pyinstrument') for this process."""
+    if profile is not None and profile not in PROFILERS:
+        raise ValueError(f'unknown profiler {profile!r}; expected one of {PROFILERS}')
+    if metrics is not None:
+        _config['metrics'] = str(metrics)
+    if profile is not None:
+        _config['profile'] = profile
+    if profile_dir is not None:
+        _config['profile_dir'] = Path(profile_dir)
+
+
+def enabled() -> bool:
+    return bool(_config['metrics'] or _config['profile'])
+
+
+def count_rows(result):
+    """Rows in a stage's result: len() of a frame/array/list, or of the first item of a tuple."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (str, bytes, dict)) or not hasattr(result, '__len__'):
+        return None
+    return len(result)
+
+
+def _stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def write_record(record: dict):
+    """Append one JSON line to the metrics file (no-op when no metrics file is configured)."""
+    if not _config['metrics']:
+        return
+    path = Path(_config['metrics'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps({'run': RUN_ID, 'pid': os.getpid(), **record}, default=str)
+    with _write_lock, path.open('a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+class Stage:
+    """Context manager measuring one stage; set `.rows` inside the block to record rows processed.
+
+    Peak memory is measured with tracemalloc. pipeline.run traces the whole run; otherwise a top-level stage
+    starts tracing when a metrics file is set (and stops it on exit), so standalone scripts record it too.
+    """
+
+    def __init__(self, name: str, rows: int = None):
+        self.name = name
+        self.rows = rows
+        self.wall_s = self.cpu_s = 0.0
+        self.peak_mb = None
+        self.functions = {}
+        self._child_peak = 0
+        self._profiler = None
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self._started_tracing = self.parent is None and bool(_config['metrics']) and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._tracing = tracemalloc.is_tracing()
+        if self._tracing:
+            base, peak_so_far = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                # resetting the peak below would hide the parent's peak so far; hand it back on exit
+                self.parent._child_peak = max(self.parent._child_peak, peak_so_far)
+            tracemalloc.reset_peak()
+            self._base = base
+        if self.parent is None and _config['profile']:
+            self._profiler = _start_profiler(_config['profile'])
+        stack.append(self)
+        self._cpu0 = time.process_time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_s = time.perf_counter() - self._t0
+        self.cpu_s = time.process_time() - self._cpu0
+        _stack().pop()
+        if self._tracing and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._child_peak)
+            self.peak_mb = (peak - self._base) / 2**20
+            if self.parent is not None:
+                self.parent._child_peak = max(self.parent._child_peak, peak)
+        if self._started_tracing:
+            tracemalloc.stop()
+        if self._profiler is not None:
+            _stop_profiler(self._profiler, _config['profile'], self.name)
+        if enabled():
+            write_record({'kind': 'stage', 'stage': self.name, 'parent': self.parent.name if self.parent else None,
+                          'wall_s': round(self.wall_s, 6), 'cpu_s': round(self.cpu_s, 6), 'rows': self.rows,
+                          'peak_mb': None if self.peak_mb is None else round(self.peak_mb, 3),
+                          'failed': exc[0] is not None})
+            for name, agg in self.functions.items():
+                write_record({'kind': 'function', 'stage': self.name, 'function': name, 'calls': agg['calls'],
+                              'wall_s': round(agg['wall_s'], 6), 'cpu_s': round(agg['cpu_s'], 6), 'rows': agg['rows']})
+        return False
+
+
+def stage(name: str, rows: int = None) -> Stage:
+    return Stage(name, rows)
+
+
+def timed(name: str = None, aggregate: bool = False, rows=count_rows):
+    """Decorator recording each call as a stage (aggregate=False) or summing calls into the enclosing stage.
+
+    `rows` maps the function's result to the rows processed. Calls cost one check when recording is off.
+    """
+    def decorate(fn):
+        # module file stem rather than __module__, which is '__main__' when the script runs directly
+        label = name or f'{Path(fn.__code__.co_filename).stem}.{fn.__qualname__}'
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            if not aggregate:
+                with Stage(label) as st:
+                    result = fn(*args, **kwargs)
+                    st.rows = rows(result)
+                return result
+            t0, cpu0 = time.perf_counter(), time.process_time()
+            result = fn(*args, **kwargs)
+            wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            stack = _stack()
+            if stack:
+                agg = stack[-1].functions.setdefault(label, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': 0})
+                agg['calls'] += 1
+                agg['wall_s'] += wall
+                agg['cpu_s'] += cpu
+                agg['rows'] += rows(result) or 0
+            else:
+                write_record({'kind': 'function', 'stage': None, 'function': label, 'calls': 1, 'wall_s': round(wall, 6),
+                              'cpu_s': round(cpu, 6), 'rows': rows(result)})
+            return result
+        return wrapper
+    return decorate
+
+
+def _start_profiler(kind: str):
+    if kind == 'pyinstrument':
+        try:
+            import pyinstrument
+        except ImportError:
+            raise SystemExit('pyinstrument profiling needs pyinstrument (pip install pyinstrument)')
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, kind: str, stage_name: str):
+    out_dir = _config['profile_dir']
+    out_dir.mkdir(parents=True, exist_ok=True)
+    base = f"{RUN_ID}-{stage_name.replace('/', '_')}"
+    if kind == 'pyinstrument':
+        profiler.stop()
+        path = out_dir / f'{base}.html'
+        path.write_text(profiler.output_html(), encoding='utf-8')
+    else:
+        profiler.disable()
+        path = out_dir / f'{base}.prof'
+        profiler.dump_stats(path)
+    write_record({'kind': 'profile', 'stage': stage_name, 'profiler': kind, 'path': str(path)})
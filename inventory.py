@@ -0,0 +1,189 @@
+"""inventory.py
+Binary facility inventory: the facility x product stock matrix of a products CSV exported once as .npy files and
+memory-mapped by every later planning run instead of re-parsing the CSV.
+
+An export directory (under data/cache/inventory/, one per products file) holds:
+ - stock.npy     int64 (n_facilities, n_products), facilities sorted by county
+ - county.npy    int32 county code of every facility; offsets.npy the first row of each county (+ the end)
+ - facility.npy  facility names; coords.npy lon/lat per facility and meta.npy metadata columns, when present
+ - manifest.json counties, products, metadata columns and the size/mtime of the source CSV
+
+Inventory maps the arrays read-only (np.load mmap_mode='r'), so opening one takes milliseconds, each county's
+facilities are a slice of the mapped matrix, and every process mapping it (e.g. pool workers, which receive an
+Inventory as its directory when pickled) shares one physical copy through the page cache.
+generate_picklists.build_picklists accepts an Inventory wherever it takes a facility frame and allocates straight
+from the mapped matrix, copying only the rows of the donor counties in the plan.
+
+Usage:
+    python inventory.py                        # export (or refresh) the inventory of the products CSV
+    python inventory.py --products other.csv
+"""
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+import data_processing
+import generate_picklists
+import planner
+from data_processing import COORD_COLS
+from generate_picklists import PRODUCT_COLS
+from instrumentation import timed
+
+# Bumped when the export layout changes, so older exports are rebuilt
+INVENTORY_VERSION = 1
+
+
+def inventory_dir(products_csv, root: Path = None) -> Path:
+    """Export directory of a products CSV (under data_processing.CACHE_DIR unless root is given)."""
+    root = Path(data_processing.CACHE_DIR) / 'inventory' if root is None else Path(root)
+    return root / hashlib.sha256(str(Path(products_csv).resolve()).encode('utf-8')).hexdigest()[:20]
+
+
+def _source(products_csv) -> dict:
+    st = os.stat(products_csv)
+    return {'path': str(Path(products_csv).resolve()), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+@timed()
+def export(products_csv=generate_picklists.PRODUCTS_CSV, out_dir: Path = None) -> Path:
+    """Write the inventory of products_csv (generate_picklists.load_products) and return its directory."""
+    out_dir = inventory_dir(products_csv) if out_dir is None else Path(out_dir)
+    source = _source(products_csv)
+    df = generate_picklists.load_products(products_csv)
+    county = df['County'].astype('category')
+    order = np.argsort(county.cat.codes.to_numpy(), kind='stable')
+    codes = county.cat.codes.to_numpy()[order].astype(np.int32)
+    counties = [str(c) for c in county.cat.categories]
+    arrays = {
+        'stock': df[PRODUCT_COLS].to_numpy(dtype=np.int64)[order],
+        'county': codes,
+        'offsets': np.searchsorted(codes, np.arange(len(counties) + 1)).astype(np.int64),
+        'facility': df['Facility'].astype(str).to_numpy(dtype=str)[order],
+    }
+    if all(c in df.columns for c in COORD_COLS):
+        arrays['coords'] = df[COORD_COLS].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)[order]
+    meta_cols = [c for c in df.attrs.get('meta_cols', []) if c in df.columns]
+    if meta_cols:
+        arrays['meta'] = df[meta_cols].astype(str).to_numpy(dtype=str)[order]
+
+    # write next to the target and swap it in, so readers never see a partial export
+    tmp = out_dir.with_name(f'{out_dir.name}.tmp-{os.getpid()}')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, values in arrays.items():
+        np.save(tmp / f'{name}.npy', values)
+    manifest = {'version': INVENTORY_VERSION, 'source': source, 'products': PRODUCT_COLS, 'counties': counties,
+                'meta_cols': meta_cols, 'facilities': len(codes)}
+    (tmp / 'manifest.json').write_text(json.dumps(manifest, indent=1), encoding='utf-8')
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    os.replace(tmp, out_dir)
+    return out_dir
+
+
+def is_current(products_csv, out_dir: Path = None) -> bool:
+    """True if the export of products_csv exists and matches the file's size and mtime and the export layout."""
+    manifest = (inventory_dir(products_csv) if out_dir is None else Path(out_dir)) / 'manifest.json'
+    try:
+        m = json.loads(manifest.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    return (m.get('version') == INVENTORY_VERSION and m.get('products') == PRODUCT_COLS
+            and m.get('source') == _source(products_csv))
+
+
+class Inventory:
+    """Read-only memory-mapped inventory export (see export).
+
+    Attributes: stock (n_facilities, n_products), county (codes into counties), offsets, facility, coords (or
+    None), meta (or None) with meta_cols, all numpy memmaps.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        manifest = json.loads((self.path / 'manifest.json').read_text(encoding='utf-8'))
+        self.counties = manifest['counties']
+        self.meta_cols = manifest['meta_cols']
+        self.stock = np.load(self.path / 'stock.npy', mmap_mode='r')
+        self.county = np.load(self.path / 'county.npy', mmap_mode='r')
+        self.offsets = np.load(self.path / 'offsets.npy')
+        self.facility = np.load(self.path / 'facility.npy', mmap_mode='r')
+        optional = {name: self.path / f'{name}.npy' for name in ('coords', 'meta')}
+        self.coords = np.load(optional['coords'], mmap_mode='r') if optional['coords'].exists() else None
+        self.meta = np.load(optional['meta'], mmap_mode='r') if optional['meta'].exists() else None
+        self._table = self._centroids = None
+
+    def __len__(self) -> int:
+        return len(self.county)
+
+    def __reduce__(self):
+        # pickled as its directory: a worker process maps the same files instead of receiving a copy
+        return (Inventory, (str(self.path),))
+
+    def table(self) -> dict:
+        """The inventory as a generate_picklists.facility_table whose arrays are the maps themselves (no copy);
+        built once per Inventory."""
+        if self._table is None:
+            self._table = {
+                'counties': {county: i for i, county in enumerate(self.counties)},
+                'start': self.offsets[:-1],
+                'count': np.diff(self.offsets),
+                'county': self.county,
+                'facility': self.facility,
+                'stock': self.stock,
+                'meta': self.meta,
+                'meta_cols': list(self.meta_cols) if self.meta is not None else [],
+                'coords': self.coords,
+            }
+        return self._table
+
+    def centroids(self) -> pd.DataFrame:
+        """planner.county_centroids of the facilities (None without coordinates)."""
+        if self.coords is None:
+            return None
+        if self._centroids is None:
+            self._centroids = planner.county_centroids(pd.DataFrame({
+                'County': np.asarray(self.counties, dtype=object)[self.county],
+                COORD_COLS[0]: self.coords[:, 0], COORD_COLS[1]: self.coords[:, 1]}))
+        return self._centroids
+
+    def frame(self) -> pd.DataFrame:
+        """The inventory as a generate_picklists.facility_frame (rows grouped by county)."""
+        df = pd.DataFrame({'County': pd.Categorical.from_codes(np.asarray(self.county), self.counties),
+                           'Facility': pd.Categorical(np.asarray(self.facility))})
+        for j, pc in enumerate(PRODUCT_COLS):
+            df[pc] = np.asarray(self.stock[:, j])
+        if self.coords is not None:
+            df[COORD_COLS[0]], df[COORD_COLS[1]] = np.asarray(self.coords[:, 0]), np.asarray(self.coords[:, 1])
+        for j, c in enumerate(self.meta_cols):
+            df[c] = np.asarray(self.meta[:, j])
+        df.attrs['meta_cols'] = list(self.meta_cols)
+        return df
+
+
+def load(products_csv=generate_picklists.PRODUCTS_CSV, out_dir: Path = None) -> Inventory:
+    """Map the inventory of products_csv, exporting it first if it is missing or older than the file."""
+    out_dir = inventory_dir(products_csv) if out_dir is None else Path(out_dir)
+    if not is_current(products_csv, out_dir):
+        export(products_csv, out_dir)
+    return Inventory(out_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the facility inventory as memory-mapped arrays')
+    parser.add_argument('--products', type=Path, default=generate_picklists.PRODUCTS_CSV, help='Products CSV')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    path = export(args.products)
+    exported = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    inv = Inventory(path)
+    print(f'Exported {len(inv)} facilities x {inv.stock.shape[1]} products in {len(inv.counties)} counties '
+          f'in {exported:.2f}s to {path}')
+    print(f'Mapped in {(time.perf_counter() - t0) * 1e3:.2f} ms')
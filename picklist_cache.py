@@ -0,0 +1,109 @@
+"""picklist_cache.py
+In-memory cache of the facility inventory, transfer plan and per-buffer picklists for interactive front ends
+(streamlit_app.py).
+
+Inputs are reloaded only when the products CSV or the transfer plan changes (size, mtime and content hash of
+the files, or a newer transfers run when reading the plan from the results store).
+Picklists are memoized per buffer value with LRU eviction and computed on a background thread pool, so a
+caller can show a cached result immediately and poll for one that is still being computed.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+import threading
+import pandas as pd
+import data_processing
+import generate_picklists
+import inventory
+import results_store
+
+
+def _failed(future: Future) -> bool:
+    """True once a future has finished with an exception (or was cancelled)."""
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+class PicklistCache:
+    def __init__(self, products_csv: Path = generate_picklists.PRODUCTS_CSV,
+                 transfer_csv: Path = generate_picklists.TRANSFER_CSV, maxsize: int = 32, workers: int = 2,
+                 store: Path = None):
+        self.products_csv = Path(products_csv)
+        self.transfer_csv = Path(transfer_csv)
+        # with a results store, the latest stored transfer plan is used (transfer_csv if it has none)
+        self.store = Path(store) if store is not None else None
+        self.maxsize = maxsize
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='picklists')
+        self._lock = threading.Lock()
+        self._signature = None
+        self._inputs = None
+        self._picklists = OrderedDict()
+
+    def _current_signature(self):
+        # file_hash is memoized on (size, mtime), so unchanged files are not re-read
+        run_id = results_store.latest_run('transfers', self.store) if self.store is not None else None
+        transfers = ('run', run_id) if run_id else data_processing.file_hash(self.transfer_csv)
+        return (data_processing.file_hash(self.products_csv), transfers)
+
+    def _refresh(self, signature):
+        """(facilities, transfers) for signature, reloading them (and dropping cached picklists) if they changed.
+        Called with the lock held."""
+        if signature != self._signature:
+            # mapped from the binary inventory export (re-exported when the CSV changed)
+            facilities = inventory.load(self.products_csv)
+            run_id = signature[1][1] if isinstance(signature[1], tuple) else None
+            transfers = (results_store.read_table('transfers', run_id, path=self.store) if run_id
+                         else pd.read_csv(self.transfer_csv))
+            self._inputs = (facilities, transfers)
+            self._signature = signature
+            self._picklists.clear()
+        return self._inputs
+
+    def inputs(self):
+        """Return (facilities, transfers), reloading them (and dropping cached picklists) if either file changed."""
+        signature = self._current_signature()
+        with self._lock:
+            return self._refresh(signature)
+
+    def submit(self, buffer_pct: float) -> Future:
+        """Future for the picklists of buffer_pct; cached futures are returned without recomputing, except those
+        that failed, which are computed again."""
+        signature = self._current_signature()
+        with self._lock:
+            # inputs and key under one lock hold, so a concurrent reload cannot pair them with another signature
+            facilities, transfers = self._refresh(signature)
+            key = (self._signature, round(float(buffer_pct), 4))
+            future = self._picklists.get(key)
+            if future is not None and not _failed(future):
+                self._picklists.move_to_end(key)
+                return future
+            future = self._pool.submit(generate_picklists.build_picklists, facilities, transfers, key[1])
+            self._picklists[key] = future
+            self._picklists.move_to_end(key)
+            # drop failed entries, then evict least recently used ones (never one still running)
+            for old_key in [k for k, f in self._picklists.items() if _failed(f)]:
+                del self._picklists[old_key]
+            for old_key in list(self._picklists):
+                if len(self._picklists) <= self.maxsize:
+                    break
+                if self._picklists[old_key].done():
+                    del self._picklists[old_key]
+            return future
+
+    def get(self, buffer_pct: float, timeout: float = None):
+        """Picklists for buffer_pct, or None if they are not ready within timeout seconds."""
+        future = self.submit(buffer_pct)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            return None
+
+    def prefetch(self, buffers):
+        """Start computing picklists for buffers in the background (e.g. the slider's neighbours)."""
+        for b in buffers:
+            if 0.0 <= b <= 1.0:
+                self.submit(b)
+
+    def cached_buffers(self) -> list:
+        with self._lock:
+            return sorted(k[1] for k, f in self._picklists.items()
+                          if k[0] == self._signature and f.done() and not _failed(f))
@@ -0,0 +1,163 @@
+"""pipeline.py
+Run every stage of the project in one interpreter, handing DataFrames between stages in memory
+instead of writing and re-reading CSVs (the run_all.ps1 sequence as a single process).
+
+Stages: clean -> analysis -> insights -> transfer_plan -> picklists -> sensitivity -> brief.
+Artifacts under outputs/ (and data/clean/) are only written when `write=True` / `--write`, which also records
+every stage's tables as one run in the results store (outputs/results.sqlite, see results_store.py).
+Each stage's wall time, CPU time, rows and peak traced memory are reported; --metrics appends them (and the
+nested function timings, see instrumentation.py) to a JSON-lines file and --profile writes per-stage profiles.
+
+Usage:
+    python pipeline.py                 # compute everything, write nothing
+    python pipeline.py --write         # also write the same artifacts as run_all.ps1
+    python pipeline.py --write --mode mincost --buffer 0.15
+    python pipeline.py --metrics outputs/metrics.jsonl --profile cprofile
+"""
+from pathlib import Path
+import tracemalloc
+import argparse
+import pandas as pd
+
+import instrumentation
+import data_processing
+import analysis
+import insights
+import planner
+import transfer_plan
+import generate_picklists
+import sensitivity
+import executive_brief
+import results_store
+
+ROOT = Path(__file__).parent
+OUT = ROOT / 'outputs'
+PRODUCTS_CSV = ROOT / 'distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv'
+POPULATION_CSV = ROOT / 'distribution-of-persons-with-albinism-by-sex1-area-of-residence-county-and-sub-county-2019-censu (1).csv'
+
+
+TIMING_COLUMNS = ['stage', 'seconds', 'cpu_seconds', 'rows', 'peak_mb']
+
+
+def _stage(name: str, timings: list, fn, *args, **kwargs):
+    """Run fn as an instrumentation stage, recording wall/CPU time, rows and the peak traced memory allocated
+    on top of what was already live."""
+    with instrumentation.stage(name) as st:
+        result = fn(*args, **kwargs)
+        st.rows = instrumentation.count_rows(result)
+    timings.append({'stage': name, 'seconds': round(st.wall_s, 4), 'cpu_seconds': round(st.cpu_s, 4), 'rows': st.rows,
+                    'peak_mb': round(st.peak_mb, 2)})
+    return result
+
+
+def run(products_csv=PRODUCTS_CSV, population_csv=POPULATION_CSV, buffer_pct: float = 0.1, mode: str = 'greedy',
+        buffers=sensitivity.BUFFERS, write: bool = False, out_dir: Path = OUT, use_cache: bool = True) -> dict:
+    """Run the full pipeline and return every stage's result plus a `timings` frame.
+
+    Keys: products, population, county_summary, insights, transfer_plan, picklists, sensitivity, brief, timings
+    (and run_id, the results store run, when writing).
+    """
+    out_dir = Path(out_dir)
+    if write:
+        out_dir.mkdir(parents=True, exist_ok=True)
+    timings = []
+    results = {}
+    texts = {}
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        def clean():
+            products, _ = data_processing.load_clean(products_csv, data_processing.clean_products, use_cache)
+            population, _ = data_processing.load_clean(population_csv, data_processing.clean_population, use_cache)
+            if write:
+                data_processing.save_clean(products, 'clean_products.csv')
+                data_processing.save_clean(population, 'clean_population.csv')
+            return products, population
+        results['products'], results['population'] = _stage('clean', timings, clean)
+
+        def county_summary():
+            merged = analysis.county_summary(results['products'], results['population'])
+            if write:
+                analysis.write_report(merged, results['products'], out_dir)
+            return merged
+        results['county_summary'] = _stage('analysis', timings, county_summary)
+
+        def compute_insights():
+            ins = insights.compute_insights(results['county_summary'])
+            ins['text'] = insights.format_insights(ins)
+            if write:
+                (out_dir / 'insights.txt').write_text(ins['text'], encoding='utf-8')
+            return ins
+        results['insights'] = _stage('insights', timings, compute_insights)
+
+        def plan():
+            centroids = planner.county_centroids(results['products'])
+            trans_df, donors, recips = transfer_plan.build_plan(results['county_summary'], mode, centroids)
+            if write:
+                trans_df.to_csv(out_dir / 'transfer_plan.csv', index=False)
+                texts['transfer_summary'] = transfer_plan.format_summary(trans_df, donors, recips, mode, centroids)
+                (out_dir / 'transfer_summary.txt').write_text(texts['transfer_summary'], encoding='utf-8')
+            return trans_df
+        results['transfer_plan'] = _stage('transfer_plan', timings, plan)
+
+        facilities = generate_picklists.facility_frame(results['products'])
+
+        def picklists():
+            pick_df = generate_picklists.build_picklists(facilities, results['transfer_plan'], buffer_pct)
+            if write:
+                out_txt = generate_picklists.write_picklists(pick_df, buffer_pct, out_dir)
+                texts['picklist_summary'] = out_txt.read_text(encoding='utf-8')
+            return pick_df
+        results['picklists'] = _stage('picklists', timings, picklists)
+
+        def sweep():
+            summary = sensitivity.sweep(facilities, results['county_summary'], buffers, [transfer_plan.TARGET_PER_PERSON],
+                                        mode, processes=1)
+            if write:
+                summary.to_csv(out_dir / 'sensitivity_summary.csv', index=False)
+            return summary
+        results['sensitivity'] = _stage('sensitivity', timings, sweep)
+
+        def brief():
+            html = executive_brief.render_brief(results['insights']['text'], results['transfer_plan'])
+            if write:
+                (out_dir / 'executive_brief.html').write_text(html, encoding='utf-8')
+            return html
+        results['brief'] = _stage('brief', timings, brief)
+
+        if write:
+            def store():
+                texts['insights'] = results['insights']['text']
+                tables = {'county_summary': results['county_summary'], 'transfers': results['transfer_plan'],
+                          'picks': results['picklists'], 'sensitivity': results['sensitivity']}
+                return results_store.save_run('pipeline', tables, texts, {'buffer_pct': buffer_pct, 'mode': mode},
+                                              out_dir / results_store.STORE_DB.name)
+            results['run_id'] = _stage('store', timings, store)
+    finally:
+        if not started:
+            tracemalloc.stop()
+
+    results['timings'] = pd.DataFrame(timings, columns=TIMING_COLUMNS).astype({'rows': 'Int64'})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the full pipeline in one process')
+    parser.add_argument('--products', default=str(PRODUCTS_CSV))
+    parser.add_argument('--population', default=str(POPULATION_CSV))
+    parser.add_argument('--buffer', type=float, default=0.1, help='Donor buffer percent (0-1) to keep in donor stock')
+    parser.add_argument('--mode', choices=planner.MODES, default='greedy', help=planner.MODE_HELP)
+    parser.add_argument('--write', action='store_true', help='Write artifacts to outputs/ and data/clean/')
+    parser.add_argument('--no-cache', action='store_true', help='Re-clean the raw CSVs instead of using data/cache')
+    parser.add_argument('--metrics', default=None, help='Append stage metrics as JSON lines to this file')
+    parser.add_argument('--profile', choices=instrumentation.PROFILERS, default=None,
+                        help='Write a profile of every stage (pyinstrument must be installed for pyinstrument)')
+    args = parser.parse_args()
+    instrumentation.configure(args.metrics, args.profile)
+
+    res = run(args.products, args.population, args.buffer, args.mode, write=args.write, use_cache=not args.no_cache)
+    print(res['timings'].to_string(index=False))
+    print('Total seconds:', round(res['timings']['seconds'].sum(), 3))
+    if args.write:
+        print('Artifacts written to', OUT)
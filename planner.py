@@ -0,0 +1,528 @@
+"""planner.py
+County-level transfer planning: match donor surplus to recipient need.
+
+Modes:
+ - greedy:  largest-need recipients draw from largest-surplus donors in order (the original transfer_plan.py loop).
+ - mincost: solve matching as a transportation problem: the plan with the least units x km, using county
+            centroids (`Centroid_x`/`Centoid_Y` from the products CSV) for distances.
+
+Both modes return a plan frame with columns from_county, to_county, units; recipient need that no donor can
+cover is reported with from_county == 'UNMET'.
+
+Multi-commodity planning (product_surplus / product_plan) keeps a surplus vector per county with one entry per
+product, against per-product targets from product_targets.json, and adds a product column to the plan.
+"""
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Conservative target per person (policy choice) — change as needed
+TARGET_PER_PERSON = 20
+# Assumed average shipped weight of one product unit (lotion bottle / cap / T-shirt), used for ton-km
+KG_PER_UNIT = 0.25
+MODES = ('greedy', 'mincost')
+# --mode help shared by the command-line scripts
+MODE_HELP = ('Planning mode: greedy fills the largest need from the largest surplus; mincost ships along the plan with '
+             'the least ton-km (needs the facility centroids)')
+# Target units per PWA for each product column (alongside product_map.json)
+PRODUCT_TARGETS_JSON = Path(__file__).parent / 'product_targets.json'
+EARTH_RADIUS_KM = 6371.0
+
+
+def surplus_table(summary_df: pd.DataFrame, target_per_person: float = TARGET_PER_PERSON) -> pd.DataFrame:
+    """Add target_total/surplus_units to a county summary (positive = excess supply, negative = deficit)."""
+    df = summary_df.copy()
+    if 'surplus_units' not in df.columns:
+        df['No_PWA_2019'] = df['No_PWA_2019'].fillna(0).astype(int)
+        df['target_total'] = df['No_PWA_2019'] * target_per_person
+        df['surplus_units'] = df['Total_Products'] - df['target_total']
+    else:
+        # ensure numeric
+        df['surplus_units'] = pd.to_numeric(df['surplus_units'], errors='coerce').fillna(0).astype(int)
+    return df
+
+
+def split_donors_recipients(df: pd.DataFrame):
+    """Return (donors, recipients) sorted by largest surplus / largest need."""
+    donors = df[df['surplus_units'] > 0][['County', 'surplus_units']].copy()
+    recips = df[df['surplus_units'] < 0][['County', 'surplus_units']].copy()
+    recips['need'] = -recips['surplus_units']
+    donors = donors.sort_values('surplus_units', ascending=False).reset_index(drop=True)
+    recips = recips.sort_values('need', ascending=False).reset_index(drop=True)
+    return donors, recips
+
+
+def _plan_frame(from_county, to_county, units) -> pd.DataFrame:
+    return pd.DataFrame({'from_county': from_county, 'to_county': to_county,
+                         'units': np.asarray(units, dtype=np.int64)})
+
+
+def greedy_plan(donors: pd.DataFrame, recips: pd.DataFrame) -> pd.DataFrame:
+    """Fill recipients in order from donors in order.
+
+    Each recipient drains donors front to back, so the plan is the north-west corner solution of the
+    sorted supply/need vectors; it is computed from their cumulative sums instead of a nested loop.
+    """
+    supply = donors['surplus_units'].to_numpy(dtype=np.int64)
+    need = recips['need'].to_numpy(dtype=np.int64)
+    cum_supply = np.cumsum(supply)
+    cum_need = np.cumsum(need)
+    flow = min(cum_supply[-1] if len(supply) else 0, cum_need[-1] if len(need) else 0)
+
+    # every segment between consecutive breakpoints is one donor -> recipient shipment
+    cuts = np.union1d(cum_supply[cum_supply < flow], cum_need[cum_need < flow])
+    starts = np.concatenate([[0], cuts]).astype(np.int64)
+    ends = np.concatenate([cuts, [flow]]).astype(np.int64)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    d_idx = np.searchsorted(cum_supply, starts, side='right')
+    r_idx = np.searchsorted(cum_need, starts, side='right')
+
+    # need beyond the total supply stays unmet
+    unmet = np.clip(cum_need - flow, 0, need)
+    u_idx = np.flatnonzero(unmet > 0)
+
+    recipient = np.concatenate([r_idx, u_idx])
+    order = np.argsort(recipient, kind='stable')
+    from_county = np.concatenate([donors['County'].to_numpy()[d_idx], np.full(len(u_idx), 'UNMET', dtype=object)])
+    return _plan_frame(from_county[order], recips['County'].to_numpy()[recipient[order]],
+                       np.concatenate([ends - starts, unmet[u_idx]])[order])
+
+
+def load_product_targets(path=PRODUCT_TARGETS_JSON) -> dict:
+    """{product column: target units per PWA}."""
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def product_surplus(summary_df: pd.DataFrame, targets: dict):
+    """Per-product surplus of every county: (counties, products, surplus) with surplus an (n_counties, n_products)
+    int array, stock minus round(No_PWA_2019 * target) (positive = excess supply, negative = deficit).
+
+    Products missing from the summary count as zero stock.
+    """
+    products = list(targets)
+    stock = np.column_stack([summary_df[p].to_numpy(dtype=np.int64) if p in summary_df.columns
+                             else np.zeros(len(summary_df), dtype=np.int64) for p in products])
+    pwa = summary_df['No_PWA_2019'].fillna(0).to_numpy(dtype=float)
+    need = np.round(pwa[:, None] * np.array([targets[p] for p in products], dtype=float)[None, :]).astype(np.int64)
+    return summary_df['County'].astype(str).to_numpy(), products, stock - need.reshape(stock.shape)
+
+
+def product_plan(counties, products: list, surplus: np.ndarray) -> pd.DataFrame:
+    """greedy_plan for every product at once: columns from_county, to_county, product, units.
+
+    Each product's sorted supply/need vectors are laid end to end on one axis (product p occupies
+    [offset_p, offset_p + flow_p)), so the north-west corner solutions of all products come from a single
+    set of cumulative sums and searchsorted calls, for any number of products.
+    """
+    counties = np.asarray(counties, dtype=object)
+    surplus = np.asarray(surplus, dtype=np.int64).reshape(len(counties), len(products))
+    n, n_products = surplus.shape
+    supply, need = np.clip(surplus, 0, None), np.clip(-surplus, 0, None)
+    # largest surplus / largest need first, per product (column)
+    d_order = np.argsort(-supply, axis=0, kind='stable')
+    r_order = np.argsort(-need, axis=0, kind='stable')
+    cum_supply = np.cumsum(np.take_along_axis(supply, d_order, axis=0), axis=0)
+    cum_need = np.cumsum(np.take_along_axis(need, r_order, axis=0), axis=0)
+    flow = np.minimum(cum_supply[-1], cum_need[-1]) if n else np.zeros(n_products, dtype=np.int64)
+    offset = np.concatenate([[0], np.cumsum(flow)[:-1]]).astype(np.int64)
+
+    # breakpoints on the shared axis; clipping at each product's flow keeps the flattened arrays sorted
+    g_supply = (np.minimum(cum_supply, flow) + offset).T.ravel()
+    g_need = (np.minimum(cum_need, flow) + offset).T.ravel()
+    starts = np.union1d(np.union1d(offset[flow > 0], g_supply), g_need)
+    starts = starts[starts < offset[-1] + flow[-1]] if n_products else starts[:0]
+    ends = np.append(starts[1:], offset[-1] + flow[-1] if n_products else 0)
+    product = np.searchsorted(offset, starts, side='right') - 1
+    d_idx = np.searchsorted(g_supply, starts, side='right') - product * n
+    r_idx = np.searchsorted(g_need, starts, side='right') - product * n
+
+    # need beyond each product's total supply stays unmet
+    unmet = np.clip(cum_need - flow, 0, np.take_along_axis(need, r_order, axis=0))
+    u_rank, u_product = np.nonzero(unmet)
+
+    prod = np.concatenate([product, u_product])
+    rank = np.concatenate([r_idx, u_rank])
+    order = np.lexsort((rank, prod))
+    from_county = np.concatenate([counties[d_order[d_idx, product]], np.full(len(u_rank), 'UNMET', dtype=object)])
+    plan = _plan_frame(from_county[order], counties[r_order[rank, prod]][order],
+                       np.concatenate([ends - starts, unmet[u_rank, u_product]])[order])
+    plan.insert(2, 'product', np.asarray(products, dtype=object)[prod[order]])
+    return plan
+
+
+def product_donors_recipients(counties, products: list, surplus: np.ndarray):
+    """Long-form (donors, recipients) of a product surplus matrix: County, product, surplus_units (and need)."""
+    surplus = np.asarray(surplus, dtype=np.int64)
+    df = pd.DataFrame({'County': np.repeat(np.asarray(counties, dtype=object), len(products)),
+                       'product': np.tile(np.asarray(products, dtype=object), len(counties)),
+                       'surplus_units': surplus.ravel()})
+    donors = df[df['surplus_units'] > 0].reset_index(drop=True)
+    recips = df[df['surplus_units'] < 0].assign(need=lambda d: -d['surplus_units']).reset_index(drop=True)
+    return donors, recips
+
+
+def county_centroids(products_df: pd.DataFrame) -> pd.DataFrame:
+    """Mean facility centroid per county as columns County, lon, lat."""
+    df = pd.DataFrame({
+        'County': products_df['County'].astype(str).str.upper().str.strip(),
+        'lon': pd.to_numeric(products_df['Centroid_x'], errors='coerce'),
+        'lat': pd.to_numeric(products_df['Centoid_Y'], errors='coerce'),
+    })
+    return df.dropna().groupby('County', as_index=False)[['lon', 'lat']].mean()
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance in km; arguments broadcast like NumPy arrays."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _coords(counties, centroids: pd.DataFrame) -> np.ndarray:
+    coords = centroids.set_index('County').reindex(counties)[['lon', 'lat']]
+    missing = coords.index[coords['lon'].isna()].tolist()
+    if missing:
+        raise ValueError(f'no centroid for counties: {missing}')
+    return coords.to_numpy()
+
+
+# Distance-matrix cells computed at once while searching or pricing lanes (bounds memory on large graphs)
+_BLOCK_CELLS = 2_000_000
+# Arcs priced per simplex pivot (at least; sqrt(arcs) on larger graphs)
+_PRICING_BLOCK = 1024
+
+
+def _km_blocks(a_xyz: np.ndarray, b_xyz: np.ndarray):
+    """(first row, km) blocks of the great-circle distance matrix between unit vectors a (rows) and b (columns)."""
+    import spatial
+    step = max(1, _BLOCK_CELLS // max(len(b_xyz), 1))
+    for start in range(0, len(a_xyz), step):
+        chord2 = 2.0 - 2.0 * (a_xyz[start:start + step] @ b_xyz.T)
+        yield start, spatial.chord_to_km(np.sqrt(np.clip(chord2, 0.0, 4.0)))
+
+
+def _nearest_lanes(a_xyz: np.ndarray, b_xyz: np.ndarray, k: int, a_shift=None, b_shift=None):
+    """(a, b, km, score) for the k lanes of every a with the lowest score, km + a_shift[a] + b_shift[b]
+    (the k nearest b without shifts)."""
+    k = min(k, len(b_xyz))
+    out = []
+    for start, km in _km_blocks(a_xyz, b_xyz):
+        score = km
+        if a_shift is not None:
+            score = km + a_shift[start:start + len(km), None] + b_shift[None, :]
+        best = np.argpartition(score, k - 1, axis=1)[:, :k]
+        out.append((np.repeat(np.arange(start, start + len(km)), k), best.ravel(),
+                    np.take_along_axis(km, best, axis=1).ravel(), np.take_along_axis(score, best, axis=1).ravel()))
+    return tuple(np.concatenate(parts) for parts in zip(*out))
+
+
+class _NetworkSimplex:
+    """Primal network simplex for a transportation problem, with a root node that absorbs the imbalance.
+
+    Nodes are donors 0..D-1, recipients D..D+R-1 and the root D+R. Arcs are donor -> root (supply kept, cost 0),
+    root -> recipient (need left unmet, cost `penalty`, more than any chain of lanes, so need is only left unmet
+    when no donor can cover it) and the donor -> recipient lanes of add_lanes. Every arc is uncapacitated, so
+    the all-root tree is a feasible start. The spanning tree is kept in preorder (order, pos, size): a subtree is
+    one slice and an ancestor test is an interval check, so a pivot is a fixed number of array operations.
+    The leaving arc is the last blocking arc from the join (Cunningham's rule), which keeps the tree strongly
+    feasible and rules out cycling on degenerate pivots.
+    """
+
+    def __init__(self, supply: np.ndarray, need: np.ndarray, penalty: float, donor: np.ndarray,
+                 recipient: np.ndarray, km: np.ndarray):
+        n_d, n_r = len(supply), len(need)
+        self.n_d, self.root = n_d, n_d + n_r
+        n = n_d + n_r + 1
+        # arc v < root joins node v to the root; lanes follow
+        self.tail = np.concatenate([np.arange(n_d), np.full(n_r, self.root), donor])
+        self.head = np.concatenate([np.full(n_d, self.root), n_d + np.arange(n_r), n_d + recipient])
+        self.cost = np.concatenate([np.zeros(n_d), np.full(n_r, float(penalty)), km])
+
+        # start from the least-cost method over the lanes, shortest first: every fill exhausts its donor or its
+        # recipient, so the filled lanes form a forest with at most one node per tree left with supply or need
+        left = np.concatenate([supply, need]).astype(np.int64).tolist()
+        lane_flow = [0] * len(km)
+        lane_d, lane_r = donor.tolist(), (n_d + recipient).tolist()
+        for j in np.argsort(km, kind='stable').tolist():
+            d, r = lane_d[j], lane_r[j]
+            give = min(left[d], left[r])
+            if give > 0:
+                lane_flow[j] = give
+                left[d] -= give
+                left[r] -= give
+        self.flow = np.array(left + lane_flow, dtype=np.int64)
+
+        # that node hangs from its root arc; a tree with none hangs from a zero-flow root -> recipient arc
+        # (directed away from the root, so the start is strongly feasible)
+        adjacent = [[] for _ in range(n)]
+        for a in np.flatnonzero(self.flow > 0).tolist():
+            adjacent[self.tail[a]].append(a)
+            adjacent[self.head[a]].append(a)
+        self.parent = np.full(n, -1)
+        self.pred = np.full(n, -1)
+        self.depth = np.zeros(n, dtype=np.int64)
+        seen = np.zeros(n, dtype=bool)
+        order = []
+        starts = [self.root] + [v for v in range(n_d, n_d + n_r) if self.flow[v] == 0]
+        for v0 in starts:
+            if seen[v0]:
+                continue
+            if v0 != self.root:
+                self.parent[v0], self.pred[v0], self.depth[v0] = self.root, v0, 1
+            seen[v0] = True
+            stack = [v0]
+            while stack:
+                v = stack.pop()
+                order.append(v)
+                for a in adjacent[v]:
+                    w = self.head[a] if self.tail[a] == v else self.tail[a]
+                    if not seen[w]:
+                        seen[w] = True
+                        self.parent[w], self.pred[w], self.depth[w] = v, a, self.depth[v] + 1
+                        stack.append(w)
+        self.order = np.array(order)
+        self.pos = np.empty(n, dtype=np.int64)
+        self.pos[self.order] = np.arange(n)
+        self.size = np.ones(n, dtype=np.int64)
+        for v in order[:0:-1]:
+            self.size[self.parent[v]] += self.size[v]
+        self.basic = np.zeros(len(self.cost), dtype=bool)
+        self.basic[self.pred[self.order[1:]]] = True
+        self._parent_view, self._depth_view = memoryview(self.parent), memoryview(self.depth)
+        # potentials pi, with cost + pi[tail] - pi[head] == 0 on tree arcs; set by _refresh
+        self.pi = np.zeros(n)
+
+    def add_lanes(self, donor: np.ndarray, recipient: np.ndarray, km: np.ndarray):
+        self.tail = np.concatenate([self.tail, donor])
+        self.head = np.concatenate([self.head, self.n_d + recipient])
+        self.cost = np.concatenate([self.cost, km])
+        self.flow = np.concatenate([self.flow, np.zeros(len(km), dtype=np.int64)])
+        self.basic = np.concatenate([self.basic, np.zeros(len(km), dtype=bool)])
+
+    def solve(self, tol: float):
+        """Pivot until no arc's reduced cost is below -tol."""
+        self._refresh()
+        n_arcs = len(self.cost)
+        step = max(_PRICING_BLOCK, int(np.sqrt(n_arcs)))
+        blocks = [slice(lo, lo + step) for lo in range(0, n_arcs, step)]
+        b = clean = 0
+        # block pricing: scan the arcs a block at a time, round robin, and enter the block's most negative one
+        while clean < len(blocks):
+            arcs = blocks[b]
+            rc = self.cost[arcs] + self.pi[self.tail[arcs]] - self.pi[self.head[arcs]]
+            rc[self.basic[arcs]] = 0.0
+            j = int(np.argmin(rc))
+            b = (b + 1) % len(blocks)
+            if rc[j] < -tol:
+                self._pivot(arcs.start + j, rc[j])
+                clean = 0
+            else:
+                clean += 1
+
+    def _refresh(self):
+        # recompute potentials down the tree, dropping rounding accumulated by the pivots' shifts
+        for v in self.order[1:]:
+            a, p = self.pred[v], self.parent[v]
+            self.pi[v] = self.pi[p] + self.cost[a] if self.tail[a] == p else self.pi[p] - self.cost[a]
+
+    def _pivot(self, a: int, rc: float):
+        tail, parent, pred, depth, pos, size = self.tail, self.parent, self.pred, self.depth, self.pos, self.size
+        # the tree paths from t and h up to their join (walked through memoryviews: plain ints, no array scalars)
+        parent_of, depth_of = self._parent_view, self._depth_view
+        x, y = int(tail[a]), int(self.head[a])
+        up_t, up_h = [], []
+        while x != y:
+            if depth_of[x] >= depth_of[y]:
+                up_t.append(x)
+                x = parent_of[x]
+            else:
+                up_h.append(y)
+                y = parent_of[y]
+        path_t = np.array(up_t[::-1], dtype=np.int64)
+        path_h = np.array(up_h, dtype=np.int64)
+        # pushing flow t -> h runs down path_t and up path_h; arcs pointing against that lose flow
+        nodes = np.concatenate([path_t, path_h])
+        arcs = pred[nodes]
+        forward = np.concatenate([tail[arcs[:len(path_t)]] == parent[path_t], tail[arcs[len(path_t):]] == path_h])
+        backward = np.flatnonzero(~forward)
+        delta = self.flow[arcs[backward]].min()
+        leave = backward[self.flow[arcs[backward]] == delta][-1]
+        self.flow[arcs[forward]] += delta
+        self.flow[arcs[backward]] -= delta
+        self.flow[a] += delta
+        self.basic[a], self.basic[arcs[leave]] = True, False
+
+        # re-hang the subtree cut off by the leaving arc: re-rooted at the entering arc's endpoint s (chain runs
+        # from s up to q, the leaving arc's lower end), under the other endpoint u. Above the join nothing changes.
+        if leave < len(path_t):
+            chain, u, shift, lost, gained = path_t[leave:][::-1], self.head[a], -rc, path_t[:leave], path_h
+        else:
+            j = leave - len(path_t)
+            chain, u, shift, lost, gained = path_h[:j + 1], tail[a], rc, path_h[j + 1:], path_t
+        s, q = chain[0], chain[-1]
+        start, sz = pos[q], size[q]
+        old_size = size[chain]
+        # chain[i]'s old subtree minus chain[i - 1]'s keeps its shape and hangs under chain[i] at a new depth
+        offsets = pos[chain] - start
+        seg = len(chain) - np.cumsum(np.bincount(offsets, minlength=sz + 1)[:sz]
+                                     - np.bincount(offsets + old_size, minlength=sz + 1)[:sz])
+        block = self.order[start:start + sz]
+        depth[block] += (depth[u] + 1 + np.arange(len(chain)) - depth[chain])[seg]
+        self.pi[block] += shift
+        block = block[np.argsort(seg, kind='stable')]
+        size[lost] -= sz
+        size[gained] += sz
+        size[chain] = np.concatenate([[sz], sz - old_size[:-1]])
+        chain_pred = pred[chain]
+        parent[chain[1:]], pred[chain[1:]] = chain[:-1], chain_pred[:-1]
+        parent[s], pred[s] = u, a
+        # move the block to just after u in preorder; only the stretch between them shifts
+        if pos[u] < start:
+            lo, hi = pos[u] + 1, start + sz
+            self.order[lo:hi] = np.concatenate([block, self.order[lo:start]])
+        else:
+            lo, hi = start, pos[u] + 1
+            self.order[lo:hi] = np.concatenate([self.order[start + sz:hi], block])
+        pos[self.order[lo:hi]] = np.arange(lo, hi)
+
+
+def _mincost_rows(supply: np.ndarray, need: np.ndarray, d_xyz: np.ndarray, r_xyz: np.ndarray, k: int = 16):
+    """mincost_plan on arrays (supply/need and unit vectors of the donors/recipients): its rows as (donor,
+    recipient, units) positions, donor -1 for unmet need; per recipient, shortest lane first and unmet need last."""
+    n_d, n_r = len(supply), len(need)
+    if not n_d or not n_r:
+        u_idx = np.flatnonzero(need > 0)
+        return np.full(len(u_idx), -1, dtype=np.int64), u_idx, need[u_idx].astype(np.int64)
+
+    # lanes: each recipient's k nearest donors and each donor's k nearest recipients
+    r_near, d_near, km_r, _ = _nearest_lanes(r_xyz, d_xyz, k)
+    d_near2, r_near2, km_d, _ = _nearest_lanes(d_xyz, r_xyz, k)
+    keys, first = np.unique(np.concatenate([d_near * n_r + r_near, d_near2 * n_r + r_near2]), return_index=True)
+    km = np.concatenate([km_r, km_d])[first]
+    # unmet need costs more than any chain of lanes (each at most half the earth's circumference)
+    penalty = np.pi * EARTH_RADIUS_KM * (n_d + n_r + 1)
+    tol = 1e-12 * penalty
+    net = _NetworkSimplex(supply, need, penalty, keys // n_r, keys % n_r, km)
+    while True:
+        net.solve(tol)
+        # price every lane: the k most negative reduced costs (km + pi[donor] - pi[recipient]) per node join
+        pi_d, pi_r = net.pi[:n_d], net.pi[n_d:n_d + n_r]
+        r_new, d_new, km_r, rc_r = _nearest_lanes(r_xyz, d_xyz, k, -pi_r, pi_d)
+        d_new2, r_new2, km_d, rc_d = _nearest_lanes(d_xyz, r_xyz, k, pi_d, -pi_r)
+        new = np.concatenate([d_new * n_r + r_new, d_new2 * n_r + r_new2])
+        keep = (np.concatenate([rc_r, rc_d]) < -tol) & ~np.isin(new, keys)
+        if not keep.any():
+            break
+        new, first = np.unique(new[keep], return_index=True)
+        keys = np.concatenate([keys, new])
+        net.add_lanes(new // n_r, new % n_r, np.concatenate([km_r, km_d])[keep][first])
+
+    lanes = n_d + n_r + np.flatnonzero(net.flow[n_d + n_r:] > 0)
+    unmet = net.flow[n_d:n_d + n_r]
+    u_idx = np.flatnonzero(unmet > 0)
+    donor = np.concatenate([net.tail[lanes], np.full(len(u_idx), -1, dtype=np.int64)])
+    recipient = np.concatenate([net.head[lanes] - n_d, u_idx])
+    order = np.lexsort((donor, np.concatenate([net.cost[lanes], np.full(len(u_idx), np.inf)]), recipient))
+    return donor[order], recipient[order], np.concatenate([net.flow[lanes], unmet[u_idx]])[order]
+
+
+def mincost_plan(donors: pd.DataFrame, recips: pd.DataFrame, centroids: pd.DataFrame, k: int = 16) -> pd.DataFrame:
+    """Minimum-cost transportation plan: ships min(total supply, total need) units at the least total units x km.
+
+    The transportation problem is solved exactly by network simplex (_NetworkSimplex) on a sparse lane graph:
+    each recipient's k nearest donors and each donor's k nearest recipients. Once that is optimal, every other
+    donor -> recipient lane is priced against the simplex potentials (block by block, never the whole distance
+    matrix at once); lanes that would lower the cost are added and the simplex continues, until no lane
+    would. The plan is then optimal over all lanes, not just the nearby ones.
+    """
+    import spatial
+    supply = donors['surplus_units'].to_numpy(dtype=np.int64)
+    need = recips['need'].to_numpy(dtype=np.int64)
+    if not len(supply) or not len(need):
+        return greedy_plan(donors, recips)
+    d_xyz = spatial.to_xyz(*_coords(donors['County'], centroids).T)
+    r_xyz = spatial.to_xyz(*_coords(recips['County'], centroids).T)
+    donor, recipient, units = _mincost_rows(supply, need, d_xyz, r_xyz, k)
+    # donor -1 (unmet need) picks the trailing UNMET
+    from_county = np.append(donors['County'].to_numpy(dtype=object), 'UNMET')
+    return _plan_frame(from_county[donor], recips['County'].to_numpy(dtype=object)[recipient], units)
+
+
+def mincost_product_plan(counties, products: list, surplus: np.ndarray, centroids: pd.DataFrame,
+                         k: int = 16) -> pd.DataFrame:
+    """mincost_plan for every product (column of surplus): columns from_county, to_county, product, units.
+
+    Products do not share lanes' capacity, so each product is its own transportation problem; the counties are
+    located once for all of them and every problem is solved on arrays, with donors and recipients in
+    product_plan's order (largest first, ties in county order).
+    """
+    import spatial
+    counties = np.asarray(counties, dtype=object)
+    surplus = np.asarray(surplus, dtype=np.int64).reshape(len(counties), len(products))
+    # only products with both donors and recipients need their counties' centroids
+    matched = (surplus > 0).any(axis=0) & (surplus < 0).any(axis=0)
+    located = (surplus[:, matched] != 0).any(axis=1)
+    xyz = np.full((len(counties), 3), np.nan)
+    if located.any():
+        xyz[located] = spatial.to_xyz(*_coords(counties[located], centroids).T)
+    rows = []
+    for j in range(len(products)):
+        col = surplus[:, j]
+        d, r = np.flatnonzero(col > 0), np.flatnonzero(col < 0)
+        d, r = d[np.argsort(-col[d], kind='stable')], r[np.argsort(col[r], kind='stable')]
+        donor, recipient, units = _mincost_rows(col[d], -col[r], xyz[d], xyz[r], k)
+        rows.append((np.append(d, -1)[donor], r[recipient], np.full(len(units), j), units))
+    src, dst, prod, units = (np.concatenate(a) for a in zip(*rows)) if rows else [np.zeros(0, dtype=np.int64)] * 4
+    plan = _plan_frame(np.append(counties, 'UNMET')[src], counties[dst], units)
+    plan.insert(2, 'product', np.asarray(products, dtype=object)[prod])
+    return plan
+
+
+def plan_transfers(donors: pd.DataFrame, recips: pd.DataFrame, mode: str = 'greedy',
+                   centroids: pd.DataFrame = None) -> pd.DataFrame:
+    if mode == 'greedy':
+        return greedy_plan(donors, recips)
+    if mode == 'mincost':
+        if centroids is None:
+            raise ValueError('mincost mode needs county centroids')
+        return mincost_plan(donors, recips, centroids)
+    raise ValueError(f'unknown planning mode {mode!r}; expected one of {MODES}')
+
+
+def plan_product_transfers(counties, products: list, surplus: np.ndarray, mode: str = 'greedy',
+                           centroids: pd.DataFrame = None) -> pd.DataFrame:
+    """Multi-commodity plan (from_county, to_county, product, units) for a product surplus matrix.
+
+    greedy solves every product in one batched north-west corner (product_plan); mincost solves each product's
+    transportation problem separately (mincost_product_plan), since products do not share lanes' capacity.
+    """
+    if mode == 'greedy':
+        return product_plan(counties, products, surplus)
+    if mode != 'mincost':
+        raise ValueError(f'unknown planning mode {mode!r}; expected one of {MODES}')
+    if centroids is None:
+        raise ValueError('mincost mode needs county centroids')
+    return mincost_product_plan(counties, products, surplus, centroids)
+
+
+def _lane_km(plan: pd.DataFrame, centroids: pd.DataFrame) -> np.ndarray:
+    c = centroids.set_index('County')
+    src = c.reindex(plan['from_county'])
+    dst = c.reindex(plan['to_county'])
+    return haversine_km(src['lon'].to_numpy(), src['lat'].to_numpy(), dst['lon'].to_numpy(), dst['lat'].to_numpy())
+
+
+def add_distances(plan: pd.DataFrame, centroids: pd.DataFrame) -> pd.DataFrame:
+    """Add distance_km (county centroid to centroid) to a plan; UNMET rows get NaN."""
+    plan = plan.copy()
+    plan['distance_km'] = np.round(_lane_km(plan, centroids), 1)
+    return plan
+
+
+def ton_km(plan: pd.DataFrame, centroids: pd.DataFrame, kg_per_unit: float = KG_PER_UNIT) -> float:
+    """Total tonne-kilometres moved by a plan (UNMET rows excluded)."""
+    km = _lane_km(plan, centroids)
+    moved = (plan['from_county'] != 'UNMET').to_numpy()
+    return float(np.sum(plan['units'].to_numpy()[moved] * kg_per_unit / 1000.0 * km[moved]))
@@ -0,0 +1,94 @@
+"""population.py
+National / county / sub-county index over the cleaned census population (data_processing.clean_population).
+
+The tree is parsed once; every node's PWA and population counts (total, male, female) and every level's rollup
+table are precomputed, so lookups and drill-downs from the dashboard or planner are dictionary reads.
+
+    tree = PopulationTree(prepare_population(POPULATION_CSV))
+    tree.pwa('MOMBASA')                       # county
+    tree.pwa('MOMBASA', 'NYALI', sex='Female')  # sub-county, by sex
+    tree.children('MOMBASA')                  # drill down: sub-county rows of a county
+    tree.frame('sub_county')                  # rollup table of a whole level
+    county_pwa(pop_df)                        # county need (County, No_PWA_2019) for analysis.county_summary
+"""
+import pandas as pd
+from data_processing import POPULATION_COLS
+
+MEASURES = list(POPULATION_COLS.values())
+SEX_COLS = {'Total': 'No_PWA_2019', 'Male': 'PWA_Male', 'Female': 'PWA_Female'}
+
+
+def county_pwa(pop_df: pd.DataFrame) -> pd.DataFrame:
+    """County and No_PWA_2019 of every county node of the census tree: the need analysis.county_summary (and so
+    the planner's surplus) is computed from."""
+    return PopulationTree(pop_df).frame('county')[['County', 'No_PWA_2019']]
+
+
+def _norm(name) -> str:
+    return str(name).upper().strip()
+
+
+class PopulationTree:
+    """Precomputed rollups of a cleaned census frame.
+
+    County nodes hold the counts reported on the county rows; `discrepancies` lists counties whose reported
+    counts differ from the sum of their sub-counties (empty for the 2019 census). Without a national row the
+    national node is the sum of the counties.
+    """
+
+    def __init__(self, pop_df: pd.DataFrame):
+        df = pop_df.copy()
+        if 'Level' not in df.columns:
+            df['Level'] = 'county'
+        if 'Sub_County' not in df.columns:
+            df['Sub_County'] = None
+        for col in MEASURES:
+            if col not in df.columns:
+                df[col] = 0
+        df['County'] = df['County'].astype(str)
+        df[MEASURES] = df[MEASURES].astype('int64')
+        level = df['Level'].astype(str)
+
+        counties = df[level == 'county'].drop_duplicates('County').set_index('County')[MEASURES]
+        subs = df[level == 'sub_county'].copy()
+        subs['Sub_County'] = subs['Sub_County'].astype(str)
+        subs = subs.set_index(['County', 'Sub_County'])[MEASURES]
+        national = df[level == 'national']
+        national = national[MEASURES].iloc[0] if len(national) else counties.sum()
+
+        rollup = subs.groupby(level='County').sum()
+        diff = counties.loc[counties.index.intersection(rollup.index)] - rollup
+        self.discrepancies = diff[(diff != 0).any(axis=1)]
+        self.areas = df[level == 'area'].set_index('County')[MEASURES]
+
+        self._frames = {
+            'national': pd.DataFrame([national.to_numpy()], columns=MEASURES, index=pd.Index(['KENYA'], name='County')).reset_index(),
+            'county': counties.reset_index(),
+            'sub_county': subs.reset_index(),
+        }
+        # node key: () national, (county,) or (county, sub_county)
+        self._nodes = {(): national.to_dict()}
+        self._nodes.update({(c,): row for c, row in counties.to_dict('index').items()})
+        self._nodes.update({key: row for key, row in subs.to_dict('index').items()})
+        self._children = {(): self._frames['county']}
+        self._children.update({(c,): g.reset_index(drop=True) for c, g in self._frames['sub_county'].groupby('County', sort=False)})
+
+    def get(self, county: str = None, sub_county: str = None) -> dict:
+        """Counts of one node (national when county is None); KeyError for unknown names."""
+        key = tuple(_norm(n) for n in (county, sub_county) if n is not None)
+        return self._nodes[key]
+
+    def pwa(self, county: str = None, sub_county: str = None, sex: str = 'Total') -> int:
+        """Persons with albinism at a node; sex is 'Total', 'Male' or 'Female'."""
+        return self.get(county, sub_county)[SEX_COLS[sex]]
+
+    def children(self, county: str = None) -> pd.DataFrame:
+        """Drill down one level: the counties (national) or a county's sub-counties (empty if it has none)."""
+        key = () if county is None else (_norm(county),)
+        if key not in self._children:
+            return self._frames['sub_county'].iloc[0:0]
+        return self._children[key]
+
+    def frame(self, level: str = 'county') -> pd.DataFrame:
+        """Every node of a level ('national', 'county' or 'sub_county') with its counts."""
+        return self._frames[level]
@@ -0,0 +1,216 @@
+"""results_store.py
+Typed results of every run in one SQLite file (outputs/results.sqlite), keyed by run ID.
+
+Each stage writes its tables (county_summary, transfers, picks, sensitivity, scenarios) and report texts (insights,
+transfer_summary, picklist_summary) under the run it belongs to. Readers query just the columns and rows
+they need; `transfers` and `picks` are indexed on donor and recipient county, so a question like "all
+transfers out of KISII across runs" is an index lookup rather than a pass over CSV files. The CSV/TXT files
+in outputs/ are still written as human-readable exports.
+
+Usage:
+    python results_store.py                                        # list runs
+    python results_store.py transfers --where from_county=KISII --all-runs
+    python results_store.py picks --columns facility product units --where from_county=KISII
+"""
+from pathlib import Path
+import argparse
+import json
+from contextlib import contextmanager
+import sqlite3
+import uuid
+from datetime import datetime
+import pandas as pd
+
+ROOT = Path(__file__).parent
+STORE_DB = ROOT / 'outputs' / 'results.sqlite'
+TABLES = ('county_summary', 'transfers', 'picks', 'sensitivity', 'scenarios')
+# Secondary indexes per table (run_id is always indexed)
+INDEXES = {
+    'county_summary': [('County',)],
+    'transfers': [('from_county',), ('to_county',)],
+    'picks': [('from_county',), ('to_county',), ('facility',)],
+}
+
+
+def connect(path=STORE_DB) -> sqlite3.Connection:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute('CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, created TEXT, source TEXT, params TEXT)')
+    con.execute('CREATE TABLE IF NOT EXISTS texts (run_id TEXT, name TEXT, body TEXT, PRIMARY KEY (run_id, name))')
+    return con
+
+
+@contextmanager
+def _session(path):
+    """Connection committed on success (rolled back on error) and always closed."""
+    con = connect(path)
+    try:
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _ensure_table(con: sqlite3.Connection, table: str, df: pd.DataFrame):
+    """Create `table` for df's columns (typed from its dtypes), adding any columns an older table lacks."""
+    if table not in TABLES:
+        raise ValueError(f'unknown results table {table!r}; expected one of {TABLES}')
+    existing = [row[1] for row in con.execute(f'PRAGMA table_info({_quote(table)})')]
+    if not existing:
+        cols = ', '.join(f'{_quote(c)} {_sql_type(df[c].dtype)}' for c in df.columns)
+        con.execute(f'CREATE TABLE {_quote(table)} (run_id TEXT NOT NULL, {cols})')
+        con.execute(f'CREATE INDEX {_quote(f"ix_{table}_run")} ON {_quote(table)} (run_id)')
+        for index in INDEXES.get(table, []):
+            if all(c in df.columns for c in index):
+                name = _quote(f'ix_{table}_' + '_'.join(index))
+                con.execute(f'CREATE INDEX {name} ON {_quote(table)} ({", ".join(map(_quote, index))}, run_id)')
+        return
+    for c in df.columns:
+        if c not in existing:
+            con.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(c)} {_sql_type(df[c].dtype)}')
+
+
+def new_run(source: str, params: dict = None, path=STORE_DB) -> str:
+    """Register a run and return its ID (sortable by creation time)."""
+    now = datetime.now()
+    run_id = now.strftime('%Y%m%dT%H%M%S%f') + '-' + uuid.uuid4().hex[:6]
+    with _session(path) as con:
+        con.execute('INSERT INTO runs VALUES (?, ?, ?, ?)', (run_id, now.isoformat(timespec='seconds'), source,
+                                                            json.dumps(params or {}, default=str)))
+    return run_id
+
+
+def write_table(run_id: str, table: str, df: pd.DataFrame, path=STORE_DB):
+    """Store df as run_id's rows of table (replacing any rows that run already had there)."""
+    df = df.reset_index(drop=True)
+    # categoricals are stored as their values
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    with _session(path) as con:
+        _ensure_table(con, table, df)
+        con.execute(f'DELETE FROM {_quote(table)} WHERE run_id = ?', (run_id,))
+        cols = ['run_id', *df.columns]
+        placeholders = ', '.join('?' * len(cols))
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        con.executemany(f'INSERT INTO {_quote(table)} ({", ".join(map(_quote, cols))}) VALUES ({placeholders})',
+                        ((run_id, *row) for row in rows))
+
+
+def write_text(run_id: str, name: str, body: str, path=STORE_DB):
+    with _session(path) as con:
+        con.execute('INSERT OR REPLACE INTO texts VALUES (?, ?, ?)', (run_id, name, body))
+
+
+def latest_run(table: str = None, path=STORE_DB):
+    """ID of the newest run (that wrote `table`, a results table or a text name), or None."""
+    if not Path(path).exists():
+        return None
+    with _session(path) as con:
+        if table is None:
+            row = con.execute('SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 1').fetchone()
+        elif table in TABLES:
+            if not con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                return None
+            row = con.execute(f'SELECT MAX(run_id) FROM {_quote(table)}').fetchone()
+        else:
+            row = con.execute('SELECT MAX(run_id) FROM texts WHERE name = ?', (table,)).fetchone()
+    return row[0] if row else None
+
+
+def read_table(table: str, run_id: str = 'latest', columns: list = None, where: dict = None,
+               path=STORE_DB) -> pd.DataFrame:
+    """Rows of table for run_id ('latest' = newest run that wrote it; None = every run, with a run_id column).
+
+    columns limits the columns read; where ({column: value or list of values}) filters rows in SQL.
+    Returns an empty frame when there is no such table or run.
+    """
+    if run_id == 'latest':
+        run_id = latest_run(table, path)
+        if run_id is None:
+            return pd.DataFrame(columns=columns or [])
+    with _session(path) as con:
+        existing = [row[1] for row in con.execute(f'PRAGMA table_info({_quote(table)})')]
+        if not existing:
+            return pd.DataFrame(columns=columns or [])
+        select = list(columns) if columns else [c for c in existing if c != 'run_id']
+        if run_id is None and 'run_id' not in select:
+            select = ['run_id', *select]
+        filters = dict(where or {})
+        if run_id is not None:
+            filters['run_id'] = run_id
+        clauses, params = [], []
+        for col, value in filters.items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            clauses.append(f'{_quote(col)} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        sql = f'SELECT {", ".join(map(_quote, select))} FROM {_quote(table)}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        # rowid keeps each run's rows in the order they were written
+        sql += ' ORDER BY run_id, rowid'
+        return pd.read_sql_query(sql, con, params=params)
+
+
+def read_text(name: str, run_id: str = 'latest', path=STORE_DB):
+    """A report text of run_id ('latest' = newest run that wrote it), or None."""
+    if run_id == 'latest':
+        run_id = latest_run(name, path)
+    if run_id is None:
+        return None
+    with _session(path) as con:
+        row = con.execute('SELECT body FROM texts WHERE run_id = ? AND name = ?', (run_id, name)).fetchone()
+    return row[0] if row else None
+
+
+def runs(path=STORE_DB) -> pd.DataFrame:
+    """Every run, newest first: run_id, created, source, params."""
+    with _session(path) as con:
+        return pd.read_sql_query('SELECT * FROM runs ORDER BY run_id DESC', con)
+
+
+def save_run(source: str, tables: dict = None, texts: dict = None, params: dict = None, path=STORE_DB) -> str:
+    """Record one run: {table: frame} and {name: report text}; returns the new run ID."""
+    run_id = new_run(source, params, path)
+    for table, df in (tables or {}).items():
+        write_table(run_id, table, df, path)
+    for name, body in (texts or {}).items():
+        write_text(run_id, name, body, path)
+    return run_id
+
+
+def load_table(table: str, csv_path: Path, columns: list = None, path=STORE_DB) -> pd.DataFrame:
+    """Latest stored table, else csv_path (outputs written before the store existed), else None."""
+    if latest_run(table, path) is not None:
+        return read_table(table, columns=columns, path=path)
+    if Path(csv_path).exists():
+        return pd.read_csv(csv_path, usecols=columns)
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the results store')
+    parser.add_argument('table', nargs='?', choices=TABLES, help='Table to query (default: list runs)')
+    parser.add_argument('--run', default='latest', help='Run ID (default: the latest run that wrote the table)')
+    parser.add_argument('--all-runs', action='store_true', help='Query every run')
+    parser.add_argument('--columns', nargs='+', default=None)
+    parser.add_argument('--where', nargs='+', default=[], metavar='COLUMN=VALUE', help='Equality filters')
+    parser.add_argument('--db', default=str(STORE_DB))
+    args = parser.parse_args()
+
+    if args.table is None:
+        print(runs(args.db).to_string(index=False))
+    else:
+        where = dict(w.split('=', 1) for w in args.where)
+        print(read_table(args.table, None if args.all_runs else args.run, args.columns, where, args.db).to_string(index=False))
@@ -1,8 +1,4 @@
 # Run the full pipeline (PowerShell helper)
-python data_processing.py --products "distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv" --population "distribution-of-persons-with-albinism-by-sex1-area-of-residence-county-and-sub-county-2019-censu (1).csv"
-python analysis.py
-python insights.py
-python transfer_plan.py
-python generate_picklists.py --buffer 0.1
-python sensitivity.py
+# All stages run in one Python process and hand DataFrames over in memory; see pipeline.py
+python pipeline.py --write --products "distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv" --population "distribution-of-persons-with-albinism-by-sex1-area-of-residence-county-and-sub-county-2019-censu (1).csv" --buffer 0.1
 Write-Host "Pipeline finished. See outputs/ for reports and picklists."
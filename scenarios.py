@@ -0,0 +1,152 @@
+"""scenarios.py
+Compare target-per-PWA policies without editing source: a grid of targets per person (or of per-product target
+sets) is evaluated against the latest county summary (results store, else outputs/county_summary.csv).
+
+A grid is a frame with one row per scenario and one column per stock column it targets (Total_Products for a
+target per person, product columns for per-product targets). Surplus/deficit of every county under every
+scenario is one broadcast over an (n_scenarios, n_counties, n_products) array; transfer planning then runs
+per block of scenarios in a process pool, planning a whole block in one batched planner.plan_product_transfers
+call (greedy as one north-west corner; mincost locates the counties once and solves every scenario's network
+on arrays). The result is one row per scenario with units moved, unmet need and number of transfers.
+Produces: outputs/scenarios.csv (also stored in the results store)
+
+Usage:
+    python scenarios.py --targets 10 15 20 25 30
+    python scenarios.py --target-range 1 100.9 0.1           # 1,000 scenarios
+    python scenarios.py --by-product --scales 0.5 1 1.5      # product_targets.json scaled
+    python scenarios.py --target-range 5 50 5 --mode mincost --processes 4
+"""
+from pathlib import Path
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import planner
+import results_store
+import transfer_plan
+from instrumentation import timed
+
+ROOT = Path(__file__).parent
+SCENARIOS_CSV = ROOT / 'outputs' / 'scenarios.csv'
+# Stock column a target per person applies to
+TOTAL = 'Total_Products'
+
+
+def per_person_grid(targets) -> pd.DataFrame:
+    """Grid of targets per person, planned against each county's total products."""
+    return pd.DataFrame({TOTAL: np.asarray(targets, dtype=float)})
+
+
+def product_grid(targets: dict, scales) -> pd.DataFrame:
+    """Grid of per-product targets ({product column: units per PWA}) scaled by each of scales."""
+    scales = np.asarray(scales, dtype=float)
+    grid = pd.DataFrame(scales[:, None] * np.array(list(targets.values()), dtype=float)[None, :],
+                        columns=list(targets))
+    grid.index = pd.Index(scales, name='scale')
+    return grid
+
+
+def surplus_grid(summary_df: pd.DataFrame, grid: pd.DataFrame):
+    """(counties, surplus) with surplus an (n_scenarios, n_counties, n_products) int array: stock minus
+    round(No_PWA_2019 * target) for every scenario row and product column of grid at once.
+
+    Products missing from the summary count as zero stock (as in planner.product_surplus).
+    """
+    stock = np.column_stack([summary_df[c].to_numpy(dtype=np.int64) if c in summary_df.columns
+                             else np.zeros(len(summary_df), dtype=np.int64) for c in grid.columns])
+    pwa = summary_df['No_PWA_2019'].fillna(0).to_numpy(dtype=float)
+    need = np.round(pwa[None, :, None] * grid.to_numpy(dtype=float)[:, None, :]).astype(np.int64)
+    return summary_df['County'].astype(str).to_numpy(), stock[None, :, :] - need
+
+
+def _plan_block(args) -> dict:
+    """Plan every scenario of one block; returns units_moved, unmet_units and transfers per scenario."""
+    counties, surplus, mode, centroids = args
+    k, n, n_products = surplus.shape
+    # every (scenario, product) pair is an independent column of one batched plan
+    plan = planner.plan_product_transfers(counties, list(range(k * n_products)),
+                                          surplus.transpose(1, 0, 2).reshape(n, k * n_products), mode, centroids)
+    scenario = plan['product'].to_numpy(dtype=np.int64) // n_products
+    unmet = (plan['from_county'] == 'UNMET').to_numpy()
+    units = plan['units'].to_numpy(dtype=np.int64)
+    return {
+        'units_moved': np.bincount(scenario[~unmet], units[~unmet], minlength=k).astype(np.int64),
+        'unmet_units': np.bincount(scenario[unmet], units[unmet], minlength=k).astype(np.int64),
+        'transfers': np.bincount(scenario[~unmet], minlength=k),
+    }
+
+
+@timed()
+def run_scenarios(summary_df: pd.DataFrame, grid: pd.DataFrame, mode: str = 'greedy', centroids: pd.DataFrame = None,
+                  processes: int = None) -> pd.DataFrame:
+    """Comparison table with one row per grid row: its targets, surplus/deficit totals, donor and recipient
+    counts, and the planned units_moved, unmet_units and transfers.
+
+    Scenarios are split into blocks planned in a process pool when `processes` != 1.
+    """
+    if mode == 'mincost' and centroids is None:
+        raise ValueError('mincost mode needs county centroids')
+    counties, surplus = surplus_grid(summary_df, grid)
+    n = len(grid)
+    processes = processes or min(n, os.cpu_count() or 1)
+    # greedy blocks are single vectorized calls; mincost still solves one network per scenario, so smaller blocks
+    # balance better
+    n_blocks = max(1, min(n, processes if mode == 'greedy' else processes * 4))
+    blocks = [(counties, surplus[idx], mode, centroids) for idx in np.array_split(np.arange(n), n_blocks)]
+    if processes <= 1:
+        results = [_plan_block(b) for b in blocks]
+    else:
+        # multiprocessing is only imported when a pool is actually used
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(_plan_block, blocks))
+
+    table = grid.rename(columns={TOTAL: 'target_per_person'})
+    table = table.reset_index() if table.index.name else table.reset_index(drop=True)
+    table['surplus_units'] = np.clip(surplus, 0, None).sum(axis=(1, 2))
+    table['deficit_units'] = np.clip(-surplus, 0, None).sum(axis=(1, 2))
+    table['donors'] = (surplus > 0).any(axis=2).sum(axis=1)
+    table['recipients'] = (surplus < 0).any(axis=2).sum(axis=1)
+    for col in ('units_moved', 'unmet_units', 'transfers'):
+        table[col] = np.concatenate([r[col] for r in results]) if results else np.zeros(0, dtype=np.int64)
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare target-per-PWA policies')
+    parser.add_argument('--targets', type=float, nargs='+', default=[planner.TARGET_PER_PERSON],
+                        help='Target units per PWA (one scenario each)')
+    parser.add_argument('--target-range', type=float, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                        help='Targets from START to STOP (inclusive) in STEP increments')
+    parser.add_argument('--by-product', action='store_true',
+                        help=f'Scale the per-product targets in {planner.PRODUCT_TARGETS_JSON.name} instead')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0], help='Scale factors with --by-product')
+    parser.add_argument('--scale-range', type=float, nargs=3, metavar=('START', 'STOP', 'STEP'))
+    parser.add_argument('--mode', choices=planner.MODES, default='greedy', help=planner.MODE_HELP)
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (1 = run serially)')
+    args = parser.parse_args()
+
+    summary_df = results_store.load_table('county_summary', transfer_plan.in_csv)
+    if summary_df is None:
+        raise SystemExit('county_summary.csv not found; run analysis.py first')
+
+    def values(explicit, span):
+        if span is None:
+            return explicit
+        start, stop, step = span
+        return [round(v, 6) for v in np.arange(start, stop + step / 2, step)]
+
+    if args.by_product:
+        grid = product_grid(planner.load_product_targets(), values(args.scales, args.scale_range))
+    else:
+        grid = per_person_grid(values(args.targets, args.target_range))
+    centroids = transfer_plan.load_centroids() if args.mode == 'mincost' else None
+    if args.mode == 'mincost' and centroids is None:
+        raise SystemExit('county centroids not found; run data_processing.py first')
+
+    table = run_scenarios(summary_df, grid, args.mode, centroids, args.processes)
+    SCENARIOS_CSV.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(SCENARIOS_CSV, index=False)
+    results_store.save_run('scenarios', {'scenarios': table}, params={'mode': args.mode, 'by_product': args.by_product})
+    print(table.to_string(index=False, max_rows=40))
+    print('Wrote', SCENARIOS_CSV)
@@ -1,47 +1,138 @@
-"""Run generate_picklists with multiple buffer percentages and capture summary stats.
-Produces: outputs/sensitivity_summary.csv
+"""Sweep donor buffer percentages and targets per person, and capture summary stats for each scenario.
+Produces: outputs/sensitivity_summary.csv (one row per target/buffer scenario; also stored in the results store)
+With --write-scenarios each scenario's plan and picklists go to outputs/sensitivity/<scenario>/.
+
+Inputs are loaded once; scenarios are evaluated in a process pool.
+
+Usage:
+    python sensitivity.py
+    python sensitivity.py --buffers 0.05 0.1 0.15 --targets 15 20 25 --processes 4
+    python sensitivity.py --buffer-range 0 0.5 0.01 --write-scenarios
 """
 from pathlib import Path
-import subprocess
-import csv
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import generate_picklists
+import inventory
+import planner
+import results_store
+import transfer_plan
+from transfer_matrix import TransferMatrix
 
 ROOT = Path(__file__).parent
 OUT = ROOT / 'outputs'
-PICK_DIR = OUT / 'picklists'
 SENS_CSV = OUT / 'sensitivity_summary.csv'
+SCENARIO_DIR = OUT / 'sensitivity'
+
+BUFFERS = [0.05, 0.1, 0.15]
+TARGETS = [planner.TARGET_PER_PERSON]
+
+# Inputs shared with pool workers (set once per process by _init_worker)
+_FACILITIES = None
+_PLANS = None
+
+
+def scenario_name(target: float, buffer_pct: float) -> str:
+    return f'target_{target:g}_buffer_{buffer_pct:g}'
+
+
+def scenario_metrics(trans_df: pd.DataFrame, pick_df: pd.DataFrame) -> dict:
+    """Summary statistics for one scenario's transfer plan and picklists."""
+    unmet = trans_df['from_county'] == 'UNMET'
+    picks = pick_df[(pick_df['from_county'] != 'UNMET') & (pick_df['units'] > 0)]
+    by_donor = TransferMatrix.from_plan(pick_df).by_donor()
+    planned = int(trans_df.loc[~unmet, 'units'].sum())
+    allocated = int(picks['units'].sum())
+    return {
+        'transfers': int((~unmet).sum()),
+        'planned_units': planned,
+        'unmet_units': int(trans_df.loc[unmet, 'units'].sum()),
+        'allocated_units': allocated,
+        'shortfall_units': planned - allocated,
+        'donors': int(picks['from_county'].nunique()),
+        'facilities': int(picks[['from_county', 'facility']].drop_duplicates().shape[0]),
+        'pick_lines': int(len(picks)),
+        'top_donor': by_donor['from_county'].iloc[0] if len(by_donor) else '',
+        'top_donor_units': int(by_donor['units'].iloc[0]) if len(by_donor) else 0,
+    }
+
+
+def _init_worker(facilities: pd.DataFrame, plans: dict):
+    global _FACILITIES, _PLANS
+    _FACILITIES, _PLANS = facilities, plans
+
+
+def _run_scenario(args) -> dict:
+    target, buffer_pct, out_dir = args
+    trans_df = _PLANS[target]
+    pick_df = generate_picklists.build_picklists(_FACILITIES, trans_df, buffer_pct)
+    if out_dir is not None:
+        scenario_dir = Path(out_dir) / scenario_name(target, buffer_pct)
+        scenario_dir.mkdir(parents=True, exist_ok=True)
+        trans_df.to_csv(scenario_dir / 'transfer_plan.csv', index=False)
+        generate_picklists.write_picklists(pick_df, buffer_pct, scenario_dir)
+    row = {'target_per_person': target, 'buffer_pct': buffer_pct}
+    row.update(scenario_metrics(trans_df, pick_df))
+    return row
+
+
+def sweep(facilities: pd.DataFrame, summary_df: pd.DataFrame, buffers=BUFFERS, targets=TARGETS, mode: str = 'greedy',
+          processes: int = None, out_dir: Path = None) -> pd.DataFrame:
+    """Evaluate every (target, buffer) scenario and return one metrics row per scenario.
+
+    `facilities` is a generate_picklists.facility_frame or an inventory.Inventory (workers then map the same
+    export instead of receiving a copy); `summary_df` a county summary (analysis.county_summary).
+    Transfer plans are built once per target; picklists are allocated per scenario, in a process pool when
+    `processes` != 1. When `out_dir` is given each scenario writes to its own subdirectory.
+    """
+    centroids = None
+    if mode == 'mincost':
+        centroids = (planner.county_centroids(facilities) if isinstance(facilities, pd.DataFrame)
+                     else facilities.centroids())
+    plans = {t: transfer_plan.build_plan(summary_df, mode, centroids, t)[0] for t in targets}
+    scenarios = [(t, b, out_dir) for t in targets for b in buffers]
+    names = pd.Series([scenario_name(t, b) for t, b, _ in scenarios])
+    if names.duplicated().any():
+        # two scenarios with one name would overwrite each other's directory
+        raise ValueError(f'scenarios share a name: {sorted(set(names[names.duplicated()]))}')
+    processes = processes or min(len(scenarios), os.cpu_count() or 1)
+    if processes <= 1:
+        _init_worker(facilities, plans)
+        rows = [_run_scenario(s) for s in scenarios]
+    else:
+        # multiprocessing is only imported when a pool is actually used
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(scenarios) // (processes * 4))
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(facilities, plans)) as pool:
+            rows = list(pool.map(_run_scenario, scenarios, chunksize=chunksize))
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--buffers', type=float, nargs='+', default=BUFFERS, help='Donor buffer percents (0-1)')
+    parser.add_argument('--buffer-range', type=float, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                        help='Sweep buffers from START to STOP (inclusive) in STEP increments')
+    parser.add_argument('--targets', type=float, nargs='+', default=TARGETS, help='Target units per PWA')
+    parser.add_argument('--mode', choices=planner.MODES, default='greedy', help=planner.MODE_HELP)
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (1 = run serially)')
+    parser.add_argument('--write-scenarios', action='store_true', help=f'Write each scenario to {SCENARIO_DIR}/<scenario>/')
+    args = parser.parse_args()
+
+    summary_df = results_store.load_table('county_summary', transfer_plan.in_csv)
+    if summary_df is None:
+        raise SystemExit('county_summary.csv not found; run analysis.py first')
+    buffers = args.buffers
+    if args.buffer_range:
+        start, stop, step = args.buffer_range
+        buffers = [round(b, 6) for b in np.arange(start, stop + step / 2, step)]
+    facilities = inventory.load(generate_picklists.PRODUCTS_CSV)
 
-buffers = [0.05, 0.1, 0.15]
-rows = []
-for b in buffers:
-    # call generate_picklists.py with given buffer
-    cmd = ["python", str(ROOT / 'generate_picklists.py'), "--buffer", str(b)]
-    print('Running:', ' '.join(cmd))
-    subprocess.check_call(cmd)
-    # read picklist_summary to extract top donor total
-    summary = OUT / 'picklist_summary.txt'
-    top_donor = ''
-    donor_units = 0
-    if summary.exists():
-        text = summary.read_text()
-        # crude parsing: look for the Top donors table and pick first numeric
-        lines = text.splitlines()
-        for i, l in enumerate(lines):
-            if l.strip().startswith('from_county'):
-                if i+1 < len(lines):
-                    parts = lines[i+1].split()
-                    if len(parts)>=2:
-                        top_donor = parts[0]
-                        try:
-                            donor_units = int(parts[1])
-                        except ValueError:
-                            donor_units = 0
-                break
-    rows.append({'buffer_pct': b, 'top_donor_units': donor_units})
-
-# write CSV
-with open(SENS_CSV, 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=['buffer_pct', 'top_donor_units'])
-    writer.writeheader()
-    writer.writerows(rows)
-
-print('Wrote', SENS_CSV)
+    results = sweep(facilities, summary_df, buffers, args.targets, args.mode, args.processes,
+                    SCENARIO_DIR if args.write_scenarios else None)
+    results.to_csv(SENS_CSV, index=False)
+    results_store.save_run('sensitivity', {'sensitivity': results}, params={'mode': args.mode})
+    print(results.to_string(index=False))
+    print('Wrote', SENS_CSV)
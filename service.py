@@ -0,0 +1,320 @@
+"""service.py
+Local HTTP/JSON planning service with warm in-memory state (asyncio, standard library only).
+
+The cleaned products and population are loaded once at startup; the county summary and centroids stay in memory
+and are handed to each worker of a process pool, where the CPU-heavy planning runs (transfer plans, picklists,
+scenario grids). Facility stock is the memory-mapped inventory (inventory.py), which workers map themselves. Responses are cached as encoded JSON in an LRU keyed on the
+normalized query, and concurrent identical requests share one computation, so repeated queries are answered
+from the event loop without touching the pool.
+
+Endpoints (GET, JSON; rows as a list of records):
+    /health
+    /summary[?county=KISII]                                    county summary
+    /plan?mode=greedy&target=20[&by_product=1]                 transfer plan
+    /picklist?donor=KISII&buffer=0.1[&strategy=nearest]        one donor's picklist (plan parameters as /plan)
+    /scenarios?targets=10,20,30 | ?start=1&stop=100&step=1     scenarios.run_scenarios comparison table
+
+Usage:
+    python service.py --port 8000 --workers 4
+    curl 'http://127.0.0.1:8000/picklist?donor=KISII&buffer=0.15'
+    python benchmarks/bench_service.py                         # load test against a local instance
+"""
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import asyncio
+import json
+import os
+import signal
+import numpy as np
+import pandas as pd
+import analysis
+import data_processing
+import generate_picklists
+import inventory
+import planner
+import scenarios
+import transfer_plan
+
+ROOT = Path(__file__).parent
+PRODUCTS_CSV = ROOT / 'distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv'
+POPULATION_CSV = ROOT / 'distribution-of-persons-with-albinism-by-sex1-area-of-residence-county-and-sub-county-2019-censu (1).csv'
+DEFAULT_PORT = 8000
+# Encoded responses kept in memory (least recently used dropped first)
+CACHE_SIZE = 1024
+# Largest scenario grid one request may ask for
+MAX_SCENARIOS = 10_000
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# Warm inputs of a pool worker (set once per process by _init_worker)
+_STATE = None
+
+
+def _init_worker(state: dict):
+    global _STATE
+    _STATE = state
+
+
+def _rows(df: pd.DataFrame, **extra) -> bytes:
+    """{"rows": [...records...], **extra} as UTF-8 JSON (NaN as null)."""
+    head = json.dumps(extra)[1:-1]
+    return (b'{' + (head.encode() + b', ' if head else b'') + b'"rows": ' +
+            df.to_json(orient='records', date_format='iso').encode('utf-8') + b'}')
+
+
+def _summary_json(county: str) -> bytes:
+    df = _STATE['summary']
+    return _rows(df[df['County'].astype(str) == county] if county else df)
+
+
+def _plan(mode: str, target: float, by_product: bool) -> pd.DataFrame:
+    product_targets = planner.load_product_targets() if by_product else None
+    trans_df, _, _ = transfer_plan.build_plan(_STATE['summary'], mode, _STATE['centroids'], target, product_targets)
+    return trans_df
+
+
+def _plan_json(mode: str, target: float, by_product: bool) -> bytes:
+    trans_df = _plan(mode, target, by_product)
+    return _rows(trans_df, units=int(trans_df['units'].sum()))
+
+
+def _picklist_json(mode: str, target: float, by_product: bool, donor: str, buffer_pct: float, strategy: str) -> bytes:
+    trans_df = _plan(mode, target, by_product)
+    # a donor's transfers share its stock in plan order, but donors never share stock, so the donor's own
+    # transfers (in plan order) give the same picks as the whole plan
+    own = trans_df[trans_df['from_county'] == donor]
+    pick_df = generate_picklists.build_picklists(_STATE['facilities'], own, buffer_pct, strategy)
+    return _rows(pick_df, donor=donor, buffer=buffer_pct, units=int(pick_df['units'].sum()) if len(pick_df) else 0)
+
+
+def _scenarios_json(targets: tuple, mode: str) -> bytes:
+    table = scenarios.run_scenarios(_STATE['summary'], scenarios.per_person_grid(targets), mode, _STATE['centroids'],
+                                    processes=1)
+    return _rows(table)
+
+
+def load_state(products_csv=PRODUCTS_CSV, population_csv=POPULATION_CSV, use_cache: bool = True) -> dict:
+    """Warm inputs: county summary, facility stock (a mapped inventory.Inventory, so pool workers share one copy)
+    and county centroids (None without coordinates)."""
+    products, _ = data_processing.load_clean(products_csv, data_processing.clean_products, use_cache)
+    population, _ = data_processing.load_clean(population_csv, data_processing.clean_population, use_cache)
+    has_coords = all(c in products.columns for c in data_processing.COORD_COLS)
+    return {'summary': analysis.county_summary(products, population),
+            'facilities': inventory.load(products_csv),
+            'centroids': planner.county_centroids(products) if has_coords else None}
+
+
+class PlanningService:
+    """Endpoint handlers over warm state, with a response cache and a worker pool for planning.
+
+    `processes=False` runs planning on a thread pool instead (tests, single-core machines).
+    """
+
+    def __init__(self, state: dict, workers: int = None, processes: bool = True, cache_size: int = CACHE_SIZE):
+        self.state = state
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        workers = workers or min(4, os.cpu_count() or 1)
+        if processes:
+            # multiprocessing is only imported when a process pool is actually used
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(state,))
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            _init_worker(state)
+            self._pool = ThreadPoolExecutor(workers, thread_name_prefix='planning')
+        self.routes = {'/health': self.health, '/summary': self.summary, '/plan': self.plan,
+                       '/picklist': self.picklist, '/scenarios': self.scenarios}
+        self.hits = self.misses = 0
+
+    async def cached(self, key: tuple, fn, *args) -> bytes:
+        """fn(*args) run on the pool once per key; later (and concurrent) requests share the result."""
+        task = self._cache.get(key)
+        if task is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return task.result() if task.done() else await asyncio.shield(task)
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(loop.run_in_executor(self._pool, fn, *args))
+        self._cache[key] = task
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # failed computations are not cached
+            if self._cache.get(key) is task:
+                del self._cache[key]
+            raise
+
+    # --- parameters ---
+    @staticmethod
+    def _plan_params(q: dict) -> tuple:
+        mode = q.get('mode', 'greedy')
+        if mode not in planner.MODES:
+            raise ValueError(f'unknown planning mode {mode!r}; expected one of {planner.MODES}')
+        target = float(q.get('target', planner.TARGET_PER_PERSON))
+        by_product = q.get('by_product', '0').lower() in ('1', 'true', 'yes')
+        return mode, target, by_product
+
+    def _check_mode(self, mode: str):
+        if mode == 'mincost' and self.state['centroids'] is None:
+            raise ValueError('mincost mode needs county centroids; the products file has none')
+
+    # --- endpoints ---
+    async def health(self, q: dict) -> bytes:
+        return json.dumps({'status': 'ok', 'counties': len(self.state['summary']),
+                           'facilities': len(self.state['facilities']), 'cached': len(self._cache),
+                           'hits': self.hits, 'misses': self.misses}).encode()
+
+    async def summary(self, q: dict) -> bytes:
+        county = q.get('county', '').upper().strip()
+        return await self.cached(('summary', county), _summary_json, county)
+
+    async def plan(self, q: dict) -> bytes:
+        params = self._plan_params(q)
+        self._check_mode(params[0])
+        return await self.cached(('plan', *params), _plan_json, *params)
+
+    async def picklist(self, q: dict) -> bytes:
+        params = self._plan_params(q)
+        self._check_mode(params[0])
+        donor = q.get('donor', '').upper().strip()
+        if not donor:
+            raise ValueError('donor is required')
+        buffer_pct = float(q.get('buffer', 0.1))
+        if not 0.0 <= buffer_pct <= 1.0:
+            raise ValueError('buffer must be between 0 and 1')
+        strategy = q.get('strategy', 'proportional')
+        if strategy not in generate_picklists.STRATEGIES:
+            raise ValueError(f'unknown strategy {strategy!r}; expected one of {generate_picklists.STRATEGIES}')
+        key = ('picklist', *params, donor, round(buffer_pct, 4), strategy)
+        return await self.cached(key, _picklist_json, *key[1:])
+
+    async def scenarios(self, q: dict) -> bytes:
+        mode = q.get('mode', 'greedy')
+        if mode not in planner.MODES:
+            raise ValueError(f'unknown planning mode {mode!r}; expected one of {planner.MODES}')
+        self._check_mode(mode)
+        if 'targets' in q:
+            targets = [float(t) for t in q['targets'].split(',') if t.strip()]
+        else:
+            start, stop, step = float(q.get('start', 1)), float(q.get('stop', 100)), float(q.get('step', 1))
+            if step <= 0:
+                raise ValueError('step must be positive')
+            if (stop - start) / step >= MAX_SCENARIOS:
+                raise ValueError(f'at most {MAX_SCENARIOS} scenarios per request')
+            targets = np.round(np.arange(start, stop + step / 2, step), 6).tolist()
+        if not targets or len(targets) > MAX_SCENARIOS:
+            raise ValueError(f'between 1 and {MAX_SCENARIOS} targets are required')
+        targets = tuple(targets)
+        return await self.cached(('scenarios', targets, mode), _scenarios_json, targets, mode)
+
+    # --- HTTP ---
+    async def respond(self, method: str, target: str):
+        """(status, body) of one request."""
+        if method not in ('GET', 'HEAD'):
+            return 405, json.dumps({'error': 'only GET is supported'}).encode()
+        url = urlsplit(target)
+        handler = self.routes.get(url.path.rstrip('/') or '/')
+        if handler is None:
+            return 404, json.dumps({'error': f'no endpoint {url.path}', 'endpoints': list(self.routes)}).encode()
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            return 200, await handler(q)
+        except ValueError as e:
+            return 400, json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            return 500, json.dumps({'error': f'{type(e).__name__}: {e}'}).encode()
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, body: bytes, keep_alive: bool, head_only: bool = False):
+        writer.write(f'HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}'
+                     '\r\n\r\n'.encode('latin-1') + (b'' if head_only else body))
+
+    @staticmethod
+    async def _linger(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, seconds: float = 1.0):
+        """Half-close and discard what the client still sends (for up to `seconds`), so closing with unread
+        input does not reset the connection before the client has read the response."""
+        if writer.can_write_eof():
+            writer.write_eof()
+        deadline = asyncio.get_running_loop().time() + seconds
+        try:
+            while await asyncio.wait_for(reader.read(2**16), max(0.0, deadline - asyncio.get_running_loop().time())):
+                pass
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection (kept alive unless the client closes it)."""
+        try:
+            while True:
+                try:
+                    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+                    method, target, version = head[0].split(' ', 2)
+                    if not version.startswith('HTTP/'):
+                        raise ValueError(f'not an HTTP request line: {head[0][:100]!r}')
+                    headers = {}
+                    for line in head[1:]:
+                        name, _, value = line.partition(':')
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0) or 0)
+                except (asyncio.LimitOverrunError, ValueError) as e:
+                    # malformed request line or headers, or a header block over the stream limit: answer, then close
+                    error = 'request headers too large' if isinstance(e, asyncio.LimitOverrunError) else 'malformed request'
+                    self._write(writer, 400, json.dumps({'error': error}).encode(), keep_alive=False)
+                    await writer.drain()
+                    await self._linger(reader, writer)
+                    break
+                if length:
+                    await reader.readexactly(length)
+                status, body = await self.respond(method, target)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                self._write(writer, status, body, keep_alive, head_only=method == 'HEAD')
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+async def serve(host: str, port: int, workers: int = None, processes: bool = True):
+    state = load_state()
+    service = PlanningService(state, workers, processes)
+    server = await service.start(host, port)
+    try:
+        # shut the worker pool down on SIGTERM too (workers would otherwise outlive the server)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass
+    print(f"Serving {len(state['summary'])} counties / {len(state['facilities'])} facilities on "
+          f"http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON planning service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help='Planning worker processes')
+    parser.add_argument('--threads', action='store_true', help='Plan on a thread pool instead of processes')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, not args.threads))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,275 @@
+"""spatial.py
+Nearest-facility queries over the facility centroids (`Centroid_x` / `Centoid_Y`) of the products CSV.
+
+KDTree is a NumPy-only k-d tree (no SciPy dependency). Points are stored as unit vectors on the sphere, so the
+tree's Euclidean (chord) distance orders points exactly like great-circle distance. FacilityIndex keeps one
+tree per (product, county) filter, built on first use, holding only facilities with releasable stock.
+generate_picklists' nearest-first allocation (--strategy nearest) queries one built over the donors' sites.
+
+Usage:
+    python spatial.py --county KISII --k 5
+    python spatial.py --county KISII --k 5 --product Distibuted_Sunscreen_Lotions --buffer 0.1
+"""
+import argparse
+import heapq
+import numpy as np
+import pandas as pd
+from data_processing import COORD_COLS, FACILITY_COL
+from generate_picklists import PRODUCT_COLS
+from planner import EARTH_RADIUS_KM
+
+
+def to_xyz(lon, lat) -> np.ndarray:
+    """Unit vectors (n, 3) for longitudes/latitudes in degrees."""
+    lon, lat = np.radians(np.asarray(lon, dtype=float)), np.radians(np.asarray(lat, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord) -> np.ndarray:
+    """Great-circle km for straight-line distances between unit vectors."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+class KDTree:
+    """k-d tree over (n, d) points with leaf buckets; query() is a best-first search pruned by node bounding boxes
+    and query_many() the same search for a batch of points, vectorised over the batch."""
+
+    def __init__(self, points, leafsize: int = 16):
+        points = np.asarray(points, dtype=float)
+        n = len(points)
+        perm = np.arange(n)
+        lo, hi, start, end, left, right = [], [], [], [], [], []
+        stack = [(0, n, -1, 0)]  # (start, end, parent, is_right)
+        while stack:
+            s, e, parent, is_right = stack.pop()
+            node = len(start)
+            pts = points[perm[s:e]]
+            lo.append(pts.min(axis=0) if e > s else np.full(points.shape[1], np.inf))
+            hi.append(pts.max(axis=0) if e > s else np.full(points.shape[1], -np.inf))
+            start.append(s)
+            end.append(e)
+            left.append(-1)
+            right.append(-1)
+            if parent >= 0:
+                (right if is_right else left)[parent] = node
+            if e - s > leafsize:
+                dim = int(np.argmax(hi[node] - lo[node]))
+                mid = (s + e) // 2
+                part = np.argpartition(pts[:, dim], mid - s)
+                perm[s:e] = perm[s:e][part]
+                stack.append((mid, e, node, 1))
+                stack.append((s, mid, node, 0))
+        self.perm = perm
+        self.points = points[perm]
+        self.lo, self.hi = np.array(lo), np.array(hi)
+        self.start, self.end = np.array(start), np.array(end)
+        self.left, self.right = np.array(left), np.array(right)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _box_dist2(self, node: int, p: np.ndarray) -> float:
+        gap = np.maximum(self.lo[node] - p, 0) + np.maximum(p - self.hi[node], 0)
+        return float(gap @ gap)
+
+    def query(self, point, k: int = 1):
+        """(distances, indices) of the k points nearest to point, nearest first (fewer if the tree is smaller)."""
+        p = np.asarray(point, dtype=float)
+        k = min(k, len(self))
+        best_d = np.full(k, np.inf)
+        best_i = np.full(k, -1, dtype=np.int64)
+        if k == 0:
+            return best_d, best_i
+        heap = [(0.0, 0)]
+        while heap:
+            d2, node = heapq.heappop(heap)
+            if d2 > best_d[-1]:
+                break
+            if self.left[node] < 0:
+                s, e = self.start[node], self.end[node]
+                diff = self.points[s:e] - p
+                cand_d = np.concatenate([best_d, np.einsum('ij,ij->i', diff, diff)])
+                cand_i = np.concatenate([best_i, np.arange(s, e)])
+                keep = np.argsort(cand_d, kind='stable')[:k]
+                best_d, best_i = cand_d[keep], cand_i[keep]
+                continue
+            for child in (self.left[node], self.right[node]):
+                cd2 = self._box_dist2(child, p)
+                if cd2 <= best_d[-1]:
+                    heapq.heappush(heap, (cd2, child))
+        found = best_i >= 0
+        return np.sqrt(best_d[found]), self.perm[best_i[found]]
+
+    def _box_dist2_many(self, nodes: np.ndarray, p: np.ndarray) -> np.ndarray:
+        gap = np.maximum(self.lo[nodes] - p, 0) + np.maximum(p - self.hi[nodes], 0)
+        return np.einsum('ij,ij->i', gap, gap)
+
+    def _leaf_points(self, q: np.ndarray, leaves: np.ndarray, p: np.ndarray):
+        """(query, tree position, squared distance) for every point of every (query, leaf) pair."""
+        sizes = self.end[leaves] - self.start[leaves]
+        q = np.repeat(q, sizes)
+        pos = np.arange(sizes.sum()) + np.repeat(self.start[leaves] - (np.cumsum(sizes) - sizes), sizes)
+        diff = self.points[pos] - p[q]
+        return q, pos, np.einsum('ij,ij->i', diff, diff)
+
+    @staticmethod
+    def _k_smallest(q: np.ndarray, pos: np.ndarray, d2: np.ndarray, n: int, k: int):
+        """Per query, the k smallest squared distances and their tree positions (inf / -1 where fewer)."""
+        order = np.lexsort((pos, d2, q))
+        q, pos, d2 = q[order], pos[order], d2[order]
+        counts = np.bincount(q, minlength=n)
+        rank = np.arange(len(q)) - np.repeat(np.cumsum(counts) - counts, counts)
+        top = rank < k
+        best_d = np.full((n, k), np.inf)
+        best_i = np.full((n, k), -1, dtype=np.int64)
+        best_d[q[top], rank[top]] = d2[top]
+        best_i[q[top], rank[top]] = pos[top]
+        return best_d, best_i
+
+    def _query_block(self, p: np.ndarray, k: int):
+        n = len(p)
+        # every point descends to its nearest leaf, whose k-th distance bounds the search
+        node = np.zeros(n, dtype=np.int64)
+        todo = np.flatnonzero(self.left[node] >= 0)
+        while len(todo):
+            left, right = self.left[node[todo]], self.right[node[todo]]
+            nearer_right = self._box_dist2_many(right, p[todo]) < self._box_dist2_many(left, p[todo])
+            node[todo] = np.where(nearer_right, right, left)
+            todo = todo[self.left[node[todo]] >= 0]
+        bound = self._k_smallest(*self._leaf_points(np.arange(n), node, p), n, k)[0][:, -1]
+        # then every (point, node) pair within the point's bound is expanded one level at a time
+        q, node = np.arange(n), np.zeros(n, dtype=np.int64)
+        leaf_q, leaf_node = [], []
+        while len(q):
+            near = self._box_dist2_many(node, p[q]) <= bound[q]
+            q, node = q[near], node[near]
+            leaf = self.left[node] < 0
+            leaf_q.append(q[leaf])
+            leaf_node.append(node[leaf])
+            q, node = np.repeat(q[~leaf], 2), np.column_stack([self.left[node[~leaf]], self.right[node[~leaf]]]).ravel()
+        q, pos, d2 = self._leaf_points(np.concatenate(leaf_q), np.concatenate(leaf_node), p)
+        near = d2 <= bound[q]
+        return self._k_smallest(q[near], pos[near], d2[near], n, k)
+
+    def query_many(self, points, k: int = 1, block: int = 4096):
+        """query() for every row of points at once: (distances, indices) arrays of shape (n_points, k), nearest
+        first, padded with inf / -1 when the tree has fewer than k points.
+
+        The search is vectorised over the points (in blocks of `block`) rather than run as one best-first search
+        each: all points descend the tree together, then the leaves within each point's bound are ranked at once.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        dist = np.full((len(points), k), np.inf)
+        found = np.full((len(points), k), -1, dtype=np.int64)
+        kk = min(k, len(self))
+        if kk == 0:
+            return dist, found
+        if len(points) == 1:
+            # a lone point is answered faster by the best-first search
+            d, i = self.query(points[0], kk)
+            dist[0, :kk], found[0, :kk] = d, i
+            return dist, found
+        for b in range(0, len(points), block):
+            d2, pos = self._query_block(points[b:b + block], kk)
+            dist[b:b + block, :kk] = np.sqrt(d2)
+            found[b:b + block, :kk] = self.perm[pos]
+        return dist, found
+
+
+class FacilityIndex:
+    """Facilities with coordinates and releasable stock, answering k-nearest queries by product and county.
+
+    `facilities` is a products frame (raw, data_processing.clean_products or generate_picklists.facility_frame);
+    releasable stock is floor(stock * (1 - buffer_pct)) per product, as donors keep buffer_pct back. Rows
+    without coordinates are left out of the index.
+    """
+
+    def __init__(self, facilities: pd.DataFrame, buffer_pct: float = 0.0, leafsize: int = 16):
+        facility_col = next((c for c in ('Facility', FACILITY_COL) if c in facilities.columns), None)
+        lon = pd.to_numeric(facilities[COORD_COLS[0]], errors='coerce').to_numpy()
+        lat = pd.to_numeric(facilities[COORD_COLS[1]], errors='coerce').to_numpy()
+        located = ~(np.isnan(lon) | np.isnan(lat))
+        df = facilities[located]
+        stock = np.column_stack([pd.to_numeric(df[c], errors='coerce').fillna(0).to_numpy() if c in df.columns
+                                 else np.zeros(len(df)) for c in PRODUCT_COLS]) if len(df) else np.zeros((0, len(PRODUCT_COLS)))
+        self._setup(df['County'].astype(str).str.upper().str.strip().to_numpy(),
+                    df[facility_col].astype(str).to_numpy() if facility_col else np.full(len(df), '', dtype=object),
+                    lon[located], lat[located], np.floor(stock * (1.0 - buffer_pct)).astype(np.int64), leafsize)
+
+    @classmethod
+    def from_arrays(cls, county, facility, lon, lat, releasable, leafsize: int = 16) -> 'FacilityIndex':
+        """Index over per-facility arrays (releasable: (n, n_products) stock above the buffer), e.g. the rows of a
+        generate_picklists facility table. Rows without coordinates stay in the arrays but are never returned,
+        so query() rows index the arrays as given."""
+        index = cls.__new__(cls)
+        index._setup(np.asarray(county, dtype=object), np.asarray(facility, dtype=object),
+                     np.asarray(lon, dtype=float), np.asarray(lat, dtype=float),
+                     np.asarray(releasable, dtype=np.int64), leafsize)
+        return index
+
+    def _setup(self, county, facility, lon, lat, releasable, leafsize):
+        self.county, self.facility = county, facility
+        self.lon, self.lat = lon, lat
+        self.located = ~(np.isnan(lon) | np.isnan(lat))
+        self.xyz = to_xyz(self.lon, self.lat)
+        self.releasable = releasable
+        self.leafsize = leafsize
+        self._trees = {}
+        self._centroids = pd.DataFrame({'County': self.county, 'lon': self.lon, 'lat': self.lat}).groupby('County')[['lon', 'lat']].mean()
+
+    def _tree(self, product: str = None, county: str = None):
+        key = (product, county)
+        if key not in self._trees:
+            stock = self.releasable[:, PRODUCT_COLS.index(product)] if product else self.releasable.sum(axis=1)
+            mask = (stock > 0) & self.located
+            if county is not None:
+                mask &= self.county == county
+            rows = np.flatnonzero(mask)
+            self._trees[key] = (KDTree(self.xyz[rows], self.leafsize), rows)
+        return self._trees[key]
+
+    def point(self, county: str, facility: str = None):
+        """(lon, lat) of a facility, or of a county's mean facility centroid."""
+        county = str(county).upper().strip()
+        if facility is None:
+            row = self._centroids.loc[county]
+            return float(row['lon']), float(row['lat'])
+        pos = np.flatnonzero((self.county == county) & (self.facility == facility))
+        if not len(pos):
+            raise KeyError(f'no located facility {facility!r} in {county}')
+        return float(self.lon[pos[0]]), float(self.lat[pos[0]])
+
+    def query(self, lon, lat, k: int = 5, product: str = None, county: str = None):
+        """Batch k-nearest query: (distance_km, rows) arrays of shape (n_points, k), nearest first.
+
+        Only facilities with releasable stock of `product` (any product when None), optionally in `county`, are
+        candidates; missing neighbours are padded with inf / -1. Rows index this index's facility arrays.
+        """
+        tree, rows = self._tree(product, None if county is None else str(county).upper().strip())
+        chord, found = tree.query_many(to_xyz(np.atleast_1d(lon), np.atleast_1d(lat)), k)
+        missing = found < 0
+        return np.where(missing, np.inf, chord_to_km(chord)), np.where(missing, -1, rows[np.maximum(found, 0)])
+
+    def nearest(self, lon: float, lat: float, k: int = 5, product: str = None, county: str = None) -> pd.DataFrame:
+        """The k nearest facilities with releasable stock as a frame: County, Facility, releasable, distance_km."""
+        dist, rows = self.query(lon, lat, k, product, county)
+        ok = rows[0] >= 0
+        rows = rows[0][ok]
+        stock = self.releasable[rows, PRODUCT_COLS.index(product)] if product else self.releasable[rows].sum(axis=1)
+        return pd.DataFrame({'County': self.county[rows], 'Facility': self.facility[rows], 'releasable': stock,
+                             'distance_km': dist[0][ok].round(1)})
+
+
+if __name__ == '__main__':
+    import generate_picklists
+    parser = argparse.ArgumentParser(description='Nearest facilities with releasable stock')
+    parser.add_argument('--county', required=True, help='Recipient county (its mean facility centroid is used)')
+    parser.add_argument('--facility', default=None, help='Recipient facility within --county')
+    parser.add_argument('--product', choices=PRODUCT_COLS, default=None, help='Only facilities holding this product')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--buffer', type=float, default=0.1, help='Donor buffer percent (0-1) kept back')
+    args = parser.parse_args()
+
+    index = FacilityIndex(generate_picklists.load_products(generate_picklists.PRODUCTS_CSV), args.buffer)
+    lon, lat = index.point(args.county, args.facility)
+    print(index.nearest(lon, lat, args.k, args.product).to_string(index=False))
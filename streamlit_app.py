@@ -1,32 +1,51 @@
 """A minimal Streamlit prototype for reviewing transfer plans and picklists.
 Run: streamlit run streamlit_app.py
 
-The app allows adjusting donor buffer and re-running picklist generation (in-memory call) to preview impacts.
+The app allows adjusting donor buffer and previewing picklists computed in memory. Inputs and per-buffer
+picklists are cached across reruns (picklist_cache.PicklistCache); new buffers are computed on a background
+worker and the neighbouring slider values are prefetched, so moving the slider does not block the UI.
 """
+import time
 import streamlit as st
 from pathlib import Path
-import pandas as pd
 import generate_picklists
+from picklist_cache import PicklistCache
+import results_store
 
 ROOT = Path(__file__).parent
 OUT = ROOT / 'outputs'
 TRANSFER_CSV = OUT / 'transfer_plan.csv'
 PICK_DIR = OUT / 'picklists'
+BUFFER_STEP = 0.01
+
+
+@st.cache_resource
+def get_cache() -> PicklistCache:
+    # one cache (and worker pool) shared by every session of this server process
+    return PicklistCache(generate_picklists.PRODUCTS_CSV, TRANSFER_CSV, store=results_store.STORE_DB)
+
 
 st.title('PWA Support Products — Transfer Review & Approval')
 st.markdown('Adjust buffer percent, preview picklists, and approve transfers to export manifests.')
 
-if not TRANSFER_CSV.exists():
+if results_store.latest_run('transfers') is None and not TRANSFER_CSV.exists():
     st.error('No transfer_plan.csv found. Run transfer_plan.py first.')
 else:
-    buffer = st.slider('Donor buffer percent', 0.0, 0.5, 0.1, step=0.01)
-    if st.button('Generate picklists (preview)'):
-        with st.spinner('Generating picklists...'):
-            generate_picklists.main(buffer)
-        st.success('Picklists generated in outputs/picklists')
+    cache = get_cache()
+    _, trans = cache.inputs()
+    buffer = st.slider('Donor buffer percent', 0.0, 0.5, 0.1, step=BUFFER_STEP)
+    pick_df = cache.get(buffer, timeout=0.5)
+    cache.prefetch([buffer - BUFFER_STEP, buffer + BUFFER_STEP])
+
+    if st.button('Write picklists to outputs/picklists'):
+        if pick_df is None:
+            st.warning('Picklists for this buffer are still being computed.')
+        else:
+            generate_picklists.write_picklists(pick_df, buffer)
+            st.success('Picklists written to outputs/picklists')
 
     st.subheader('Planned transfers')
-    trans = pd.read_csv(TRANSFER_CSV)
+    trans = trans.copy()
     trans['approved'] = False
     # display and allow per-row approval
     st.write('Select transfers to approve (tick rows)')
@@ -45,8 +64,12 @@ else:
             st.success(f'Wrote {len(approved)} approved transfers to {approvals_path}')
 
     st.subheader('Picklist summary (preview)')
-    summary_file = OUT / 'picklist_summary.txt'
-    if summary_file.exists():
-        st.text(summary_file.read_text())
+    if pick_df is None:
+        st.info(f'Computing picklists for a {buffer*100:.0f}% buffer...')
+        # poll until the background worker finishes; a slider change interrupts this rerun
+        time.sleep(0.25)
+        st.rerun()
     else:
-        st.info('No picklist summary available yet. Generate picklists to create it.')
+        st.text(generate_picklists.format_summary(pick_df, buffer))
+        with st.expander('Picklist lines'):
+            st.dataframe(pick_df)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from analysis import CountyMetrics, county_summary
+
+
+def make_products():
+    return pd.DataFrame({
+        'County': ['A', 'A', 'B', 'C'],
+        'Distribution_Centres_Hospitals/Health_Centres': ['A1', 'A2', 'B1', 'C1'],
+        'Distibuted_Sunscreen_Lotions': [10, 20, 30, 5],
+        'Distributed_Lip_Care_Products': [1, 2, 3, 0],
+    })
+
+
+def make_population():
+    return pd.DataFrame({'County': ['A', 'B', 'C'], 'No_PWA_2019': [3, 0, 5]})
+
+
+def test_products_per_pwa_is_nan_without_pwa():
+    summary = county_summary(make_products(), make_population()).set_index('County')
+    assert summary.loc['A', 'Products_per_PWA'] == 11
+    assert np.isnan(summary.loc['B', 'Products_per_PWA'])
+
+
+def test_incremental_update_matches_full_recompute():
+    products, pop = make_products(), make_population()
+    metrics = CountyMetrics(products, pop)
+    pd.testing.assert_frame_equal(metrics.frame(), county_summary(products.copy(), pop), check_dtype=False)
+
+    new_a2 = pd.DataFrame({'County': ['A'], 'Distribution_Centres_Hospitals/Health_Centres': ['A2'],
+                           'Distibuted_Sunscreen_Lotions': [100], 'Distributed_Lip_Care_Products': [7]})
+    metrics.update_facility('A', 'A2', new_a2)
+    metrics.update_county('C', products.iloc[:0])
+
+    updated = pd.concat([products.iloc[[0]], new_a2, products.iloc[[2]]], ignore_index=True)
+    expected = county_summary(updated, pop)
+    # C keeps a row with zero stock after its rows are removed
+    got = metrics.frame()
+    pd.testing.assert_frame_equal(got[got['County'] != 'C'].reset_index(drop=True), expected, check_dtype=False)
+    assert metrics.totals['Total_Products'] == expected['Total_Products'].sum()
+    assert metrics.top('Total_Products', 1)['County'].tolist() == ['A']
@@ -1,4 +1,6 @@
 from pathlib import Path
+import pandas as pd
+import data_processing
 from data_processing import prepare_products, prepare_population
 
 ROOT = Path(__file__).parent.parent
@@ -18,3 +20,68 @@ def test_prepare_products_and_population():
     assert not q.empty
     assert 'County' in p.columns
     assert 'County' in q.columns
+
+
+def test_clean_cache_hit_and_invalidation(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processing, 'CACHE_DIR', tmp_path / 'cache')
+    raw = tmp_path / 'products.csv'
+    raw.write_text('County,Distibuted_Sunscreen_Lotions\nKisii,"1,200"\n', encoding='utf-8')
+
+    first, hit = data_processing.load_clean(raw, data_processing.clean_products)
+    assert not hit
+    second, hit = data_processing.load_clean(raw, data_processing.clean_products)
+    assert hit
+    assert second.equals(first)
+    assert second['Distibuted_Sunscreen_Lotions'].iloc[0] == 1200
+
+    # changed content -> new key; explicit invalidation removes the old entry
+    raw.write_text('County,Distibuted_Sunscreen_Lotions\nKisii,5\n', encoding='utf-8')
+    _, hit = data_processing.load_clean(raw, data_processing.clean_products)
+    assert not hit
+    assert data_processing.clear_cache(raw) == 1
+    data_processing._evict(0)
+    assert not list((tmp_path / 'cache').glob('*.pkl'))
+
+
+def test_stream_products_matches_full_load():
+    prod_file = ROOT / 'distribution_of_sunscreen_and_support_products_to_persons_with_albinism_pwas (1).csv'
+    county_totals, facility_totals = data_processing.stream_products(prod_file, chunksize=25)
+    full = data_processing.clean_products(data_processing.load_csv(prod_file))
+    # rows without a county (blank trailing lines) are not aggregated
+    assert county_totals['rows'].sum() == full['County'].notna().sum()
+    expected = full.groupby('County', observed=True)['Distibuted_Sunscreen_Lotions'].sum()
+    assert county_totals.set_index('County')['Distibuted_Sunscreen_Lotions'].to_dict() == expected.to_dict()
+    assert facility_totals['Distibuted_Sunscreen_Lotions'].sum() == expected.sum()
+
+
+def test_schema_parses_numbers_at_read_time(tmp_path, monkeypatch):
+    raw = tmp_path / 'products.csv'
+    raw.write_text('County,Distibuted_Sunscreen_Lotions,Boxes,Notes\n kisii ,"1,200",3,a\nBusia,-,"2,000",b\n',
+                   encoding='utf-8')
+    df = data_processing.load_csv(raw)
+    # declared column and a column detected from the first rows are both numeric before cleaning
+    assert df['Distibuted_Sunscreen_Lotions'].isna().tolist() == [False, True]
+    assert df['Boxes'].tolist() == [3, 2000]
+    cleaned = data_processing.clean_products(df)
+    assert cleaned['County'].tolist() == ['KISII', 'BUSIA']
+    assert cleaned['Distibuted_Sunscreen_Lotions'].tolist() == [1200, 0]
+    assert cleaned['Notes'].tolist() == ['a', 'b']
+
+    # whole numbers outside the count columns are nullable integers, so a merge's missing rows keep the dtype
+    raw.write_text('County,Distibuted_Sunscreen_Lotions,Boxes,Empty,Rate\nKisii,,3,,0.5\nBusia,4,,,2\n', encoding='utf-8')
+    cleaned = data_processing.clean_products(data_processing.load_csv(raw))
+    assert cleaned['Distibuted_Sunscreen_Lotions'].tolist() == [0, 4]
+    assert cleaned['Boxes'].isna().tolist() == [False, True] and cleaned['Boxes'].dtype == 'Int8'
+    assert cleaned['Empty'].isna().all() and cleaned['Rate'].tolist() == [0.5, 2.0]
+    merged = cleaned.merge(pd.DataFrame({'County': ['KISII', 'NAKURU']}), on='County', how='outer')
+    assert merged['Boxes'].dtype == 'Int8'
+
+    # a cell the sampled types cannot parse falls back to strings with the same cleaned result
+    monkeypatch.setattr(data_processing, 'SNIFF_ROWS', 10)
+    raw.write_text('County,Extra\n' + 'Kisii,5\n' * 30 + 'Busia,unknown\n', encoding='utf-8')
+    assert data_processing.read_options(raw)['dtype']['Extra'] == 'float64'
+    chunks = list(data_processing.iter_csv(raw, chunksize=8))
+    assert sum(map(len, chunks)) == 31
+    totals, _ = data_processing.stream_products(raw, chunksize=8)
+    assert totals.set_index('County')['Extra'].to_dict() == {'BUSIA': 0, 'KISII': 150}
+    assert data_processing.clean_products(data_processing.load_csv(raw))['Extra'].sum() == 150
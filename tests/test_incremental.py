@@ -0,0 +1,56 @@
+import pandas as pd
+import generate_picklists
+import incremental
+import transfer_plan
+from generate_picklists import PRODUCT_COLS, build_picklists, facility_frame
+
+
+def make_inputs(extra_stock=0):
+    # two donors (A, B) with two facilities each, two recipients (C, D)
+    rows = []
+    for county, stock in (('A', 40), ('B', 60), ('C', 1), ('D', 1)):
+        for i in range(2):
+            rows.append({'County': county, 'Facility': f'{county}{i}', **{pc: stock * (i + 1) for pc in PRODUCT_COLS}})
+    rows[2][PRODUCT_COLS[0]] += extra_stock
+    facilities = facility_frame(pd.DataFrame(rows))
+    summary = facilities.groupby('County', as_index=False, observed=True)[PRODUCT_COLS].sum()
+    summary['County'] = summary['County'].astype(str)
+    summary['Total_Products'] = summary[PRODUCT_COLS].sum(axis=1)
+    summary['No_PWA_2019'] = [5, 5, 40, 30]
+    return summary, facilities
+
+
+def test_replan_reuses_unchanged_donors_and_matches_full_build():
+    summary, facilities = make_inputs()
+    _, first, state, report = incremental.replan(summary, facilities, 0.1)
+    assert report['replanned'] and report['rewrite'] == ['A', 'B']
+
+    summary, facilities = make_inputs(extra_stock=1000)  # B gains stock, which changes who gives what
+    trans_df, picks, state, report = incremental.replan(summary, facilities, 0.1, state=state)
+    assert report['changed_summary'] == ['B'] and report['changed_facilities'] == ['B']
+    full = build_picklists(facilities, transfer_plan.build_plan(summary)[0], 0.1)
+    pd.testing.assert_frame_equal(picks, full)
+    assert 'B' in report['reallocated'] and set(report['rewrite']) <= set(report['reallocated'])
+
+    _, _, _, report = incremental.replan(summary, facilities, 0.1, state=state)
+    assert not report['replanned'] and report['reallocated'] == [] and report['rewrite'] == []
+
+
+def test_write_outputs_rewrites_only_changed_picklists(tmp_path, monkeypatch):
+    summary, facilities = make_inputs()
+    trans_df, picks, state, report = incremental.replan(summary, facilities, 0.1)
+    incremental.write_outputs(trans_df, picks, state, report, tmp_path)
+    assert sorted(p.name for p in (tmp_path / 'picklists').glob('*_picklist.csv')) == ['A_picklist.csv', 'B_picklist.csv']
+
+    written = []
+    monkeypatch.setattr(generate_picklists, '_write_donor', lambda pick_dir, donor, *a: written.append(donor))
+    state = incremental.load_state(tmp_path / incremental.STATE_NAME)
+    trans_df, picks, state, report = incremental.replan(summary, facilities, 0.2, state=state)
+    incremental.write_outputs(trans_df, picks, state, report, tmp_path)
+    assert sorted(written) == ['A', 'B']  # a new buffer invalidates every picklist
+
+    written.clear()
+    (tmp_path / 'picklists' / 'A_picklist.html').unlink()
+    _, _, state, report = incremental.replan(summary, facilities, 0.2, state=incremental.load_state(tmp_path / incremental.STATE_NAME))
+    incremental.write_outputs(trans_df, picks, state, report, tmp_path)
+    assert written == ['A']
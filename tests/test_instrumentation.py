@@ -0,0 +1,62 @@
+import json
+import tracemalloc
+import instrumentation
+
+
+@instrumentation.timed(aggregate=True)
+def hot(n):
+    return list(range(n))
+
+
+@instrumentation.timed()
+def step(n):
+    return [hot(i) for i in range(n)]
+
+
+def test_stages_and_aggregates_written_as_json_lines(tmp_path, monkeypatch):
+    metrics = tmp_path / 'metrics.jsonl'
+    monkeypatch.setitem(instrumentation._config, 'metrics', None)
+    monkeypatch.setitem(instrumentation._config, 'profile', None)
+    instrumentation.configure(metrics=metrics, profile='cprofile', profile_dir=tmp_path / 'profiles')
+    monkeypatch.setitem(instrumentation._config, 'profile_dir', tmp_path / 'profiles')
+
+    tracemalloc.start()
+    try:
+        with instrumentation.stage('outer') as st:
+            step(4)
+            big = bytearray(2 * 2**20)
+            st.rows = len(big)
+            del big
+    finally:
+        tracemalloc.stop()
+
+    records = [json.loads(line) for line in metrics.read_text().splitlines()]
+    by_kind = {}
+    for r in records:
+        by_kind.setdefault(r['kind'], []).append(r)
+    stages = {r['stage']: r for r in by_kind['stage']}
+    assert stages['test_instrumentation.step']['parent'] == 'outer'
+    assert stages['test_instrumentation.step']['rows'] == 4
+    assert stages['outer']['parent'] is None and stages['outer']['peak_mb'] >= 2
+    hot_calls = by_kind['function'][0]
+    assert hot_calls['stage'] == 'test_instrumentation.step' and hot_calls['calls'] == 4 and hot_calls['rows'] == 6
+    # only the top-level stage is profiled
+    assert [r['stage'] for r in by_kind['profile']] == ['outer']
+    assert (tmp_path / 'profiles').exists() and len(list((tmp_path / 'profiles').glob('*.prof'))) == 1
+
+
+def test_disabled_recording_is_transparent(monkeypatch):
+    monkeypatch.setitem(instrumentation._config, 'metrics', None)
+    monkeypatch.setitem(instrumentation._config, 'profile', None)
+    assert step(3) == [[], [0], [0, 1]]
+
+
+def test_standalone_stage_traces_peak_memory(tmp_path, monkeypatch):
+    metrics = tmp_path / 'metrics.jsonl'
+    monkeypatch.setitem(instrumentation._config, 'metrics', str(metrics))
+    monkeypatch.setitem(instrumentation._config, 'profile', None)
+    assert not tracemalloc.is_tracing()
+    step(3)
+    assert not tracemalloc.is_tracing()
+    record = json.loads(metrics.read_text().splitlines()[0])
+    assert record['stage'] == 'test_instrumentation.step' and record['peak_mb'] is not None
@@ -0,0 +1,49 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import generate_picklists
+import inventory
+from generate_picklists import PRODUCT_COLS
+
+
+def write_products(path, scale=1):
+    rng = np.random.default_rng(5)
+    n = 9
+    df = pd.DataFrame({'County': rng.choice(['kisii', 'Busia', 'Nairobi '], n),
+                       'Distribution_Centres_Hospitals/Health_Centres': [f'F{i}' for i in range(n)],
+                       'Lot_No': [f'L{i}' for i in range(n)],
+                       'Centroid_x': rng.uniform(34, 41, n), 'Centoid_Y': rng.uniform(-4, 4, n)})
+    for pc in PRODUCT_COLS:
+        df[pc] = rng.integers(0, 90, n) * scale
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_mapped_inventory_plans_like_the_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr('data_processing.CACHE_DIR', tmp_path / 'cache')
+    csv = write_products(tmp_path / 'products.csv')
+    inv = inventory.load(csv)
+    assert isinstance(inv.stock, np.memmap) and len(inv) == 9
+    frame = generate_picklists.load_products(csv)
+    transfers = pd.DataFrame({'from_county': ['KISII', 'BUSIA', 'KISII', 'UNMET', 'NAIROBI'],
+                              'to_county': ['BUSIA', 'NAIROBI', 'NAIROBI', 'KISII', 'KISII'],
+                              'units': [120, 40, 300, 7, 55]})
+    for strategy in generate_picklists.STRATEGIES:
+        expected = generate_picklists.build_picklists(frame, transfers, 0.1, strategy)
+        for facilities in (inv, pickle.loads(pickle.dumps(inv)), inv.frame()):
+            got = generate_picklists.build_picklists(facilities, transfers, 0.1, strategy)
+            pd.testing.assert_frame_equal(got.astype({'facility': str}), expected.astype({'facility': str}),
+                                          check_dtype=False)
+    assert inventory.is_current(csv)
+
+
+def test_export_is_refreshed_when_the_csv_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr('data_processing.CACHE_DIR', tmp_path / 'cache')
+    csv = write_products(tmp_path / 'products.csv')
+    before = int(inventory.load(csv).stock.sum())
+    write_products(csv, scale=2)
+    st = os.stat(csv)
+    os.utime(csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert not inventory.is_current(csv)
+    assert int(inventory.load(csv).stock.sum()) == 2 * before
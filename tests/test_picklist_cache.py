@@ -0,0 +1,62 @@
+import os
+import pytest
+import pandas as pd
+import generate_picklists
+from picklist_cache import PicklistCache
+from generate_picklists import PRODUCT_COLS
+
+
+def write_inputs(tmp_path, units=100):
+    products = tmp_path / 'products.csv'
+    rows = [dict(County='Donor', **{'Distribution_Centres_Hospitals/Health_Centres': f'F{i}'},
+                 **{pc: 50 * (i + 1) for pc in PRODUCT_COLS}) for i in range(2)]
+    pd.DataFrame(rows).to_csv(products, index=False)
+    transfers = tmp_path / 'transfer_plan.csv'
+    pd.DataFrame({'from_county': ['DONOR'], 'to_county': ['NEEDY'], 'units': [units]}).to_csv(transfers, index=False)
+    return products, transfers
+
+
+def test_picklists_are_memoized_and_evicted(tmp_path, monkeypatch):
+    monkeypatch.setattr('data_processing.CACHE_DIR', tmp_path / 'cache')
+    products, transfers = write_inputs(tmp_path)
+    cache = PicklistCache(products, transfers, maxsize=2, workers=1)
+
+    first = cache.get(0.1, timeout=10)
+    assert first['units'].sum() == 100
+    assert cache.submit(0.1).result() is first
+    cache.get(0.2, timeout=10)
+    cache.get(0.3, timeout=10)
+    assert cache.cached_buffers() == [0.2, 0.3]
+
+
+def test_inputs_reload_when_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr('data_processing.CACHE_DIR', tmp_path / 'cache')
+    products, transfers = write_inputs(tmp_path)
+    cache = PicklistCache(products, transfers, workers=1)
+    assert cache.get(0.1, timeout=10)['units'].sum() == 100
+
+    write_inputs(tmp_path, units=40)
+    st = os.stat(transfers)
+    os.utime(transfers, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache.get(0.1, timeout=10)['units'].sum() == 40
+
+
+def test_failed_picklists_are_recomputed(tmp_path, monkeypatch):
+    monkeypatch.setattr('data_processing.CACHE_DIR', tmp_path / 'cache')
+    products, transfers = write_inputs(tmp_path)
+    cache = PicklistCache(products, transfers, workers=1)
+    build = generate_picklists.build_picklists
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('transient')
+        return build(*args)
+
+    monkeypatch.setattr(generate_picklists, 'build_picklists', flaky)
+    with pytest.raises(RuntimeError):
+        cache.get(0.1, timeout=10)
+    assert cache.cached_buffers() == []
+    assert cache.get(0.1, timeout=10)['units'].sum() == 100
+    assert len(calls) == 2 and cache.cached_buffers() == [0.1]
@@ -1,5 +1,9 @@
+import zipfile
+import numpy as np
 import pandas as pd
-from generate_picklists import allocate_from_facilities, PRODUCT_COLS
+import pytest
+from generate_picklists import (allocate_from_facilities, build_picklists, facility_frame, html_table, largest_remainder,
+                                write_picklists, PRODUCT_COLS, STRATEGIES)
 
 
 def make_donors_df():
@@ -22,3 +26,96 @@ def test_allocate_basic():
     # allocations should reference known facilities
     facilities = set(a['facility'] for a in allocations)
     assert facilities.issubset({'F1','F2'})
+
+
+def test_write_picklists_files_and_zip(tmp_path):
+    transfers = pd.DataFrame({'from_county': ['TESTCOUNTY', 'UNMET'], 'to_county': ['NEEDY', 'NEEDY'], 'units': [300, 5]})
+    pick_df = build_picklists(make_donors_df(), transfers, 0.1)
+    pick_df.loc[0, 'meta'] = 'a<b & c>d'
+    assert html_table(pick_df) == pick_df.to_html(index=False)
+
+    write_picklists(pick_df, 0.1, tmp_path / 'files', workers=2)
+    write_picklists(pick_df, 0.1, tmp_path / 'zip', fmt='zip', workers=2)
+    files = tmp_path / 'files' / 'picklists'
+    assert sorted(p.name for p in files.iterdir()) == ['TESTCOUNTY_picklist.csv', 'TESTCOUNTY_picklist.html',
+                                                      'transfer_picklists_combined.csv']
+    with zipfile.ZipFile(tmp_path / 'zip' / 'picklists' / 'picklists.zip') as zf:
+        assert sorted(zf.namelist()) == ['TESTCOUNTY_picklist.csv', 'TESTCOUNTY_picklist.html']
+        assert zf.read('TESTCOUNTY_picklist.html') == (files / 'TESTCOUNTY_picklist.html').read_bytes()
+
+
+def test_write_picklists_parquet_partitions_donors_only(tmp_path):
+    pytest.importorskip('pyarrow')
+    transfers = pd.DataFrame({'from_county': ['TESTCOUNTY', 'UNMET'], 'to_county': ['NEEDY', 'NEEDY'], 'units': [300, 5]})
+    pick_df = build_picklists(make_donors_df(), transfers, 0.1)
+    for _ in range(2):
+        write_picklists(pick_df, 0.1, tmp_path, fmt='parquet')
+    dataset = tmp_path / 'picklists' / 'picklists.parquet'
+    assert sorted(p.name for p in dataset.iterdir()) == ['from_county=TESTCOUNTY']
+    # rewriting replaces the dataset instead of adding a second copy of every line
+    assert pd.read_parquet(dataset)['units'].sum() == 300
+
+
+def test_product_transfers_draw_only_that_product():
+    transfers = pd.DataFrame({'from_county': ['TESTCOUNTY'], 'to_county': ['NEEDY'],
+                              'product': ['Distributed_Protective_Clothings_Caps'], 'units': [50]})
+    pick_df = build_picklists(make_donors_df(), transfers, 0.1)
+    assert set(pick_df['product']) == {'Distributed_Protective_Clothings_Caps'}
+    # releasable caps: floor(20 * 0.9) + floor(40 * 0.9) = 18 + 36
+    assert pick_df.set_index('facility')['units'].to_dict() == {'F1': 17, 'F2': 33}
+
+
+def test_largest_remainder_is_exact_and_within_quota():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        lengths = rng.integers(0, 6, rng.integers(1, 8))
+        weights = rng.integers(0, 50, lengths.sum()) * (rng.random(lengths.sum()) < 0.8)
+        group = np.repeat(np.arange(len(lengths)), lengths)
+        sums = np.bincount(group, weights, minlength=len(lengths)).astype(np.int64)
+        totals = rng.integers(0, sums + 1)
+        units = largest_remainder(weights, totals, lengths)
+        assert (np.bincount(group, units, minlength=len(lengths)) == totals).all()
+        quota = weights * totals[group] / np.maximum(sums, 1)[group]
+        assert ((units >= np.floor(quota)) & (units <= np.ceil(quota)) & (units <= weights)).all()
+
+
+def test_allocation_conserves_units_and_buffer():
+    rng = np.random.default_rng(11)
+    pairs = [(d, r) for d in ('A', 'B', 'C', 'UNMET') for r in ('A', 'B', 'C', 'D')]
+    for _ in range(40):
+        n = int(rng.integers(1, 12))
+        donors = pd.DataFrame({'County': rng.choice(['A', 'B', 'C'], n), 'Facility': [f'F{i}' for i in range(n)],
+                               'Centroid_x': rng.uniform(34, 41, n), 'Centoid_Y': rng.uniform(-4, 4, n)})
+        for pc in PRODUCT_COLS:
+            donors[pc] = rng.integers(0, 60, n) * (rng.random(n) < 0.7)
+        # distinct (donor, recipient) keys, so picks can be matched back to their transfer
+        chosen = [pairs[i] for i in rng.choice(len(pairs), int(rng.integers(1, 10)), replace=False)]
+        transfers = pd.DataFrame(chosen, columns=['from_county', 'to_county'])
+        transfers['units'] = rng.integers(0, 400, len(transfers))
+        by_product = rng.random() < 0.5
+        if by_product:
+            transfers['product'] = rng.choice(PRODUCT_COLS[:2], len(transfers))
+        buffer_pct = float(rng.choice([0.0, 0.1, 0.25, 0.5]))
+        caps = pd.DataFrame(np.floor(donors[PRODUCT_COLS].to_numpy() * (1 - buffer_pct)).astype(np.int64),
+                            index=donors['Facility'], columns=PRODUCT_COLS)
+        for strategy in STRATEGIES:
+            picks = build_picklists(facility_frame(donors), transfers, buffer_pct, strategy)
+            # each transfer gets exactly min(units, what its donor still has releasable), in plan order
+            left = caps.groupby(donors['County'].to_numpy()).sum()
+            got = picks.groupby(['from_county', 'to_county'], sort=False)['units'].sum()
+            for t in transfers.itertuples():
+                if t.from_county == 'UNMET':
+                    assert got[t.from_county, t.to_county] == t.units
+                    continue
+                cols = [t.product] if by_product else PRODUCT_COLS
+                available = int(left.loc[t.from_county, cols].sum()) if t.from_county in left.index else 0
+                expected = min(t.units, available)
+                assert got[t.from_county, t.to_county] == expected
+                # charge the draw to the donor's columns in the same proportions the picks took it
+                rows = picks[(picks['from_county'] == t.from_county) & (picks['to_county'] == t.to_county) &
+                             (picks['facility'] != '')]
+                for product, u in rows.groupby('product')['units'].sum().items():
+                    left.loc[t.from_county, product] -= u
+            # no facility releases more than its stock above the buffer
+            drawn = picks[picks['facility'] != ''].groupby(['facility', 'product'])['units'].sum()
+            assert all(u <= caps.loc[f, p] for (f, p), u in drawn.items())
@@ -16,3 +16,11 @@ def test_prepare_runs():
     from analysis import compute_and_report
     compute_and_report(p, q)
     assert (ROOT / 'outputs' / 'county_summary.csv').exists()
+
+
+def test_run_in_memory():
+    from pipeline import run
+    res = run(prod, pop, buffer_pct=0.1, write=False)
+    assert list(res['timings']['stage']) == ['clean', 'analysis', 'insights', 'transfer_plan', 'picklists', 'sensitivity', 'brief']
+    assert res['picklists']['units'].sum() > 0
+    assert len(res['sensitivity']) == 3
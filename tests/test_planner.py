@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+import planner
+
+
+def make_summary():
+    return pd.DataFrame({
+        'County': ['A', 'B', 'C', 'D'],
+        'surplus_units': [60, 100, -90, -80],
+    })
+
+
+def make_centroids():
+    # D sits next to B, C next to A
+    return pd.DataFrame({'County': ['A', 'B', 'C', 'D'], 'lon': [35.0, 38.0, 35.1, 38.1], 'lat': [0.0, 0.0, 0.0, 0.0]})
+
+
+def test_greedy_plan_matches_largest_first():
+    donors, recips = planner.split_donors_recipients(make_summary())
+    plan = planner.greedy_plan(donors, recips)
+    assert plan.values.tolist() == [['B', 'C', 90], ['B', 'D', 10], ['A', 'D', 60], ['UNMET', 'D', 10]]
+
+
+def test_mincost_plan_prefers_near_donors():
+    donors, recips = planner.split_donors_recipients(make_summary())
+    centroids = make_centroids()
+    plan = planner.mincost_plan(donors, recips, centroids)
+    # every recipient's need is still accounted for (including UNMET)
+    assert plan.groupby('to_county')['units'].sum().to_dict() == {'C': 90, 'D': 80}
+    assert ['A', 'C', 60] in plan.values.tolist()
+    assert ['B', 'D', 80] in plan.values.tolist()
+    greedy = planner.greedy_plan(donors, recips)
+    assert planner.ton_km(plan, centroids) < planner.ton_km(greedy, centroids)
+
+
+def brute_force_km(supply, need, km):
+    """Least units x km over every integer plan shipping min(total supply, total need) units."""
+    cells = [(i, j) for i in range(len(supply)) for j in range(len(need))]
+    flow = min(sum(supply), sum(need))
+    best = np.inf
+
+    def fill(c, supply, need, shipped, cost):
+        nonlocal best
+        if c == len(cells):
+            if shipped == flow:
+                best = min(best, cost)
+            return
+        i, j = cells[c]
+        for x in range(min(supply[i], need[j]) + 1):
+            supply[i] -= x
+            need[j] -= x
+            fill(c + 1, supply, need, shipped + x, cost + x * km[i, j])
+            supply[i] += x
+            need[j] += x
+
+    fill(0, list(supply), list(need), 0, 0.0)
+    return best
+
+
+def test_mincost_plan_matches_brute_force_optimum():
+    rng = np.random.default_rng(3)
+    for _ in range(40):
+        n_d, n_r = rng.integers(1, 4), rng.integers(1, 4)
+        while n_d * n_r > 6:
+            n_d, n_r = rng.integers(1, 4), rng.integers(1, 4)
+        counties = [f'C{i}' for i in range(n_d + n_r)]
+        surplus = np.concatenate([rng.integers(1, 6, n_d), -rng.integers(1, 6, n_r)])
+        centroids = pd.DataFrame({'County': counties, 'lon': rng.uniform(34, 41, n_d + n_r),
+                                  'lat': rng.uniform(-4.5, 4.5, n_d + n_r)})
+        donors, recips = planner.split_donors_recipients(pd.DataFrame({'County': counties, 'surplus_units': surplus}))
+        # k=1 leaves most lanes to the pricing step
+        plan = planner.mincost_plan(donors, recips, centroids, k=1)
+        c = centroids.set_index('County')
+        km = planner.haversine_km(c.loc[donors['County'], 'lon'].to_numpy()[:, None], c.loc[donors['County'], 'lat'].to_numpy()[:, None],
+                                  c.loc[recips['County'], 'lon'].to_numpy()[None, :], c.loc[recips['County'], 'lat'].to_numpy()[None, :])
+        best = brute_force_km(donors['surplus_units'].tolist(), recips['need'].tolist(), km)
+        assert planner.ton_km(plan, centroids, kg_per_unit=1000.0) == pytest.approx(best, rel=1e-9)
+        assert plan.groupby('to_county')['units'].sum().to_dict() == dict(zip(recips['County'], recips['need']))
+        moved = plan[plan['from_county'] != 'UNMET']
+        assert moved['units'].sum() == min(donors['surplus_units'].sum(), recips['need'].sum())
+        shipped = moved.groupby('from_county')['units'].sum().reindex(donors['County'], fill_value=0)
+        assert (shipped.to_numpy() <= donors['surplus_units'].to_numpy()).all()
+
+
+def test_product_plan_matches_greedy_per_product():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        n, n_products = rng.integers(1, 10), rng.integers(1, 6)
+        # distinct magnitudes so the per-product sort order is unambiguous
+        surplus = np.stack([rng.permutation(np.arange(-n, n))[:n] * 7 for _ in range(n_products)], axis=1)
+        counties = [f'C{i}' for i in range(n)]
+        products = [f'P{j}' for j in range(n_products)]
+        expected = []
+        for j, product in enumerate(products):
+            donors, recips = planner.split_donors_recipients(pd.DataFrame({'County': counties, 'surplus_units': surplus[:, j]}))
+            expected += [[d, r, product, u] for d, r, u in planner.greedy_plan(donors, recips).values.tolist()]
+        assert planner.product_plan(counties, products, surplus).values.tolist() == expected
+
+
+def test_product_surplus_uses_per_product_targets():
+    summary = pd.DataFrame({'County': ['A', 'B'], 'No_PWA_2019': [10, 5], 'Sun': [100, 0], 'Caps': [0, 30]})
+    counties, products, surplus = planner.product_surplus(summary, {'Sun': 6, 'Caps': 2})
+    assert products == ['Sun', 'Caps']
+    assert surplus.tolist() == [[40, -20], [-30, 20]]
+    plan = planner.product_plan(counties, products, surplus)
+    # B's caps cover A's cap deficit instead of A's surplus sunscreen doing so
+    assert plan.values.tolist() == [['A', 'B', 'Sun', 30], ['B', 'A', 'Caps', 20]]
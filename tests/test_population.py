@@ -0,0 +1,54 @@
+from pathlib import Path
+import pandas as pd
+from data_processing import clean_population, load_csv
+from population import PopulationTree, county_pwa
+
+ROOT = Path(__file__).parent.parent
+POP_FILE = ROOT / 'distribution-of-persons-with-albinism-by-sex1-area-of-residence-county-and-sub-county-2019-censu (1).csv'
+
+CENSUS = '''County/Sub County,Total Population,,,Persons With Albinism,,
+,Total*,Male,Female,Total*,Male,Female
+KENYA,"1,000",490,510,30,14,16
+Rural,600,290,310,20,9,11
+Urban,400,200,200,10,5,5
+ALPHA,700,340,360,18,8,10
+ALPHA,300,140,160,8,-,8
+EAST,400,200,200,10,8,2
+BETA,300,150,150,12,6,6
+BETA NORTH,300,150,150,12,6,6
+'''
+
+
+def test_census_tree_and_lookups(tmp_path):
+    raw = tmp_path / 'census.csv'
+    raw.write_text(CENSUS, encoding='utf-8')
+    pop = clean_population(load_csv(raw))
+
+    assert list(pop['Level'].astype(str)) == ['national', 'area', 'area', 'county', 'sub_county', 'sub_county',
+                                              'county', 'sub_county']
+    # sub-county named like its county stays under it
+    assert pop.loc[4, 'County'] == 'ALPHA' and pop.loc[4, 'Sub_County'] == 'ALPHA'
+
+    tree = PopulationTree(pop)
+    assert tree.pwa() == 30
+    assert tree.pwa('alpha') == 18
+    assert tree.pwa('Alpha', 'Alpha', sex='Male') == 0
+    assert tree.get('BETA', 'BETA NORTH')['Population_Female'] == 150
+    assert list(tree.children('ALPHA')['Sub_County']) == ['ALPHA', 'EAST']
+    assert list(tree.frame('county')['County']) == ['ALPHA', 'BETA']
+    assert tree.discrepancies.empty
+    assert county_pwa(pop).to_dict('list') == {'County': ['ALPHA', 'BETA'], 'No_PWA_2019': [18, 12]}
+
+
+def test_real_census_rollups():
+    tree = PopulationTree(clean_population(load_csv(POP_FILE)))
+    assert len(tree.frame('county')) == 47
+    assert tree.frame('county')['No_PWA_2019'].sum() == tree.pwa() == 9729
+    assert tree.discrepancies.empty
+    assert tree.frame('sub_county').groupby('County')['PWA_Female'].sum().sum() == tree.pwa(sex='Female')
+
+
+def test_flat_table_counts_as_counties():
+    pop = clean_population(pd.DataFrame({'County': ['a', 'b'], 'PWA': ['1,200', '-']}))
+    assert list(pop['No_PWA_2019']) == [1200, 0]
+    assert PopulationTree(pop).pwa() == 1200
@@ -0,0 +1,34 @@
+import pandas as pd
+import results_store
+
+
+def test_runs_are_kept_and_queried_by_county(tmp_path):
+    db = tmp_path / 'results.sqlite'
+    first = pd.DataFrame({'from_county': pd.Categorical(['KISII', 'KISII', 'UNMET']), 'to_county': ['GARISSA', 'TURKANA', 'BUSIA'],
+                          'units': [8248, 3703, 12]})
+    run1 = results_store.save_run('transfer_plan', {'transfers': first}, {'transfer_summary': 'plan one'}, path=db)
+    second = first.assign(units=[100, 200, 300], distance_km=[550.0, 610.5, None])
+    run2 = results_store.save_run('transfer_plan', {'transfers': second}, {'transfer_summary': 'plan two'}, path=db)
+
+    assert results_store.latest_run('transfers', db) == run2 > run1
+    latest = results_store.read_table('transfers', path=db)
+    assert latest['units'].tolist() == [100, 200, 300] and latest['distance_km'].isna().tolist() == [False, False, True]
+
+    kisii = results_store.read_table('transfers', None, ['to_county', 'units'], {'from_county': 'KISII'}, db)
+    assert kisii['run_id'].tolist() == [run1, run1, run2, run2]
+    assert kisii['units'].tolist() == [8248, 3703, 100, 200]
+    # the first run predates the distance column
+    assert results_store.read_table('transfers', run1, path=db)['distance_km'].isna().all()
+    assert results_store.read_text('transfer_summary', path=db) == 'plan two'
+    assert results_store.read_text('transfer_summary', run1, db) == 'plan one'
+    assert results_store.runs(db)['run_id'].tolist() == [run2, run1]
+
+
+def test_load_table_falls_back_to_csv(tmp_path):
+    db = tmp_path / 'results.sqlite'
+    csv = tmp_path / 'county_summary.csv'
+    assert results_store.load_table('county_summary', csv, path=db) is None
+    pd.DataFrame({'County': ['A'], 'Total_Products': [5]}).to_csv(csv, index=False)
+    assert results_store.load_table('county_summary', csv, path=db)['Total_Products'].tolist() == [5]
+    results_store.save_run('analysis', {'county_summary': pd.DataFrame({'County': ['A'], 'Total_Products': [7]})}, path=db)
+    assert results_store.load_table('county_summary', csv, ['Total_Products'], db).to_dict('list') == {'Total_Products': [7]}
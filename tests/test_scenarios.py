@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import scenarios
+import transfer_plan
+
+
+def make_summary():
+    rng = np.random.default_rng(3)
+    counties = [f'C{i}' for i in range(12)]
+    df = pd.DataFrame({'County': counties, 'No_PWA_2019': rng.integers(0, 80, 12)})
+    for col in ('Sun', 'Caps'):
+        df[col] = rng.integers(0, 900, 12)
+    df['Total_Products'] = df['Sun'] + df['Caps']
+    return df
+
+
+def plan_metrics(plan: pd.DataFrame) -> tuple:
+    unmet = plan['from_county'] == 'UNMET'
+    return int(plan.loc[~unmet, 'units'].sum()), int(plan.loc[unmet, 'units'].sum()), int((~unmet).sum())
+
+
+def test_grid_matches_one_plan_per_target():
+    summary = make_summary()
+    centroids = pd.DataFrame({'County': summary['County'], 'lon': np.linspace(34, 41, 12), 'lat': np.zeros(12)})
+    for mode in ('greedy', 'mincost'):
+        table = scenarios.run_scenarios(summary, scenarios.per_person_grid([2, 10.5, 25]), mode, centroids, processes=1)
+        assert table['target_per_person'].tolist() == [2, 10.5, 25]
+        assert (table['units_moved'] + table['unmet_units'] == table['deficit_units']).all()
+        for _, row in table.iterrows():
+            plan, _, _ = transfer_plan.build_plan(summary, mode, centroids, row['target_per_person'])
+            assert (row['units_moved'], row['unmet_units'], row['transfers']) == plan_metrics(plan)
+
+
+def test_product_grid_in_a_pool():
+    summary = make_summary()
+    grid = scenarios.product_grid({'Sun': 6, 'Caps': 2}, [0.5, 1, 3, 8])
+    table = scenarios.run_scenarios(summary, grid, processes=2)
+    assert table['scale'].tolist() == [0.5, 1, 3, 8]
+    assert table[['Sun', 'Caps']].values.tolist() == [[3, 1], [6, 2], [18, 6], [48, 16]]
+    for i, row in table.iterrows():
+        plan, _, _ = transfer_plan.build_plan(summary, product_targets=grid.iloc[i].to_dict())
+        assert (row['units_moved'], row['unmet_units'], row['transfers']) == plan_metrics(plan)
+    assert scenarios.run_scenarios(summary, grid, processes=1).equals(table)
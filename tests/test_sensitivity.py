@@ -0,0 +1,30 @@
+import pytest
+import pandas as pd
+from sensitivity import sweep, scenario_name
+from generate_picklists import PRODUCT_COLS
+
+
+def make_donors_df():
+    rows = [('TESTCOUNTY', 'F1', [100, 50, 50, 20, 30]), ('TESTCOUNTY', 'F2', [200, 100, 100, 40, 60])]
+    return pd.DataFrame([dict(County=c, Facility=f, **dict(zip(PRODUCT_COLS, s))) for c, f, s in rows])
+
+
+def make_summary():
+    # TESTCOUNTY holds 750 units for 10 PWAs; NEEDY has 5 units for 20 PWAs
+    return pd.DataFrame({'County': ['TESTCOUNTY', 'NEEDY'], 'No_PWA_2019': [10, 20], 'Total_Products': [750, 5]})
+
+
+def test_sweep_reports_each_scenario(tmp_path):
+    res = sweep(make_donors_df(), make_summary(), buffers=[0.1, 0.5], targets=[10, 20], processes=1, out_dir=tmp_path)
+    assert len(res) == 4
+    row = res[(res['target_per_person'] == 10) & (res['buffer_pct'] == 0.1)].iloc[0]
+    # NEEDY needs 10 * 20 - 5 = 195 units, all releasable from TESTCOUNTY
+    assert row['planned_units'] == 195
+    assert row['top_donor'] == 'TESTCOUNTY'
+    assert (tmp_path / scenario_name(20, 0.5) / 'picklists' / 'TESTCOUNTY_picklist.csv').exists()
+
+
+def test_scenario_names_are_unique():
+    assert scenario_name(20, 0.125) != scenario_name(20, 0.13)
+    with pytest.raises(ValueError):
+        sweep(make_donors_df(), make_summary(), buffers=[0.1, 0.1], targets=[20], processes=1)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import generate_picklists
+import service
+import transfer_plan
+
+
+async def get(port: int, path: str):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    head, _, body = (await reader.read()).partition(b'\r\n\r\n')
+    writer.close()
+    return int(head.split(b' ')[1]), json.loads(body)
+
+
+def test_endpoints_match_batch_outputs():
+    state = service.load_state()
+    trans_df, _, _ = transfer_plan.build_plan(state['summary'], 'greedy', state['centroids'], 15)
+    donor = str(trans_df['from_county'][trans_df['from_county'] != 'UNMET'].iloc[0])
+    picks = generate_picklists.build_picklists(state['facilities'], trans_df, 0.2)
+
+    async def run():
+        svc = service.PlanningService(state, workers=2, processes=False)
+        server = await svc.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, health = await get(port, '/health')
+            assert status == 200 and health['counties'] == len(state['summary'])
+            status, plan = await get(port, '/plan?target=15')
+            assert status == 200 and plan['units'] == trans_df['units'].sum() and len(plan['rows']) == len(trans_df)
+            path = f'/picklist?donor={donor.lower()}&buffer=0.2&target=15'
+            # concurrent identical requests share one computation
+            (_, a), (_, b) = await asyncio.gather(get(port, path), get(port, path))
+            assert a == b and a['units'] == picks.loc[picks['from_county'] == donor, 'units'].sum()
+            status, table = await get(port, '/scenarios?targets=10,15,20')
+            assert status == 200 and [r['target_per_person'] for r in table['rows']] == [10, 15, 20]
+            assert table['rows'][1]['units_moved'] == trans_df.loc[trans_df['from_county'] != 'UNMET', 'units'].sum()
+            assert (await get(port, '/plan?mode=fastest'))[0] == 400
+            assert (await get(port, '/picklist'))[0] == 400
+            assert (await get(port, '/nowhere'))[0] == 404
+            assert svc.misses == 3 and svc.hits == 1
+        finally:
+            server.close()
+            await server.wait_closed()
+            svc.close()
+
+    asyncio.run(run())
+
+
+def test_malformed_requests_get_400():
+    async def raw(port: int, data: bytes):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return int(response.split(b' ')[1])
+
+    async def run():
+        svc = service.PlanningService({'summary': [], 'facilities': [], 'centroids': None}, workers=1, processes=False)
+        server = await svc.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            assert await raw(port, b'NONSENSE\r\n\r\n') == 400
+            assert await raw(port, b'GET /health HTTP/1.1\r\nContent-Length: ten\r\n\r\n') == 400
+            assert await raw(port, b'GET /health HTTP/1.1\r\nX-Pad: ' + b'a' * 2**17 + b'\r\n\r\n') == 400
+        finally:
+            server.close()
+            await server.wait_closed()
+            svc.close()
+
+    asyncio.run(run())
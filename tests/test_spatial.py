@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from generate_picklists import build_picklists, facility_frame
+from spatial import FacilityIndex, KDTree, to_xyz
+
+
+def test_kdtree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points = to_xyz(rng.uniform(33, 42, 500), rng.uniform(-5, 5, 500))
+    tree = KDTree(points, leafsize=8)
+    for q in to_xyz(rng.uniform(33, 42, 20), rng.uniform(-5, 5, 20)):
+        dist, idx = tree.query(q, 6)
+        brute = np.sqrt(((points - q) ** 2).sum(axis=1))
+        assert np.allclose(dist, np.sort(brute)[:6])
+        assert np.allclose(brute[idx], dist)
+
+
+def test_kdtree_batch_query_matches_single_queries():
+    rng = np.random.default_rng(1)
+    points = to_xyz(rng.uniform(33, 42, 700), rng.uniform(-5, 5, 700))
+    points[rng.integers(0, 700, 100)] = points[0]  # shared sites
+    queries = np.vstack([points[:5], to_xyz(rng.uniform(33, 42, 200), rng.uniform(-5, 5, 200))])
+    for n, k in ((700, 7), (10, 12)):
+        tree = KDTree(points[:n], leafsize=8)
+        dist, idx = tree.query_many(queries, k, block=64)
+        for q, d, i in zip(queries, dist, idx):
+            single, _ = tree.query(q, k)
+            assert np.allclose(d[:len(single)], single) and np.isinf(d[len(single):]).all()
+            assert np.allclose(np.sqrt(((points[i[i >= 0]] - q) ** 2).sum(axis=1)), single)
+
+
+def make_facilities():
+    return pd.DataFrame({
+        'County': ['A', 'A', 'B', 'C'],
+        'Facility': ['A near', 'A far', 'B1', 'C1'],
+        'Distibuted_Sunscreen_Lotions': [10, 10, 0, 10],
+        'Distributed_Lip_Care_Products': [0, 5, 8, 0],
+        'Centroid_x': [36.0, 38.0, 36.5, 36.0],
+        'Centoid_Y': [0.0, 0.0, 0.0, np.nan],
+    })
+
+
+def test_facility_index_filters_by_product_and_county():
+    index = FacilityIndex(make_facilities(), buffer_pct=0.1)
+    near = index.nearest(36.4, 0.0, k=5, product='Distibuted_Sunscreen_Lotions')
+    # B1 has no sunscreen and C1 has no coordinates
+    assert list(near['Facility']) == ['A near', 'A far']
+    assert list(near['releasable']) == [9, 9]
+    assert list(index.nearest(36.4, 0.0, k=1)['Facility']) == ['B1']
+    assert list(index.nearest(36.4, 0.0, k=5, county='a')['Facility']) == ['A near', 'A far']
+    dist, rows = index.query([36.0, 38.0], [0.0, 0.0], k=3, product='Distributed_Lip_Care_Products')
+    assert rows.shape == (2, 3) and rows[0, 2] == -1 and np.isinf(dist[0, 2])
+    assert index.facility[rows[1, 0]] == 'A far'
+
+
+def test_nearest_strategy_drains_closest_facility_first():
+    facilities = facility_frame(make_facilities())
+    transfers = pd.DataFrame({'from_county': ['A'], 'to_county': ['B'], 'units': [8]})
+    picks = build_picklists(facilities, transfers, 0.0, strategy='nearest')
+    assert set(picks['facility']) == {'A near'}
+    assert picks['units'].sum() == 8
+    proportional = build_picklists(facilities, transfers, 0.0)
+    assert set(proportional['facility']) == {'A near', 'A far'}
+
+
+def test_nearest_strategy_orders_shared_sites_by_releasable_and_unlocated_last():
+    facilities = facility_frame(pd.DataFrame({
+        'County': ['A'] * 4,
+        'Facility': ['small', 'large', 'far', 'unknown'],
+        'Distibuted_Sunscreen_Lotions': [5, 20, 50, 50],
+        'Centroid_x': [36.0, 36.0, 39.0, np.nan],
+        'Centoid_Y': [0.0, 0.0, 0.0, np.nan],
+    }))
+    centroid_b = pd.DataFrame({'County': ['B'], 'Facility': ['b'], 'Centroid_x': [36.1], 'Centoid_Y': [0.0]})
+    facilities = facility_frame(pd.concat([facilities, centroid_b], ignore_index=True))
+    for units, expected in ((22, {'large': 20, 'small': 2}), (100, {'large': 20, 'small': 5, 'far': 50, 'unknown': 25})):
+        transfers = pd.DataFrame({'from_county': ['A'], 'to_county': ['B'], 'units': [units]})
+        picks = build_picklists(facilities, transfers, 0.0, strategy='nearest')
+        assert picks.groupby('facility')['units'].sum().to_dict() == expected
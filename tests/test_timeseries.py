@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import generate_picklists
+import timeseries
+from generate_picklists import PRODUCT_COLS
+
+YEARS = pd.to_datetime(['2015-06-30', '2016-06-30', '2017-06-30', '2018-06-30'])
+
+
+def make_log(n: int = 60, seed: int = 0) -> pd.DataFrame:
+    """Deliveries to 6 facilities in 2 counties over 4 financial years, most with an expiry date."""
+    rng = np.random.default_rng(seed)
+    fac = rng.integers(0, 6, n)
+    df = pd.DataFrame({'County': np.where(fac < 3, 'Kisii', 'Busia'),
+                       'Distribution_Centres_Hospitals/Health_Centres': [f'F{i}' for i in fac],
+                       'Financial_Year_Ending': YEARS[rng.integers(0, 4, n)].strftime('%m/%d/%Y'),
+                       'Lot_No': [f'L{i}' for i in range(n)]})
+    for pc in PRODUCT_COLS:
+        df[pc] = rng.integers(0, 40, n)
+    expiry = pd.Series(YEARS[rng.integers(0, 4, n)] + pd.to_timedelta(rng.integers(1, 700, n), unit='D'))
+    df['Expiry_Date'] = expiry.dt.strftime('%Y-%m-%d').where(rng.random(n) < 0.8, '')
+    return df
+
+
+def test_meta_keys_match_whole_words():
+    assert generate_picklists.meta_columns(['Distributed_After_Sun_Lotions', 'Lot_No', 'Expiry_Date', 'Batch']) == \
+        ['Lot_No', 'Expiry_Date', 'Batch']
+
+
+def test_rolling_stock_matches_per_period_sums():
+    b = timeseries.batches(make_log())
+    assert b['meta'].str.startswith('Lot_No=L').all()
+    history = timeseries.StockHistory(b)
+    assert list(history.periods) == list(YEARS)
+    for t, end in enumerate(YEARS):
+        live = b[(b['period'] <= end) & ~(b['expiry'] <= end)]
+        expected = live.groupby(['County', 'Facility', 'product'])['units'].sum()
+        got = history.at(end).melt(['County', 'Facility'], var_name='product').set_index(['County', 'Facility', 'product'])['value']
+        assert got[got > 0].sort_index().to_dict() == expected[expected > 0].sort_index().to_dict()
+        assert history.series('kisii').iloc[t] == expected.loc['KISII'].sum()
+    # as-of lookups fall back to the last period end before the date
+    assert history.at('2017-01-01').equals(history.at(YEARS[1]))
+    assert history.at('2000-01-01')[PRODUCT_COLS].to_numpy().sum() == 0
+
+
+def test_fefo_ships_earliest_expiry_first():
+    b = timeseries.batches(make_log())
+    transfers = pd.DataFrame({'from_county': ['KISII', 'BUSIA', 'UNMET', 'KISII'], 'to_county': ['A', 'B', 'C', 'D'],
+                              'product': [PRODUCT_COLS[0], PRODUCT_COLS[1], PRODUCT_COLS[0], PRODUCT_COLS[0]],
+                              'units': [150, 10**6, 7, 80]})
+    as_of = YEARS[2]
+    picks = timeseries.allocate_fefo(b, transfers, 0.2, as_of)
+
+    # reference: per donor/product, queue the buffered batches by expiry and drain them transfer by transfer
+    live = b[(b['period'] <= as_of) & ~(b['expiry'] <= as_of)].copy()
+    live['expiry_key'] = live['expiry'].fillna(pd.Timestamp.max)
+    live = live.sort_values(['expiry_key', 'period', 'batch'])
+    cap = (live.groupby(['Facility', 'product'])['units'].transform('sum') * 0.8).apply(np.floor)
+    live['release'] = np.clip(cap - (live.groupby(['Facility', 'product'])['units'].cumsum() - live['units']), 0, live['units'])
+    expected = []
+    left = live['release'].to_dict()
+    for donor, recipient, product, units in transfers.itertuples(index=False):
+        if donor == 'UNMET':
+            expected.append([donor, recipient, '', product, units])
+            continue
+        for i, row in live[(live['County'] == donor) & (live['product'] == product)].iterrows():
+            give = min(left[i], units)
+            if give > 0:
+                expected.append([donor, recipient, row['Facility'], product, give])
+                left[i] -= give
+                units -= give
+    cols = ['from_county', 'to_county', 'facility', 'product', 'units']
+    assert picks[cols].values.tolist() == expected
+    # shipped batches are never expired at the allocation date
+    assert not (picks['expiry'] <= as_of).any()
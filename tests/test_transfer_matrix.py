@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import executive_brief
+from transfer_matrix import TransferMatrix
+
+
+def make_plan(n=400, seed=2):
+    rng = np.random.default_rng(seed)
+    counties = np.array([f'C{i:02d}' for i in range(30)] + ['UNMET'])
+    return pd.DataFrame({'from_county': rng.choice(counties, n), 'to_county': rng.choice(counties[:-1], n),
+                         'product': rng.choice(['Sun', 'Caps', 'Lip'], n), 'units': rng.integers(0, 500, n),
+                         'distance_km': rng.uniform(0, 900, n)})
+
+
+def test_reductions_match_groupby():
+    plan = make_plan()
+    m = TransferMatrix.from_plan(plan)
+    for key, got in (('from_county', m.by_donor()), ('to_county', m.by_recipient())):
+        expected = plan.groupby(key)['units'].sum()
+        assert got.set_index(key)['units'].to_dict() == expected.to_dict()
+        assert (np.diff(got['units']) <= 0).all()
+    moved = plan['from_county'] != 'UNMET'
+    by_product = m.by_product().set_index('product')
+    assert by_product['planned_units'].to_dict() == plan[moved].groupby('product')['units'].sum().to_dict()
+    assert by_product['unmet_units'].to_dict() == plan[~moved].groupby('product')['units'].sum().to_dict()
+    donor = m.for_donor('C07').to_frame()
+    pd.testing.assert_frame_equal(donor, plan.loc[plan['from_county'] == 'C07', ['from_county', 'to_county', 'product',
+                                                                                  'units']].reset_index(drop=True))
+    assert list(m.top(3)['to_county']) == list(m.by_recipient()['to_county'][:3])
+
+
+def test_donor_slices_keep_source_rows():
+    plan = make_plan()
+    split = list(TransferMatrix.from_plan(plan).donors())
+    expected = plan.groupby('from_county', sort=True)
+    assert [county for county, _ in split] == list(expected.groups)
+    for (county, entries), (_, frame) in zip(split, expected):
+        pd.testing.assert_frame_equal(plan.iloc[entries.rows], frame)
+
+
+def test_brief_ranks_recipients_by_units_only():
+    plan = make_plan(50)
+    html = executive_brief.render_brief('', plan)
+    top = TransferMatrix.from_plan(plan).top(5)
+    assert top.to_html(index=False) in html
+    assert 'distance_km' not in html
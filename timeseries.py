@@ -0,0 +1,286 @@
+"""timeseries.py
+Multi-period stock of the products log and first-expiry-first-out (FEFO) allocation.
+
+Every products row is read as a delivery (batch) of each product to a facility in the financial year ending
+Financial_Year_Ending, optionally with an expiry date (the first metadata column named like an expiry, see
+generate_picklists.meta_columns). StockHistory holds the rolling stock of every facility and product at every
+period end: deliveries received up to the period minus batches expired by then. It is built for all facilities
+and periods at once from one cumulative sum over a (periods x facility-products) array, so stock as of any date
+is a binary search on the period axis and a row slice.
+
+allocate_fefo maps a transfer plan to donor batches: within each donor county (and product, for multi-commodity
+plans) the batches expiring first are shipped first, undated batches last and older deliveries before newer
+ones. Each facility keeps buffer_pct of its stock of a product, taken from its longest-dated batches.
+
+Usage:
+    python timeseries.py                                   # stock by county and period
+    python timeseries.py --picks --buffer 0.1              # FEFO picks for the latest transfer plan
+    python timeseries.py --picks --as-of 2017-06-30
+"""
+from pathlib import Path
+import argparse
+import numpy as np
+import pandas as pd
+import data_processing
+import generate_picklists
+from data_processing import PERIOD_COL
+from generate_picklists import PRODUCT_COLS
+from instrumentation import timed
+import results_store
+
+ROOT = Path(__file__).parent
+OUT = ROOT / 'outputs'
+STOCK_CSV = OUT / 'stock_by_period.csv'
+FEFO_CSV = OUT / 'fefo_picklist.csv'
+# Metadata columns (batch/lot/expiry) read as the batch expiry date
+EXPIRY_KEYS = ('expiry', 'exp_date')
+NAT = np.datetime64('NaT', 'ns')
+
+
+def expiry_column(columns):
+    """First metadata column naming an expiry date, or None."""
+    return next((c for c in generate_picklists.meta_columns(columns) if any(k in c.lower() for k in EXPIRY_KEYS)),
+                None)
+
+
+def _dates(values) -> np.ndarray:
+    return pd.to_datetime(values, errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+
+@timed()
+def batches(products_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per delivered (products row, product) with units > 0.
+
+    Columns: batch (products row position), period, County, Facility, product, units, expiry (NaT without an
+    expiry column) and meta (the other metadata columns as 'name=value; ...'). Rows without a financial year
+    cannot be placed in time and are skipped.
+    """
+    if PERIOD_COL not in products_df.columns:
+        raise ValueError(f'products frame has no {PERIOD_COL} column')
+    df = generate_picklists.facility_frame(products_df)
+    period = _dates(df[PERIOD_COL])
+    exp_col = expiry_column(df.columns)
+    expiry = _dates(df[exp_col]) if exp_col else np.full(len(df), NAT)
+    units = df[PRODUCT_COLS].to_numpy(dtype=np.int64)
+    rows, cols = np.nonzero((units > 0) & ~np.isnat(period)[:, None])
+
+    meta = pd.Series('', index=df.index, dtype=object)
+    for col in [c for c in df.attrs.get('meta_cols', []) if c != exp_col]:
+        meta = meta + np.where(meta == '', '', '; ') + f'{col}=' + df[col].astype(str).to_numpy(dtype=object)
+    return pd.DataFrame({
+        'batch': rows,
+        'period': period[rows],
+        'County': df['County'].array.take(rows),
+        'Facility': df['Facility'].array.take(rows),
+        'product': pd.Categorical.from_codes(cols, PRODUCT_COLS),
+        'units': units[rows, cols],
+        'expiry': expiry[rows],
+        'meta': meta.to_numpy()[rows],
+    })
+
+
+def _facility_codes(b: pd.DataFrame):
+    """(code of each batch's facility, facilities frame County/Facility sorted by County then Facility)."""
+    county, facility = pd.Categorical(b['County'].astype(str)), pd.Categorical(b['Facility'].astype(str))
+    pair = county.codes.astype(np.int64) * len(facility.categories) + facility.codes
+    uniques, codes = np.unique(pair, return_inverse=True)
+    facilities = pd.DataFrame({'County': county.categories[uniques // len(facility.categories)],
+                               'Facility': facility.categories[uniques % len(facility.categories)]})
+    return codes.ravel(), facilities
+
+
+def _product_codes(b: pd.DataFrame) -> np.ndarray:
+    return pd.Categorical(b['product'], categories=PRODUCT_COLS).codes.astype(np.int64)
+
+
+class StockHistory:
+    """Rolling stock of every (facility, product) at every period end of a batches frame.
+
+    stock[t, f * n_products + p] is the quantity of product p delivered to facility f up to period end t, minus the
+    batches expired by then; an expiry between two period ends takes effect at the next one. Facilities are
+    sorted by County, then Facility.
+    """
+
+    def __init__(self, batches_df: pd.DataFrame, periods=None):
+        b = batches_df
+        self.periods = (np.unique(b['period'].to_numpy(dtype='datetime64[ns]')) if periods is None
+                        else np.unique(_dates(periods)))
+        facility, self.facilities = _facility_codes(b)
+        n_periods, n_products = len(self.periods), len(PRODUCT_COLS)
+        n_keys = len(self.facilities) * n_products
+        key = facility * n_products + _product_codes(b)
+
+        # a batch counts from the first period end on/after its delivery until the first one on/after its expiry
+        received = np.searchsorted(self.periods, b['period'].to_numpy(dtype='datetime64[ns]'), side='left')
+        expiry = b['expiry'].to_numpy(dtype='datetime64[ns]')
+        expired = np.where(np.isnat(expiry), n_periods, np.searchsorted(self.periods, expiry, side='left'))
+        expired = np.maximum(expired, received)
+        units = b['units'].to_numpy(dtype=np.int64)
+        size = (n_periods + 1) * n_keys
+        delta = (np.bincount(received * n_keys + key, units, size) - np.bincount(expired * n_keys + key, units, size))
+        self.stock = np.cumsum(delta.reshape(n_periods + 1, n_keys)[:n_periods].astype(np.int64), axis=0)
+
+    def index(self, when) -> int:
+        """Position of the last period end on or before `when` (-1 if `when` precedes every period)."""
+        return int(np.searchsorted(self.periods, np.datetime64(pd.Timestamp(when), 'ns'), side='right')) - 1
+
+    def _row(self, when) -> np.ndarray:
+        t = self.index(when)
+        row = self.stock[t] if t >= 0 else np.zeros(self.stock.shape[1], dtype=np.int64)
+        return row.reshape(len(self.facilities), len(PRODUCT_COLS))
+
+    def at(self, when) -> pd.DataFrame:
+        """Stock of every facility as of `when`: County, Facility and one column per product, as taken by
+        generate_picklists.build_picklists."""
+        df = self.facilities.copy()
+        df[PRODUCT_COLS] = self._row(when)
+        return df
+
+    def series(self, county: str = None, facility: str = None, product: str = None) -> pd.Series:
+        """Total stock per period end of the matching facilities/products (all of them by default)."""
+        match = np.ones(len(self.facilities), dtype=bool)
+        if county is not None:
+            match &= (self.facilities['County'] == str(county).upper().strip()).to_numpy()
+        if facility is not None:
+            match &= (self.facilities['Facility'] == facility).to_numpy()
+        products = np.ones(len(PRODUCT_COLS), dtype=bool) if product is None else np.array([p == product for p in PRODUCT_COLS])
+        mask = (match[:, None] & products[None, :]).ravel()
+        return pd.Series(self.stock[:, mask].sum(axis=1), index=pd.DatetimeIndex(self.periods, name='period'), name='stock')
+
+    def by_county(self) -> pd.DataFrame:
+        """Stock per county, product and period end: period, County, one column per product."""
+        counties = self.facilities['County'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, counties[1:] != counties[:-1]]) if len(counties) else np.zeros(0, dtype=np.int64)
+        stock = self.stock.reshape(len(self.periods), len(counties), len(PRODUCT_COLS))
+        totals = np.add.reduceat(stock, starts, axis=1) if len(starts) else stock
+        df = pd.DataFrame({'period': np.repeat(self.periods, len(starts)), 'County': np.tile(counties[starts], len(self.periods))})
+        df[PRODUCT_COLS] = totals.reshape(-1, len(PRODUCT_COLS))
+        return df
+
+
+def _queue_ends(group: np.ndarray, qty: np.ndarray, flow: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    # end of each queue entry on the shared axis, clipped at its group's flow
+    cum = np.cumsum(qty)
+    first = np.searchsorted(group, group, side='left')
+    return np.minimum(cum - (cum[first] - qty[first]), flow[group]) + offset[group]
+
+
+def _fill(s_group, s_qty, d_group, d_qty, n_groups: int):
+    """North-west corner of supply queues against demand queues, for every group at once.
+
+    Both inputs are sorted by group (queue order within a group). Each group's flow occupies its own span of one
+    shared axis, as in planner.product_plan. Returns (supply index, demand index, units) of every shipment.
+    """
+    flow = np.minimum(np.bincount(s_group, s_qty, n_groups), np.bincount(d_group, d_qty, n_groups)).astype(np.int64)
+    offset = np.concatenate([[0], np.cumsum(flow)[:-1]]).astype(np.int64)
+    total = int(flow.sum())
+    s_end = _queue_ends(s_group, s_qty, flow, offset)
+    d_end = _queue_ends(d_group, d_qty, flow, offset)
+    starts = np.union1d(np.union1d(s_end, d_end), offset[flow > 0])
+    starts = starts[starts < total]
+    stops = np.append(starts[1:], total)
+    return np.searchsorted(s_end, starts, side='right'), np.searchsorted(d_end, starts, side='right'), stops - starts
+
+
+def _as_key(values) -> np.ndarray:
+    # datetimes as sortable integers, NaT (undated) last
+    values = np.asarray(values, dtype='datetime64[ns]')
+    return np.where(np.isnat(values), np.iinfo(np.int64).max, values.view(np.int64))
+
+
+@timed()
+def allocate_fefo(batches_df: pd.DataFrame, transfers: pd.DataFrame, buffer_pct: float, as_of=None) -> pd.DataFrame:
+    """Map county-level transfers to donor batches first-expiry-first-out; one row per batch pick.
+
+    Batches delivered by `as_of` (default: the last period) and not expired at it are available. Each facility
+    releases floor(stock * (1 - buffer_pct)) of each product from its earliest-expiring batches. Transfers with a
+    product column draw only that product. Columns: from_county, to_county, facility, product, units, expiry,
+    period (delivery), meta; transfers nothing can be allocated to get one row with 0 units, as in
+    generate_picklists.build_picklists.
+    """
+    b = batches_df
+    period = b['period'].to_numpy(dtype='datetime64[ns]')
+    as_of = period.max() if as_of is None else np.datetime64(pd.Timestamp(as_of), 'ns')
+    expiry = b['expiry'].to_numpy(dtype='datetime64[ns]')
+    b = b[(period <= as_of) & (np.isnat(expiry) | (expiry > as_of))]
+
+    # buffer per facility and product, kept from the longest-dated batches
+    facility, facilities = _facility_codes(b)
+    fp = facility * len(PRODUCT_COLS) + _product_codes(b)
+    order = np.lexsort((b['batch'].to_numpy(), _as_key(b['period']), _as_key(b['expiry']), fp))
+    b, fp = b.iloc[order], fp[order]
+    county = facilities['County'].to_numpy()[facility[order]]
+    units = b['units'].to_numpy(dtype=np.int64)
+    cap = np.floor(np.bincount(fp, units) * (1.0 - buffer_pct)).astype(np.int64)
+    cum = np.cumsum(units)
+    first = np.searchsorted(fp, fp, side='left')
+    releasable = np.clip(cap[fp] - (cum - cum[first] + units[first] - units), 0, units)
+
+    by_product = 'product' in transfers.columns
+    moved = (transfers['from_county'] != 'UNMET').to_numpy() & (transfers['units'].to_numpy() > 0)
+    demand = transfers[moved]
+    d_county = demand['from_county'].astype(str).to_numpy()
+    s_product = b['product'].to_numpy() if by_product else np.full(len(b), '', dtype=object)
+    d_product = demand['product'].astype(str).to_numpy() if by_product else np.full(len(demand), '', dtype=object)
+    codes, uniques = pd.MultiIndex.from_arrays([np.concatenate([county, d_county]),
+                                                np.concatenate([s_product, d_product])]).factorize()
+    s_group, d_group = codes[:len(b)], codes[len(b):]
+
+    # supply queues: the donor county's batches, earliest expiry first, then oldest delivery
+    s_order = np.lexsort((b['batch'].to_numpy(), _as_key(b['period']), _as_key(b['expiry']), s_group))
+    s_order = s_order[releasable[s_order] > 0]
+    d_order = np.argsort(d_group, kind='stable')
+    s_idx, d_idx, qty = _fill(s_group[s_order], releasable[s_order], d_group[d_order], demand['units'].to_numpy(dtype=np.int64)[d_order],
+                              len(uniques))
+    s_rows, d_rows = s_order[s_idx], d_order[d_idx]
+
+    transfer = np.flatnonzero(moved)[d_rows]
+    picks = pd.DataFrame({'transfer': transfer,
+                          'from_county': transfers['from_county'].to_numpy()[transfer],
+                          'to_county': transfers['to_county'].to_numpy()[transfer],
+                          'facility': b['Facility'].astype(str).to_numpy()[s_rows],
+                          'product': b['product'].to_numpy()[s_rows],
+                          'units': qty.astype(np.int64),
+                          'expiry': b['expiry'].to_numpy()[s_rows],
+                          'period': b['period'].to_numpy()[s_rows],
+                          'meta': b['meta'].to_numpy()[s_rows]})
+    # UNMET rows and transfers without any allocation, as in build_picklists
+    empty = np.setdiff1d(np.arange(len(transfers)), transfer)
+    unmet = (transfers['from_county'].to_numpy()[empty] == 'UNMET')
+    rest = pd.DataFrame({'transfer': empty,
+                         'from_county': transfers['from_county'].to_numpy()[empty],
+                         'to_county': transfers['to_county'].to_numpy()[empty],
+                         'facility': '',
+                         'product': transfers['product'].to_numpy()[empty] if by_product else '',
+                         'units': np.where(unmet, transfers['units'].to_numpy()[empty], 0).astype(np.int64),
+                         'expiry': NAT, 'period': NAT, 'meta': ''})
+    picks = pd.concat([picks, rest], ignore_index=True) if len(rest) else picks
+    return picks.sort_values('transfer', kind='stable').drop(columns='transfer').reset_index(drop=True)
+
+
+def main(products_csv: Path = generate_picklists.PRODUCTS_CSV, as_of=None, buffer_pct: float = 0.1,
+         picks: bool = False):
+    products, _ = data_processing.load_clean(products_csv, data_processing.clean_products)
+    batches_df = batches(products)
+    history = StockHistory(batches_df)
+    OUT.mkdir(parents=True, exist_ok=True)
+    history.by_county().to_csv(STOCK_CSV, index=False)
+    print(f'{len(history.periods)} periods x {len(history.facilities)} facilities; wrote', STOCK_CSV)
+    print(history.series().to_string())
+    if picks:
+        transfers = results_store.load_table('transfers', generate_picklists.TRANSFER_CSV)
+        if transfers is None:
+            raise SystemExit('transfer_plan.csv not found; run transfer_plan.py first')
+        pick_df = allocate_fefo(batches_df, transfers, buffer_pct, as_of)
+        pick_df.to_csv(FEFO_CSV, index=False)
+        print('Wrote', FEFO_CSV, f"({int(pick_df['units'].sum())} units in {len(pick_df)} picks)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-period stock and FEFO allocation')
+    parser.add_argument('--products', default=str(generate_picklists.PRODUCTS_CSV))
+    parser.add_argument('--as-of', default=None, help='Allocate from the stock on this date (default: last period)')
+    parser.add_argument('--buffer', type=float, default=0.1, help='Share of each facility\'s stock kept (0-1)')
+    parser.add_argument('--picks', action='store_true', help=f'Allocate the latest transfer plan to batches ({FEFO_CSV.name})')
+    args = parser.parse_args()
+    main(Path(args.products), args.as_of, args.buffer, args.picks)
@@ -0,0 +1,112 @@
+"""transfer_matrix.py
+A transfer plan (or picklist) as a sparse donor x recipient x product matrix in coordinate form.
+
+Counties (with UNMET, the donor of need no county can cover) and products are integer-coded once; the plan is then
+three code arrays and a units array, with repeated (donor, recipient, product) entries summing. Summaries
+(units by donor, recipient or product), top-k rankings and per-donor slices are bincount reductions and masks over
+those arrays instead of groupbys over string columns, and frames are only rebuilt for rendering. Every entry keeps
+its row position in the source frame, so a slice can pick the source's other columns (facility, meta) back out.
+
+Usage:
+    m = TransferMatrix.from_plan(trans_df)
+    m.by_donor(); m.by_recipient(); m.by_product(); m.top(5, 'to_county'); m.for_donor('KISII').to_frame()
+    for county, entries in m.donors(): trans_df.iloc[entries.rows]
+"""
+import numpy as np
+import pandas as pd
+
+UNMET = 'UNMET'
+
+
+class TransferMatrix:
+    """Coordinate (COO) form of a plan: donor/recipient codes into counties, product codes into products
+    (None for single-commodity plans), units per entry and each entry's row position in the source frame."""
+
+    def __init__(self, donor, recipient, units, counties, product=None, products=None, rows=None):
+        self.donor = np.asarray(donor, dtype=np.int64)
+        self.recipient = np.asarray(recipient, dtype=np.int64)
+        self.units = np.asarray(units, dtype=np.int64)
+        self.counties = np.asarray(counties, dtype=object)
+        self.product = None if product is None else np.asarray(product, dtype=np.int64)
+        self.products = None if products is None else np.asarray(products, dtype=object)
+        self.rows = np.arange(len(self.units)) if rows is None else np.asarray(rows, dtype=np.int64)
+
+    @classmethod
+    def from_plan(cls, plan: pd.DataFrame) -> 'TransferMatrix':
+        """From a frame with from_county, to_county, units and optionally product (transfer plans, picklists)."""
+        n = len(plan)
+        codes, counties = pd.factorize(np.concatenate([plan['from_county'].astype(str).to_numpy(dtype=object),
+                                                       plan['to_county'].astype(str).to_numpy(dtype=object)]))
+        product = products = None
+        if 'product' in plan.columns:
+            product, products = pd.factorize(plan['product'].fillna('').astype(str).to_numpy(dtype=object))
+        return cls(codes[:n], codes[n:], plan['units'].to_numpy(dtype=np.int64), counties, product, products)
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    @property
+    def unmet(self) -> np.ndarray:
+        """Mask of the entries no donor covers."""
+        hit = np.flatnonzero(self.counties == UNMET)
+        return self.donor == hit[0] if len(hit) else np.zeros(len(self), dtype=bool)
+
+    def _select(self, mask: np.ndarray) -> 'TransferMatrix':
+        return TransferMatrix(self.donor[mask], self.recipient[mask], self.units[mask], self.counties,
+                              None if self.product is None else self.product[mask], self.products, self.rows[mask])
+
+    def _ranked(self, codes: np.ndarray, names: np.ndarray, key: str) -> pd.DataFrame:
+        """Units per code (present codes only), largest first, ties by name."""
+        units = np.bincount(codes, self.units, minlength=len(names))
+        present = np.flatnonzero(np.bincount(codes, minlength=len(names)))
+        order = present[np.lexsort((names[present].astype(str), -units[present]))]
+        return pd.DataFrame({key: names[order], 'units': units[order].astype(np.int64)})
+
+    def by_donor(self) -> pd.DataFrame:
+        """from_county, units: units leaving every donor (UNMET included), largest first."""
+        return self._ranked(self.donor, self.counties, 'from_county')
+
+    def by_recipient(self) -> pd.DataFrame:
+        """to_county, units: units planned for every recipient (covered or not), largest first."""
+        return self._ranked(self.recipient, self.counties, 'to_county')
+
+    def by_product(self) -> pd.DataFrame:
+        """product, planned_units, unmet_units, in product order (multi-commodity plans only)."""
+        if self.product is None:
+            raise ValueError('plan has no product column')
+        unmet = self.unmet
+        n = len(self.products)
+        planned = np.bincount(self.product[~unmet], self.units[~unmet], minlength=n).astype(np.int64)
+        short = np.bincount(self.product[unmet], self.units[unmet], minlength=n).astype(np.int64)
+        present = np.flatnonzero(np.bincount(self.product, minlength=n))
+        order = present[np.argsort(self.products[present].astype(str), kind='stable')]
+        return pd.DataFrame({'product': self.products[order], 'planned_units': planned[order],
+                             'unmet_units': short[order]})
+
+    def top(self, k: int, by: str = 'to_county') -> pd.DataFrame:
+        """The k counties receiving ('to_county') or giving ('from_county') the most units."""
+        if by not in ('from_county', 'to_county'):
+            raise ValueError(f"top ranks by 'from_county' or 'to_county', not {by!r}")
+        return (self.by_recipient() if by == 'to_county' else self.by_donor()).head(k).reset_index(drop=True)
+
+    def for_donor(self, county: str) -> 'TransferMatrix':
+        """Entries leaving one donor county."""
+        hit = np.flatnonzero(self.counties == county)
+        return self._select(self.donor == hit[0] if len(hit) else np.zeros(len(self), dtype=bool))
+
+    def donors(self):
+        """(county, entries leaving it) for every donor with entries (UNMET included), in county name order; one
+        stable sort of the donor codes, so each slice keeps plan order."""
+        order = np.argsort(self.donor, kind='stable')
+        bounds = np.searchsorted(self.donor[order], np.arange(len(self.counties) + 1))
+        present = np.flatnonzero(np.diff(bounds))
+        for code in present[np.argsort(self.counties[present].astype(str), kind='stable')]:
+            yield self.counties[code], self._select(order[bounds[code]:bounds[code + 1]])
+
+    def to_frame(self) -> pd.DataFrame:
+        """from_county, to_county, [product,] units, one row per entry in plan order."""
+        df = pd.DataFrame({'from_county': self.counties[self.donor], 'to_county': self.counties[self.recipient]})
+        if self.product is not None:
+            df['product'] = self.products[self.product]
+        df['units'] = self.units
+        return df
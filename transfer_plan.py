@@ -1,76 +1,119 @@
-import pandas as pd
+"""transfer_plan.py
+Build the county-to-county transfer plan from the latest county summary (results store, else
+outputs/county_summary.csv).
+Outputs (the plan and summary are also recorded in the results store):
+ - outputs/transfer_plan.csv
+ - outputs/transfer_summary.txt
+
+Usage:
+    python transfer_plan.py                 # greedy: largest surplus to largest need
+    python transfer_plan.py --mode mincost  # least ton-km plan, needs centroids in data/clean/clean_products.csv
+    python transfer_plan.py --by-product    # plan each product against its own target (product_targets.json)
+"""
+import argparse
 from pathlib import Path
+import pandas as pd
+import planner
+from instrumentation import timed
+import results_store
+from transfer_matrix import TransferMatrix
 
 ROOT = Path(__file__).parent
 in_csv = ROOT / 'outputs' / 'county_summary.csv'
 out_csv = ROOT / 'outputs' / 'transfer_plan.csv'
 out_txt = ROOT / 'outputs' / 'transfer_summary.txt'
+clean_products_csv = ROOT / 'data' / 'clean' / 'clean_products.csv'
+
+TARGET_PER_PERSON = planner.TARGET_PER_PERSON
+
+
+def load_centroids():
+    """County centroids from the cleaned products CSV, or None if it has no coordinates."""
+    if not clean_products_csv.exists():
+        return None
+    products = pd.read_csv(clean_products_csv)
+    if 'Centroid_x' not in products.columns or 'Centoid_Y' not in products.columns:
+        return None
+    return planner.county_centroids(products)
+
+
+@timed()
+def build_plan(summary_df: pd.DataFrame, mode: str = 'greedy', centroids: pd.DataFrame = None,
+               target_per_person: float = TARGET_PER_PERSON, product_targets: dict = None):
+    """Return (trans_df, donors, recips) for a county summary.
+
+    With product_targets ({product column: units per PWA}) every product is planned against its own target
+    and trans_df, donors and recips gain a product column.
+    """
+    if mode == 'mincost' and centroids is None:
+        raise SystemExit('county centroids not found; run data_processing.py first')
+    if product_targets is not None:
+        counties, products, surplus = planner.product_surplus(summary_df, product_targets)
+        donors, recips = planner.product_donors_recipients(counties, products, surplus)
+        trans_df = planner.plan_product_transfers(counties, products, surplus, mode, centroids)
+    else:
+        df = planner.surplus_table(summary_df, target_per_person)
+        donors, recips = planner.split_donors_recipients(df)
+        trans_df = planner.plan_transfers(donors, recips, mode, centroids)
+    if centroids is not None:
+        trans_df = planner.add_distances(trans_df, centroids)
+    return trans_df, donors, recips
+
+
+def format_summary(trans_df: pd.DataFrame, donors: pd.DataFrame, recips: pd.DataFrame, mode: str = 'greedy',
+                   centroids: pd.DataFrame = None, kg_per_unit: float = planner.KG_PER_UNIT) -> str:
+    """Render the plain-text transfer summary written to transfer_summary.txt."""
+    matrix = TransferMatrix.from_plan(trans_df)
+
+    lines = []
+    lines.append('Transfer plan summary\n')
+    lines.append('=====================\n')
+    lines.append(f'Planning mode: {mode}\n')
+    lines.append(f'Total donors: {donors["County"].nunique()}\n')
+    lines.append(f'Total recipients: {recips["County"].nunique()}\n')
+    if 'product' in trans_df.columns:
+        lines.append('\nUnits by product\n')
+        lines.append(matrix.by_product().to_string(index=False) + '\n')
+        if centroids is not None:
+            lines.append(f'Total ton-km ({mode}, {kg_per_unit} kg/unit): {planner.ton_km(trans_df, centroids, kg_per_unit):.1f}\n')
+    elif centroids is not None:
+        # report both modes so the plans can be compared on transport effort
+        for m in planner.MODES:
+            plan = trans_df if m == mode else planner.plan_transfers(donors, recips, m, centroids)
+            lines.append(f'Total ton-km ({m}, {kg_per_unit} kg/unit): {planner.ton_km(plan, centroids, kg_per_unit):.1f}\n')
+    lines.append('\nTop donors (by units donated)\n')
+    lines.append(matrix.by_donor().to_string(index=False))
+    lines.append('\n\nTop recipients (by units requested)\n')
+    lines.append(matrix.by_recipient().to_string(index=False))
+    return ''.join(lines)
+
+
+def main(mode: str = 'greedy', kg_per_unit: float = planner.KG_PER_UNIT, by_product: bool = False):
+    summary_df = results_store.load_table('county_summary', in_csv)
+    if summary_df is None:
+        raise SystemExit('county_summary.csv not found; run analysis.py first')
+    centroids = load_centroids()
+    product_targets = planner.load_product_targets() if by_product else None
+    trans_df, donors, recips = build_plan(summary_df, mode, centroids, product_targets=product_targets)
+
+    # Save transfer plan and summary
+    text = format_summary(trans_df, donors, recips, mode, centroids, kg_per_unit)
+    trans_df.to_csv(out_csv, index=False)
+    out_txt.write_text(text, encoding='utf-8')
+    results_store.save_run('transfer_plan', {'transfers': trans_df}, {'transfer_summary': text},
+                           {'mode': mode, 'by_product': by_product})
+
+    print('Wrote', out_csv)
+    print('Wrote', out_txt)
+    print('\nTop 10 transfers:')
+    print(trans_df.head(10).to_string(index=False))
+
 
-if not in_csv.exists():
-    raise SystemExit('county_summary.csv not found; run analysis.py first')
-
-TARGET_PER_PERSON = 20
-
-df = pd.read_csv(in_csv)
-# compute surplus units as in insights
-if 'surplus_units' not in df.columns:
-    df['No_PWA_2019'] = df['No_PWA_2019'].fillna(0).astype(int)
-    df['target_total'] = df['No_PWA_2019'] * TARGET_PER_PERSON
-    df['surplus_units'] = df['Total_Products'] - df['target_total']
-else:
-    # ensure numeric
-    df['surplus_units'] = pd.to_numeric(df['surplus_units'], errors='coerce').fillna(0).astype(int)
-
-# donors and recipients
-donors = df[df['surplus_units']>0][['County','surplus_units']].copy()
-recips = df[df['surplus_units']<0][['County','surplus_units']].copy()
-recips['need'] = -recips['surplus_units']
-
-# sort donors by largest surplus, recipients by largest need
-donors = donors.sort_values('surplus_units', ascending=False).reset_index(drop=True)
-recips = recips.sort_values('need', ascending=False).reset_index(drop=True)
-
-transfers = []
-# Greedy allocation
-for r_idx, r in recips.iterrows():
-    need = int(r['need'])
-    if need <= 0:
-        continue
-    for d_idx in donors.index:
-        donor_qty = int(donors.at[d_idx,'surplus_units'])
-        if donor_qty <= 0:
-            continue
-        give = min(donor_qty, need)
-        if give <= 0:
-            continue
-        transfers.append({'from_county': donors.at[d_idx,'County'], 'to_county': r['County'], 'units': give})
-        donors.at[d_idx,'surplus_units'] = donor_qty - give
-        need -= give
-        if need <= 0:
-            break
-    if need>0:
-        # unmet need remains (not expected here because total surplus >> deficit)
-        transfers.append({'from_county': 'UNMET', 'to_county': r['County'], 'units': need})
-
-# Save transfer plan
-trans_df = pd.DataFrame(transfers)
-trans_df.to_csv(out_csv, index=False)
-
-# Summaries
-by_donor = trans_df.groupby('from_county')['units'].sum().reset_index().sort_values('units', ascending=False)
-by_recipient = trans_df.groupby('to_county')['units'].sum().reset_index().sort_values('units', ascending=False)
-
-with out_txt.open('w', encoding='utf-8') as f:
-    f.write('Transfer plan summary\n')
-    f.write('=====================\n')
-    f.write(f'Total donors: {len(donors)}\n')
-    f.write(f'Total recipients: {len(recips)}\n')
-    f.write('\nTop donors (by units donated)\n')
-    f.write(by_donor.to_string(index=False))
-    f.write('\n\nTop recipients (by units requested)\n')
-    f.write(by_recipient.to_string(index=False))
-
-print('Wrote', out_csv)
-print('Wrote', out_txt)
-print('\nTop 10 transfers:')
-print(trans_df.head(10).to_string(index=False))
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=planner.MODES, default='greedy', help=planner.MODE_HELP)
+    parser.add_argument('--kg-per-unit', type=float, default=planner.KG_PER_UNIT, help='Average weight of one unit for ton-km')
+    parser.add_argument('--by-product', action='store_true',
+                        help=f'Plan every product against its own target in {planner.PRODUCT_TARGETS_JSON.name}')
+    args = parser.parse_args()
+    main(args.mode, args.kg_per_unit, args.by_product)